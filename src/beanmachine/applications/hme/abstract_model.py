@@ -212,48 +212,47 @@ class AbstractModel(object, metaclass=ABCMeta):
         iconf.keep_log_prob = infer_config.keep_logprob
         iconf.num_warmup = infer_config.n_warmup
         iconf.keep_warmup = infer_config.keep_warmup
-        bmg_result = self.g.infer(
+        bmg_result = self.g.infer_to_numpy(
             infer_config.n_iter,
             bmgraph.InferenceType.NMC,
             infer_config.seed,
             infer_config.n_chains,
             iconf,
         )
+        # stack the per-query arrays into a (n_chains, n_samples, n_queries) array;
+        # this also converts bool-valued samples (e.g. h) to float
+        bmg_result = np.stack(bmg_result, axis=-1).astype(np.float64)
         posterior_samples = self._to_dataframe(bmg_result)
         posterior_diagnostics = self._get_bmg_diagnostics(bmg_result)
         t_used = time.time() - t0
         logger.info(f"The model fitted in {round(t_used/60., 1)} minutes.")
         return posterior_samples, posterior_diagnostics
 
-    def _to_dataframe(self, dat_list: List) -> pd.DataFrame:
-        """Stacks posterior sample lists across different chains and transforms them into a dataframe.
+    def _to_dataframe(self, samples: np.ndarray) -> pd.DataFrame:
+        """Stacks posterior samples across different chains and transforms them into a dataframe.
 
-        :param dat_list: posterior samples in multiple chains generated from `bmgraph.infer()`
+        :param samples: posterior samples of shape (n_chains, n_samples, n_queries) generated from `bmgraph.infer_to_numpy()`
         :return: stacked posterior samples with corresponding parameter names
         """
 
-        df_list = []
-        i = 0
-        for chain_i in dat_list:
-            df = (
-                pd.DataFrame(chain_i, columns=list(self.query_map.keys())) * 1.0
-            )  # multiply by 1.0 to convert bool-valued h to float
-            df["iter"] = pd.Series(range(len(chain_i))) + 1
-            df["chain"] = i
-            i += 1
-            df_list.append(df)
-        result_df = pd.concat(df_list, axis=0).reset_index(drop=True)
+        n_chains, n_samples, n_queries = samples.shape
+        result_df = pd.DataFrame(
+            samples.reshape(n_chains * n_samples, n_queries),
+            columns=list(self.query_map.keys()),
+        )
+        result_df["iter"] = np.tile(np.arange(1, n_samples + 1), n_chains)
+        result_df["chain"] = np.repeat(np.arange(n_chains), n_samples)
         return result_df
 
-    def _get_bmg_diagnostics(self, samples: List) -> pd.DataFrame:
+    def _get_bmg_diagnostics(self, samples: Union[np.ndarray, List]) -> pd.DataFrame:
         """Checks convergence of MCMC posterior inference results and returns diagnostic summary statistics.
 
-        :param samples: posterior samples list generated from `bmgraph.infer()`
+        :param samples: posterior samples of shape (n_chains, n_samples, n_queries) generated from `bmgraph.infer_to_numpy()`, or the equivalent nested list
         :return: diagnostic summary statistics, including effective sample size, R_hat (when n_chain > 1), sample mean, and acceptance rates (for continuous R.V.)
         """
 
         # conversion to torch
-        samples = torch.tensor(samples)
+        samples = torch.as_tensor(np.asarray(samples))
 
         n_chain = samples.shape[0]
         bmg_neff = bm_diag_util.effective_sample_size(samples)
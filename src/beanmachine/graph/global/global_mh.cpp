@@ -18,17 +18,30 @@ std::vector<std::vector<NodeValue>>& GlobalMH::infer(
     int num_warmup_samples,
     bool save_warmup,
     InitType init_type) {
-  std::mt19937 gen(seed);
   // TODO: tie samples directly to inference
   graph.agg_type = AggregationType::NONE;
   graph.samples.clear();
-  std::vector<std::vector<NodeValue>> values;
+  InferConfig infer_config;
+  infer_config.num_warmup = num_warmup_samples;
+  infer_config.keep_warmup = save_warmup;
+  run_chain(num_samples, seed, infer_config, init_type);
+  return graph.samples;
+}
+
+void GlobalMH::run_chain(
+    uint num_samples,
+    uint seed,
+    InferConfig infer_config,
+    InitType init_type) {
+  std::mt19937 gen(seed);
+  int num_warmup_samples = infer_config.num_warmup;
 
   prepare_graph();
   state.initialize_values(init_type, seed);
   proposer->initialize(state, gen, num_warmup_samples);
 
-  for (int i = 0; i < num_samples + num_warmup_samples; i++) {
+  int num_iterations = static_cast<int>(num_samples) + num_warmup_samples;
+  for (int i = 0; i < num_iterations; i++) {
     double acceptance_log_prob = proposer->propose(state, gen);
     bool accept_sample =
         util::flip_coin_with_log_prob(gen, acceptance_log_prob);
@@ -49,15 +62,15 @@ std::vector<std::vector<NodeValue>>& GlobalMH::infer(
     if (i < num_warmup_samples) {
       double acceptance_prob = std::min(std::exp(acceptance_log_prob), 1.0);
       proposer->warmup(state, gen, acceptance_prob, i + 1, num_warmup_samples);
-      if (save_warmup) {
-        graph.collect_sample();
+      if (!infer_config.keep_warmup) {
+        continue;
       }
-    } else {
-      graph.collect_sample();
     }
+    if (infer_config.keep_log_prob) {
+      graph.collect_log_prob(graph.full_log_prob());
+    }
+    graph.collect_sample();
   }
-
-  return graph.samples;
 }
 
 } // namespace graph
@@ -25,6 +25,19 @@ class GlobalMH {
       int num_warmup_samples = 0,
       bool save_warmup = false,
       InitType init_type = InitType::RANDOM);
+  /*
+  Runs a single chain and collects its samples (and log probabilities, if
+  requested) like the built-in algorithms of Graph do, that is, into the
+  per-chain results of the master graph if this graph is a copy made for
+  parallel inference. Unlike infer, this does not reset the samples of the
+  graph, so it can be used for the chains of Graph::infer and
+  Graph::infer_mean.
+  */
+  void run_chain(
+      uint num_samples,
+      uint seed,
+      InferConfig infer_config,
+      InitType init_type = InitType::RANDOM);
   virtual void prepare_graph() {}
   void single_mh_step(GlobalState& state);
   virtual ~GlobalMH() {}
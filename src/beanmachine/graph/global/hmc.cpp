@@ -22,5 +22,13 @@ void HMC::prepare_graph() {
   set_default_transforms(graph);
 }
 
+void Graph::hmc(uint num_samples, uint seed, InferConfig infer_config) {
+  HMC(*this,
+      infer_config.path_length,
+      infer_config.step_size,
+      infer_config.adapt_mass_matrix)
+      .run_chain(num_samples, seed, infer_config);
+}
+
 } // namespace graph
 } // namespace beanmachine
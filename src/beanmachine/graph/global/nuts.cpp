@@ -22,5 +22,12 @@ void NUTS::prepare_graph() {
   set_default_transforms(graph);
 }
 
+void Graph::nuts(uint num_samples, uint seed, InferConfig infer_config) {
+  // NUTS adapts the path length and finds its own initial step size, so only
+  // the warmup and mass matrix settings of the config apply.
+  NUTS(*this, infer_config.adapt_mass_matrix)
+      .run_chain(num_samples, seed, infer_config);
+}
+
 } // namespace graph
 } // namespace beanmachine
@@ -67,3 +67,25 @@ TEST(testglobal, global_nuts_mixed) {
   NUTS mh = NUTS(g, adapt_mass_matrix, multinomial_sampling);
   test_conjugate_model_moments(mh, expected_moments);
 }
+
+TEST(testglobal, global_nuts_graph_infer) {
+  Graph g;
+  auto expected_moments = build_normal_normal_model(g);
+  uint num_samples = 5000;
+  uint n_chains = 2;
+  InferConfig infer_config;
+  infer_config.num_warmup = 2000;
+  auto& samples =
+      g.infer(num_samples, InferenceType::NUTS, 17, n_chains, infer_config);
+  EXPECT_EQ(samples.size(), n_chains);
+  for (auto& chain_samples : samples) {
+    EXPECT_EQ(chain_samples.size(), num_samples);
+    for (uint i = 0; i < expected_moments.size(); i++) {
+      double mean = 0.0;
+      for (auto& sample : chain_samples) {
+        mean += sample[i]._double / num_samples;
+      }
+      EXPECT_NEAR(mean, expected_moments[i], 0.05);
+    }
+  }
+}
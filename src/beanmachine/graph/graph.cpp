@@ -1019,6 +1019,10 @@ void Graph::_infer(
     gibbs(num_samples, seed, infer_config);
   } else if (algorithm == InferenceType::NMC) {
     nmc(num_samples, seed, infer_config);
+  } else if (algorithm == InferenceType::HMC) {
+    hmc(num_samples, seed, infer_config);
+  } else if (algorithm == InferenceType::NUTS) {
+    nuts(num_samples, seed, infer_config);
   }
 }
 
@@ -390,6 +390,8 @@ enum class InferenceType {
   REJECTION,
   GIBBS,
   NMC,
+  HMC,
+  NUTS,
 };
 
 enum class AggregationType {
@@ -404,6 +406,8 @@ struct InferConfig {
   double step_size;
   uint num_warmup;
   bool keep_warmup;
+  // only used by HMC and NUTS
+  bool adapt_mass_matrix;
 
   ~InferConfig() {}
   InferConfig(
@@ -411,12 +415,14 @@ struct InferConfig {
       double path_length = 1.0,
       double step_size = 1.0,
       uint num_warmup = 0,
-      bool keep_warmup = false)
+      bool keep_warmup = false,
+      bool adapt_mass_matrix = true)
       : keep_log_prob(keep_log_prob),
         path_length(path_length),
         step_size(step_size),
         num_warmup(num_warmup),
-        keep_warmup(keep_warmup) {}
+        keep_warmup(keep_warmup),
+        adapt_mass_matrix(adapt_mass_matrix) {}
 };
 
 class Node {
@@ -591,7 +597,7 @@ struct Graph {
 
   :param num_samples: The number of the MCMC samples.
   :param algorithm: The sampling algorithm, currently supporting REJECTION,
-                    GIBBS, and NMC.
+                    GIBBS, NMC, HMC and NUTS.
   :param seed: The seed provided to the random number generator.
   :returns: The posterior samples.
   */
@@ -603,7 +609,7 @@ struct Graph {
 
   :param num_samples: The number of the MCMC samples of each chain.
   :param algorithm: The sampling algorithm, currently supporting REJECTION,
-                    GIBBS, and NMC.
+                    GIBBS, NMC, HMC and NUTS.
   :param seed: The seed provided to the random number generator of the first
                chain.
   :param n_chains: The number of MCMC chains.
@@ -620,7 +626,8 @@ struct Graph {
   Make point estimates of the posterior means from a single MCMC chain.
   :param num_samples: The number of the MCMC samples.
   :param algorithm: The sampling algorithm, currently supporting REJECTION,
-  GIBBS, and NMC. :param seed: The seed provided to the random number generator.
+  GIBBS, NMC, HMC and NUTS. :param seed: The seed provided to the random number
+  generator.
   :returns: The posterior means.
   */
   std::vector<double>&
@@ -630,7 +637,7 @@ struct Graph {
 
   :param num_samples: The number of the MCMC samples of each chain.
   :param algorithm: The sampling algorithm, currently supporting REJECTION,
-                    GIBBS, and NMC.
+                    GIBBS, NMC, HMC and NUTS.
   :param seed: The seed provided to the random number generator of the first
                chain.
   :param n_chains: The number of MCMC chains.
@@ -893,6 +900,8 @@ struct Graph {
   void rejection(uint num_samples, uint seed, InferConfig infer_config);
   void gibbs(uint num_samples, uint seed, InferConfig infer_config);
   void nmc(uint num_samples, uint seed, InferConfig infer_config);
+  void hmc(uint num_samples, uint seed, InferConfig infer_config);
+  void nuts(uint num_samples, uint seed, InferConfig infer_config);
   void cavi(
       uint num_iters,
       uint steps_per_iter,
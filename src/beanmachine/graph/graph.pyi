@@ -144,6 +144,14 @@ class Graph:
         n_chains: int = ...,
         infer_config: InferConfig = ...,
     ) -> List[List[List[NodeValue]]]: ...
+    def infer_to_numpy(
+        self,
+        num_samples: int,
+        algorithm: InferenceType = ...,
+        seed: int = ...,
+        n_chains: int = ...,
+        infer_config: InferConfig = ...,
+    ) -> List[numpy.ndarray]: ...
     @overload
     def infer_mean(
         self, num_samples: int, algorithm: InferenceType = ..., seed: int = ...
@@ -198,6 +206,7 @@ class HMC:
     ) -> List[List[NodeValue]]: ...
 
 class InferConfig:
+    adapt_mass_matrix: bool
     keep_log_prob: bool
     keep_warmup: bool
     num_warmup: int
@@ -209,12 +218,24 @@ class InferConfig:
     def __init__(
         self, arg0: bool, arg1: float, arg2: float, arg3: int, arg4: bool
     ) -> None: ...
+    @overload
+    def __init__(
+        self,
+        arg0: bool,
+        arg1: float,
+        arg2: float,
+        arg3: int,
+        arg4: bool,
+        arg5: bool,
+    ) -> None: ...
 
 class InferenceType:
     __doc__: ClassVar[str] = ...  # read-only
     __members__: ClassVar[dict] = ...  # read-only
     GIBBS: ClassVar[InferenceType] = ...
+    HMC: ClassVar[InferenceType] = ...
     NMC: ClassVar[InferenceType] = ...
+    NUTS: ClassVar[InferenceType] = ...
     REJECTION: ClassVar[InferenceType] = ...
     __entries: ClassVar[dict] = ...
     def __init__(self, value: int) -> None: ...
@@ -6,6 +6,7 @@
  */
 
 #include "beanmachine/graph/pybindings.h"
+#include <pybind11/numpy.h>
 #include <pybind11/pybind11.h>
 #include <pybind11/stl.h>
 
@@ -14,6 +15,124 @@ namespace graph {
 
 namespace py = pybind11;
 
+namespace {
+
+// Copies the values of query q of every sample in every chain into a
+// contiguous array, value_size elements at a time.
+template <typename T, typename Copy>
+py::array fill_query_array(
+    const std::vector<std::vector<std::vector<NodeValue>>>& samples,
+    uint q,
+    const std::vector<py::ssize_t>& shape,
+    size_t value_size,
+    Copy copy) {
+  py::array_t<T> array(shape);
+  T* out = array.mutable_data();
+  for (const auto& chain : samples) {
+    for (const auto& sample : chain) {
+      copy(sample[q], out);
+      out += value_size;
+    }
+  }
+  return array;
+}
+
+// Converts the samples returned by Graph::infer into one NumPy array per
+// query, of shape (n_chains, num_samples) for scalar queries. Matrix valued
+// queries of shape (rows, cols) have values of shape (rows,) if cols == 1 and
+// (cols, rows) otherwise, which is exactly Eigen's column-major storage.
+// No Python object is created per sampled value.
+std::vector<py::array> samples_to_numpy(
+    const std::vector<std::vector<std::vector<NodeValue>>>& samples) {
+  std::vector<py::array> result;
+  if (samples.empty() || samples[0].empty()) {
+    return result;
+  }
+  uint n_queries = static_cast<uint>(samples[0][0].size());
+  for (uint q = 0; q < n_queries; q++) {
+    const NodeValue& first = samples[0][0][q];
+    std::vector<py::ssize_t> shape = {
+        static_cast<py::ssize_t>(samples.size()),
+        static_cast<py::ssize_t>(samples[0].size())};
+    size_t value_size = 1;
+    AtomicType atomic_type = first.type.atomic_type;
+    if (first.type.variable_type != VariableType::SCALAR) {
+      py::ssize_t rows, cols;
+      if (atomic_type == AtomicType::BOOLEAN) {
+        rows = first._bmatrix.rows();
+        cols = first._bmatrix.cols();
+      } else if (atomic_type == AtomicType::NATURAL) {
+        rows = first._nmatrix.rows();
+        cols = first._nmatrix.cols();
+      } else {
+        rows = first._matrix.rows();
+        cols = first._matrix.cols();
+      }
+      if (cols != 1) {
+        shape.push_back(cols);
+      }
+      shape.push_back(rows);
+      value_size = static_cast<size_t>(rows * cols);
+      switch (atomic_type) {
+        case AtomicType::BOOLEAN:
+          result.push_back(fill_query_array<bool>(
+              samples, q, shape, value_size, [=](const NodeValue& v, bool* out) {
+                std::copy_n(v._bmatrix.data(), value_size, out);
+              }));
+          break;
+        case AtomicType::NATURAL:
+          result.push_back(fill_query_array<int64_t>(
+              samples,
+              q,
+              shape,
+              value_size,
+              [=](const NodeValue& v, int64_t* out) {
+                std::copy_n(v._nmatrix.data(), value_size, out);
+              }));
+          break;
+        default:
+          result.push_back(fill_query_array<double>(
+              samples,
+              q,
+              shape,
+              value_size,
+              [=](const NodeValue& v, double* out) {
+                std::copy_n(v._matrix.data(), value_size, out);
+              }));
+      }
+      continue;
+    }
+    switch (atomic_type) {
+      case AtomicType::BOOLEAN:
+        result.push_back(fill_query_array<bool>(
+            samples, q, shape, 1, [](const NodeValue& v, bool* out) {
+              *out = v._bool;
+            }));
+        break;
+      case AtomicType::NATURAL:
+        result.push_back(fill_query_array<int64_t>(
+            samples, q, shape, 1, [](const NodeValue& v, int64_t* out) {
+              *out = static_cast<int64_t>(v._natural);
+            }));
+        break;
+      case AtomicType::PROBABILITY:
+      case AtomicType::REAL:
+      case AtomicType::NEG_REAL:
+      case AtomicType::POS_REAL:
+        result.push_back(fill_query_array<double>(
+            samples, q, shape, 1, [](const NodeValue& v, double* out) {
+              *out = v._double;
+            }));
+        break;
+      default:
+        throw std::runtime_error("unexpected type for NodeValue");
+    }
+  }
+  return result;
+}
+
+} // namespace
+
 PYBIND11_MODULE(graph, module) {
   module.doc() = "module for python bindings to the graph API";
 
@@ -126,18 +245,22 @@ PYBIND11_MODULE(graph, module) {
   py::enum_<InferenceType>(module, "InferenceType")
       .value("REJECTION", InferenceType::REJECTION)
       .value("GIBBS", InferenceType::GIBBS)
-      .value("NMC", InferenceType::NMC);
+      .value("NMC", InferenceType::NMC)
+      .value("HMC", InferenceType::HMC)
+      .value("NUTS", InferenceType::NUTS);
 
   py::class_<Node>(module, "Node");
 
   py::class_<InferConfig>(module, "InferConfig")
       .def(py::init())
       .def(py::init<bool, double, double, uint, bool>())
+      .def(py::init<bool, double, double, uint, bool, bool>())
       .def_readwrite("keep_log_prob", &InferConfig::keep_log_prob)
       .def_readwrite("path_length", &InferConfig::path_length)
       .def_readwrite("step_size", &InferConfig::step_size)
       .def_readwrite("num_warmup", &InferConfig::num_warmup)
-      .def_readwrite("keep_warmup", &InferConfig::keep_warmup);
+      .def_readwrite("keep_warmup", &InferConfig::keep_warmup)
+      .def_readwrite("adapt_mass_matrix", &InferConfig::adapt_mass_matrix);
 
   // CONSIDER: Remove the overloaded add_constant APIs; the overloaded API's
   // binding behaviour is a little confusing. For example,
@@ -314,6 +437,7 @@ PYBIND11_MODULE(graph, module) {
           (std::vector<double> & (Graph::*)(uint, InferenceType, uint)) &
               Graph::infer_mean,
           "infer the posterior mean of the queried nodes",
+          py::call_guard<py::gil_scoped_release>(),
           py::arg("num_samples"),
           py::arg("algorithm") = InferenceType::GIBBS,
           py::arg("seed") = 5123401)
@@ -323,6 +447,7 @@ PYBIND11_MODULE(graph, module) {
            (Graph::*)(uint, InferenceType, uint, uint, InferConfig)) &
               Graph::infer_mean,
           "infer the posterior mean of the queried nodes using multiple chains",
+          py::call_guard<py::gil_scoped_release>(),
           py::arg("num_samples"),
           py::arg("algorithm") = InferenceType::GIBBS,
           py::arg("seed") = 5123401,
@@ -334,6 +459,7 @@ PYBIND11_MODULE(graph, module) {
            (Graph::*)(uint, InferenceType, uint)) &
               Graph::infer,
           "infer the empirical distribution of the queried nodes",
+          py::call_guard<py::gil_scoped_release>(),
           py::arg("num_samples"),
           py::arg("algorithm") = InferenceType::GIBBS,
           py::arg("seed") = 5123401)
@@ -343,6 +469,32 @@ PYBIND11_MODULE(graph, module) {
            (Graph::*)(uint, InferenceType, uint, uint, InferConfig)) &
               Graph::infer,
           "infer the empirical distribution of the queried nodes using multiple chains",
+          py::call_guard<py::gil_scoped_release>(),
+          py::arg("num_samples"),
+          py::arg("algorithm") = InferenceType::GIBBS,
+          py::arg("seed") = 5123401,
+          py::arg("n_chains") = 4,
+          py::arg("infer_config") = InferConfig())
+      .def(
+          "infer_to_numpy",
+          [](Graph& g,
+             uint num_samples,
+             InferenceType algorithm,
+             uint seed,
+             uint n_chains,
+             InferConfig infer_config) {
+            const std::vector<std::vector<std::vector<NodeValue>>>* samples;
+            {
+              // the GIL is only needed to build the NumPy arrays
+              py::gil_scoped_release release;
+              samples =
+                  &g.infer(num_samples, algorithm, seed, n_chains, infer_config);
+            }
+            return samples_to_numpy(*samples);
+          },
+          "infer the empirical distribution of the queried nodes using multiple chains, "
+          "returning the samples of each query as a NumPy array of shape "
+          "(n_chains, num_samples, *value_shape)",
           py::arg("num_samples"),
           py::arg("algorithm") = InferenceType::GIBBS,
           py::arg("seed") = 5123401,
@@ -352,6 +504,7 @@ PYBIND11_MODULE(graph, module) {
           "variational",
           &Graph::variational,
           "infer the empirical distribution of the queried nodes",
+          py::call_guard<py::gil_scoped_release>(),
           py::arg("num_iters"),
           py::arg("steps_per_iter"),
           py::arg("seed") = 5123401,
@@ -390,6 +543,7 @@ PYBIND11_MODULE(graph, module) {
           "infer",
           &NUTS::infer,
           "infer",
+          py::call_guard<py::gil_scoped_release>(),
           py::arg("num_samples"),
           py::arg("seed"),
           py::arg("num_warmup_samples") = 0,
@@ -402,6 +556,7 @@ PYBIND11_MODULE(graph, module) {
           "infer",
           &HMC::infer,
           "infer",
+          py::call_guard<py::gil_scoped_release>(),
           py::arg("num_samples"),
           py::arg("seed"),
           py::arg("num_warmup_samples") = 0,
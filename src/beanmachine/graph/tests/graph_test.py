@@ -420,6 +420,34 @@ digraph "graph" {
         self.assertEqual(type(samples_all[1][0][1]), bool)
         self.assertTrue(samples_all[1][0][1])
 
+    def test_infer_to_numpy(self):
+        g = graph.Graph()
+        c1 = g.add_constant_probability(0.75)
+        d1 = g.add_distribution(
+            graph.DistributionType.BERNOULLI, graph.AtomicType.BOOLEAN, [c1]
+        )
+        op1 = g.add_operator(graph.OperatorType.SAMPLE, [d1])
+        c2 = g.add_constant_real_matrix(np.array([[1.0, 2.0, 3.0], [4.0, 5.0, 6.0]]))
+        g.query(op1)
+        g.query(c1)
+        g.query(c2)
+        samples = g.infer(num_samples=5, seed=17, n_chains=2)
+        arrays = g.infer_to_numpy(num_samples=5, seed=17, n_chains=2)
+        self.assertEqual(len(arrays), 3)
+        self.assertEqual(arrays[0].dtype, np.bool_)
+        self.assertEqual(arrays[0].shape, (2, 5))
+        self.assertEqual(arrays[1].dtype, np.float64)
+        np.testing.assert_array_equal(arrays[1], np.full((2, 5), 0.75))
+        # matrix values are transposed, since BMG stores matrices in columns
+        self.assertEqual(arrays[2].shape, (2, 5, 3, 2))
+        np.testing.assert_array_equal(
+            arrays[2][1, 4], np.array([[1.0, 4.0], [2.0, 5.0], [3.0, 6.0]])
+        )
+        # the same seed gives the same samples as infer
+        for chain in range(2):
+            for i in range(5):
+                self.assertEqual(arrays[0][chain, i], samples[chain][i][0])
+
     def test_infer_mean(self):
         g = graph.Graph()
         c1 = g.add_constant_probability(1.0)
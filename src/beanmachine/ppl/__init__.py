@@ -11,17 +11,22 @@ from .diagnostics.common_statistics import effective_sample_size, r_hat, split_r
 from .inference import (
     CompositionalInference,
     empirical,
+    GlobalEnumerativeGibbs,
     GlobalHamiltonianMonteCarlo,
     GlobalNoUTurnSampler,
+    ParallelTempering,
     RejectionSampling,
     seed,
     simulate,
     SingleSiteAncestralMetropolisHastings,
+    SingleSiteEnumerativeGibbs,
     SingleSiteHamiltonianMonteCarlo,
     SingleSiteNewtonianMonteCarlo,
     SingleSiteNoUTurnSampler,
     SingleSiteRandomWalk,
     SingleSiteUniformMetropolisHastings,
+    StochasticGradientHamiltonianMonteCarlo,
+    StochasticGradientLangevinDynamics,
 )
 from .model import (
     functional,
@@ -39,17 +44,22 @@ Distribution.set_default_validate_args(False)
 __all__ = [
     "CompositionalInference",
     "Diagnostics",
+    "GlobalEnumerativeGibbs",
     "GlobalHamiltonianMonteCarlo",
     "GlobalNoUTurnSampler",
+    "ParallelTempering",
     "Predictive",
     "RejectionSampling",
     "RVIdentifier",
     "SingleSiteAncestralMetropolisHastings",
+    "SingleSiteEnumerativeGibbs",
     "SingleSiteHamiltonianMonteCarlo",
     "SingleSiteNewtonianMonteCarlo",
     "SingleSiteNoUTurnSampler",
     "SingleSiteRandomWalk",
     "SingleSiteUniformMetropolisHastings",
+    "StochasticGradientHamiltonianMonteCarlo",
+    "StochasticGradientLangevinDynamics",
     "effective_sample_size",
     "empirical",
     "experimental",
@@ -4,7 +4,7 @@
 # LICENSE file in the root directory of this source tree.
 
 import math
-from typing import Any, Callable, Dict, List, Optional
+from typing import Any, Callable, Dict, List, Optional, Tuple
 
 import beanmachine.ppl.compiler.bmg_nodes as bn
 import beanmachine.ppl.compiler.bmg_types as bt
@@ -1000,8 +1000,14 @@ class BMGraphBuilder:
 
     # TODO: Should this be idempotent?
     # TODO: Should it be an error to add two unequal observations to one node?
-    def add_observation(self, observed: bn.SampleNode, value: Any) -> bn.Observation:
-        node = bn.Observation(observed, value)
+    def add_observation(
+        self,
+        observed: bn.SampleNode,
+        value: Any,
+        rvidentifier: Optional[RVIdentifier] = None,
+        value_index: Tuple[int, ...] = (),
+    ) -> bn.Observation:
+        node = bn.Observation(observed, value, rvidentifier, value_index)
         self.add_node(node)
         return node
 
@@ -13,6 +13,7 @@ import types
 from typing import Any, Callable, Dict, List, Optional, Tuple
 
 import astor
+import beanmachine.ppl.compiler.lifted_cache as lifted_cache
 from beanmachine.ppl.compiler.ast_patterns import (
     assign,
     ast_assert,
@@ -853,22 +854,12 @@ def _get_helper_arguments(
     return arguments
 
 
-def _bm_function_to_bmg_function(
-    original_function: Callable, runtime: BMGRuntime
-) -> Callable:
-
-    """Takes a function object and -- if possible -- returns a function of the same
-    signature which calls the BMGRuntime object on each operation that was in the
-    original function. If not possible, it returns the original function and we
-    hope that it did not do anything involving a stochastic quantity.
-    """
-
-    # We only know how to transform certain kinds of code containers.
-    # If we don't have one of those, just return the function unmodified
-    # and hope for the best.
-
-    if type(original_function) not in _supported_code_containers:
-        return original_function
+def _lift_function(
+    original_function: Callable,
+) -> Optional[lifted_cache.LiftedFunction]:
+    """Takes a function object and returns the compiled (but not yet executed)
+    helper which creates the transformed function, or None if the function could
+    not be transformed."""
 
     # First obtain the transformed function itself; the resulting AST will not
     # yet be closed over either the runtime or any outer variables of the
@@ -876,7 +867,7 @@ def _bm_function_to_bmg_function(
 
     transformed_body, name, original_source = _transform_function(original_function)
     if transformed_body is None:
-        return original_function
+        return None
 
     # Now create a helper function wrapping the transformed function; this
     # wrapper creates a closure.
@@ -899,6 +890,43 @@ def _bm_function_to_bmg_function(
         # bug in the AST rewriting step. Report the error here.
         raise LiftedCompilationError(original_source, helper_ast, ex) from ex
 
+    return lifted_cache.LiftedFunction(
+        helper_name,
+        original_source,
+        helper_ast,
+        astor.to_source(helper_ast),
+        compiled_helper,
+    )
+
+
+def _bm_function_to_bmg_function(
+    original_function: Callable, runtime: BMGRuntime
+) -> Callable:
+
+    """Takes a function object and -- if possible -- returns a function of the same
+    signature which calls the BMGRuntime object on each operation that was in the
+    original function. If not possible, it returns the original function and we
+    hope that it did not do anything involving a stochastic quantity.
+    """
+
+    # We only know how to transform certain kinds of code containers.
+    # If we don't have one of those, just return the function unmodified
+    # and hope for the best.
+
+    if type(original_function) not in _supported_code_containers:
+        return original_function
+
+    # If the on-disk cache is enabled and a previous process has already lifted
+    # this function, we can skip straight to executing the compiled helper.
+    cache_key = lifted_cache.cache_key(original_function)
+    lifted = lifted_cache.load(cache_key)
+    if lifted is None:
+        lifted = _lift_function(original_function)
+        if lifted is None:
+            return original_function
+        lifted_cache.store(cache_key, lifted)
+    helper_name = lifted.helper_name
+
     # The AST is now compiled into bytecode but has not yet been executed.
     # That bytecode, when executed, will define a module containing the
     # helper function.
@@ -916,7 +944,7 @@ def _bm_function_to_bmg_function(
     # we've just compiled, that will add the helper method to the global variable
     # dictionary.
 
-    exec(compiled_helper, original_globals)  # noqa
+    exec(lifted.compiled_helper, original_globals)  # noqa
 
     # The helper function is now in the global variables. Obtain it and call it.
 
@@ -929,9 +957,9 @@ def _bm_function_to_bmg_function(
 
     transformed_function.runtime = runtime
     transformed_function.original_function = original_function
-    transformed_function.original_source = original_source
-    transformed_function.transformed_ast = helper_ast
-    transformed_function.transformed_source = astor.to_source(helper_ast)
+    transformed_function.original_source = lifted.original_source
+    transformed_function.transformed_ast = lifted.helper_ast
+    transformed_function.transformed_source = lifted.transformed_source
     return transformed_function
 
 
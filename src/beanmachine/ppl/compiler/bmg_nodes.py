@@ -4,7 +4,7 @@
 # LICENSE file in the root directory of this source tree.
 
 from abc import ABC, ABCMeta
-from typing import Any, Iterable, List
+from typing import Any, Iterable, List, Optional, Tuple
 
 import beanmachine.ppl.compiler.bmg_types as bt
 import torch
@@ -1473,19 +1473,38 @@ class Observation(BMGNode):
     # without knowing the observations ahead of time.
     value: Any
 
-    def __init__(self, observed: BMGNode, value: Any):
+    def __init__(
+        self,
+        observed: BMGNode,
+        value: Any,
+        rvidentifier: Optional[RVIdentifier] = None,
+        value_index: Tuple[int, ...] = (),
+    ):
         # The observed node is required to be a sample by BMG,
         # but during model transformations it is possible for
         # an observation to temporarily observe a non-sample.
         # TODO: Consider adding a verification pass which ensures
         # this invariant is maintained by the rewriters.
         self.value = value
+        # We track which observed random variable (and which element of its
+        # value, if the observation was split by the rewriters) this observation
+        # came from, so that a compiled graph can be reused with new values.
+        self._rvidentifier = rvidentifier
+        self._value_index = value_index
         BMGNode.__init__(self, [observed])
 
     @property
     def observed(self) -> BMGNode:
         return self.inputs[0]
 
+    @property
+    def rv_identifier(self) -> Optional[RVIdentifier]:
+        return self._rvidentifier
+
+    @property
+    def value_index(self) -> Tuple[int, ...]:
+        return self._value_index
+
     def __str__(self) -> str:
         return str(self.observed) + "=" + str(self.value)
 
@@ -3,7 +3,8 @@
 # This source code is licensed under the MIT license found in the
 # LICENSE file in the root directory of this source tree.
 
-from typing import Callable, List, Optional, Tuple, Type, Union
+from collections import deque
+from typing import Callable, Deque, Dict, List, Optional, Set, Tuple, Type, Union
 
 import beanmachine.ppl.compiler.bmg_nodes as bn
 from beanmachine.ppl.compiler.bm_graph_builder import BMGraphBuilder
@@ -175,6 +176,155 @@ def ancestors_first_graph_fixer(  # noqa
     return ancestors_first
 
 
+def worklist_graph_fixer(  # noqa
+    typer: TyperBase,
+    node_fixer: NodeFixer,
+    get_error: Optional[Callable[[bn.BMGNode, int], Optional[BMGError]]] = None,
+    lookahead: int = 1,
+) -> GraphFixer:
+    # This has the same effect as
+    #
+    #   fixpoint_graph_fixer(ancestors_first_graph_fixer(typer, node_fixer, get_error))
+    #
+    # but is incremental: rather than enumerating every ancestor node again after each
+    # pass that made progress, we keep a worklist of the nodes whose input edges must
+    # be examined. Initially that is every ancestor node, in topological order. After
+    # that, a node only goes back on the worklist if fixing its inputs could now give
+    # a different result than last time.
+    #
+    # The node fixer may look at the types, inputs and outputs of the nodes up to
+    # lookahead edges below the node it is given; log1mexp_fixer, for example, checks
+    # the type of the operand of an exp four edges below the log it rewrites. So when
+    # a node is replaced, gains or loses inputs or outputs, or changes type, the
+    # result of fixing it or any node with it up to lookahead edges below may now be
+    # different; past that depth, a change is only followed up chains of nodes that
+    # each have a single consumer. The typer tells us which nodes changed type when it propagates an
+    # update. A replacement is a new node that has not been fixed yet, and neither
+    # have its inputs, so they are queued as well.
+    #
+    # As in the ancestors-first fixer, the result of the node fixer is memoized; the
+    # memo of a node is discarded whenever it is invalidated as above, except that
+    # a node which has been replaced keeps its replacement, so that all of its
+    # consumers share the same replacement node even if the node itself would no
+    # longer be replaced once some of them no longer use it.
+    #
+    # Nodes that are no longer ancestors of a sample, query, observation or factor
+    # may still be on the worklist when they are orphaned by a replacement. To avoid
+    # reporting errors on edges that are not part of the final graph, fatal edges
+    # are only turned into errors at the end, if they are still in the graph.
+    def worklist(bmg: BMGraphBuilder) -> GraphFixerResult:
+        replacements: Dict[bn.BMGNode, bn.BMGNode] = {}
+        reported: Set[bn.BMGNode] = set()
+        fatal_edges: List[Tuple[bn.BMGNode, int]] = []
+        work: Deque[bn.BMGNode] = deque()
+        queued: Set[bn.BMGNode] = set()
+        examined: Set[bn.BMGNode] = set()
+        made_progress = False
+
+        def enqueue(n: bn.BMGNode) -> None:
+            if n not in queued:
+                queued.add(n)
+                work.append(n)
+
+        def forget(n: bn.BMGNode) -> None:
+            # A node which has been replaced keeps its replacement.
+            if replacements.get(n) is n:
+                del replacements[n]
+            reported.discard(n)
+
+        def invalidate(n: bn.BMGNode) -> None:
+            # Fixing n, or any node which has n up to lookahead edges below it,
+            # might now give a different result, so every node which has one of
+            # them as an input must be examined again.
+            forget(n)
+            stack = [(n, 0)]
+            seen = {n}
+            while len(stack) > 0:
+                m, depth = stack.pop()
+                for o in m.outputs.items:
+                    enqueue(o)
+                    # Fixers which merge a node into its only consumer, such as
+                    # multiary_addition_fixer, look down chains of such nodes
+                    # however long they are.
+                    if o not in seen and (
+                        depth < lookahead or len(m.outputs.items) == 1
+                    ):
+                        seen.add(o)
+                        forget(o)
+                        stack.append((o, depth + 1))
+
+        def enqueue_new(n: bn.BMGNode) -> None:
+            # A fixer may build several new nodes at once, so the inputs of a
+            # replacement might be new nodes whose own inputs have not been
+            # examined either. The existing inputs of a new node have gained an
+            # output.
+            stack = [n]
+            while len(stack) > 0:
+                m = stack.pop()
+                if m not in examined:
+                    examined.add(m)
+                    enqueue(m)
+                    for i in m.inputs:
+                        if i in examined:
+                            invalidate(i)
+                        else:
+                            stack.append(i)
+
+        # The whole worklist counts as one iteration of the fixpoint it replaces.
+        pd = bmg._pd
+        if pd is not None:
+            pd.count_iteration()
+
+        for n in bmg.all_ancestor_nodes():
+            examined.add(n)
+            enqueue(n)
+
+        while len(work) > 0:
+            node = work.popleft()
+            queued.remove(node)
+            node_was_updated = False
+            for i in range(len(node.inputs)):
+                c = node.inputs[i]
+                if c in reported:
+                    continue
+                replacement = replacements.get(c)
+                if replacement is None:
+                    replacement = node_fixer(c)
+
+                if isinstance(replacement, bn.BMGNode):
+                    replacements[c] = replacement
+                    if replacement is not c:
+                        node.inputs[i] = replacement
+                        node_was_updated = True
+                        made_progress = True
+                        enqueue_new(replacement)
+                        # Both nodes have a different set of outputs now.
+                        invalidate(c)
+                        invalidate(replacement)
+                elif replacement is Fatal:
+                    reported.add(c)
+                    fatal_edges.append((node, i))
+
+            if node_was_updated:
+                invalidate(node)
+                for changed in typer.update_type(node):
+                    invalidate(changed)
+                # The new inputs of the node have not been fixed yet.
+                enqueue(node)
+
+        errors = ErrorReport()
+        if get_error is not None and len(fatal_edges) > 0:
+            live = set(bmg.all_ancestor_nodes())
+            for node, i in dict.fromkeys(fatal_edges):
+                if node in live and node.inputs[i] in reported:
+                    error = get_error(node, i)
+                    if error is not None:
+                        errors.add_error(error)
+        return bmg, made_progress, errors
+
+    return worklist
+
+
 def edge_error_pass(
     get_error: Callable[[BMGraphBuilder, bn.BMGNode, int], Optional[BMGError]]
 ) -> GraphFixer:
@@ -246,6 +396,9 @@ def fixpoint_graph_fixer(fixer: GraphFixer) -> GraphFixer:
     def fixpoint(bmg: BMGraphBuilder) -> GraphFixerResult:
         current = bmg
         while True:
+            pd = current._pd
+            if pd is not None:
+                pd.count_iteration()
             current, made_progress, errors = fixer(current)
             if not made_progress or errors.any():
                 return current, made_progress, errors
@@ -253,4 +406,21 @@ def fixpoint_graph_fixer(fixer: GraphFixer) -> GraphFixer:
     return fixpoint
 
 
+def profiled_graph_fixer(name: str, fixer: GraphFixer) -> GraphFixer:
+    """If the graph has profiler data, records the time taken by the given graph
+    fixer, the number of nodes before and after it runs, and the number of fixpoint
+    iterations and type computations in it, under the given name."""
+
+    def profiled(bmg: BMGraphBuilder) -> GraphFixerResult:
+        pd = bmg._pd
+        if pd is None:
+            return fixer(bmg)
+        p = pd.begin_pass(name, len(bmg.all_ancestor_nodes()))
+        current, made_progress, errors = fixer(bmg)
+        pd.finish_pass(p, len(current.all_ancestor_nodes()))
+        return current, made_progress, errors
+
+    return profiled
+
+
 # TODO: Create a fixpoint combinator on GraphFixers.
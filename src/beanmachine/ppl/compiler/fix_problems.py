@@ -39,12 +39,13 @@ from beanmachine.ppl.compiler.fix_observe_true import observe_true_fixer
 from beanmachine.ppl.compiler.fix_problem import (
     ancestors_first_graph_fixer,
     conditional_graph_fixer,
-    fixpoint_graph_fixer,
     GraphFixer,
     GraphFixerResult,
     node_fixer_first_match,
     NodeFixer,
+    profiled_graph_fixer,
     sequential_graph_fixer,
+    worklist_graph_fixer,
 )
 from beanmachine.ppl.compiler.fix_requirements import requirements_fixer
 from beanmachine.ppl.compiler.fix_transpose import identity_transpose_fixer
@@ -87,8 +88,11 @@ def arithmetic_graph_fixer(skip: Set[str]) -> GraphFixer:
         ]
         node_fixers = [nf for nf in node_fixers if nf.__name__ not in skip]
         node_fixer = node_fixer_first_match(node_fixers)
-        arith = ancestors_first_graph_fixer(typer, node_fixer)
-        return fixpoint_graph_fixer(arith)(bmg)
+        # Rather than repeatedly passing over the whole graph until no fixer
+        # applies, only revisit the nodes affected by each fix. The deepest
+        # pattern, in log1mexp_fixer, is log(1 - exp(x)) with x typed as
+        # negative real, four edges below the log.
+        return worklist_graph_fixer(typer, node_fixer, lookahead=4)(bmg)
 
     return _arithmetic_graph_fixer
 
@@ -99,6 +103,12 @@ _conjugacy_fixer_factories: List[Callable[[BMGraphBuilder], NodeFixer]] = [
     normal_normal_conjugate_fixer,
 ]
 
+# Optimizations which fold observed values into the graph; when any of them is
+# enabled, the generated graph is specific to the observed values.
+observation_dependent_optimizations: Set[str] = {
+    f.__name__ for f in _conjugacy_fixer_factories
+}
+
 
 def conjugacy_graph_fixer(skip: Set[str]) -> GraphFixer:
     def _conjugacy_graph_fixer(bmg: BMGraphBuilder) -> GraphFixerResult:
@@ -118,21 +128,25 @@ def fix_problems(
     current = bmg
     current._begin(prof.fix_problems)
 
-    all_fixers = sequential_graph_fixer(
-        [
-            copy,
-            vectorized_model_fixer(),
-            arithmetic_graph_fixer(skip_optimizations),
-            unsupported_node_reporter(),
-            bad_matmul_reporter(),
-            untypable_node_reporter(),
-            conjugacy_graph_fixer(skip_optimizations),
-            requirements_fixer,
-            observations_fixer,
+    passes = [
+        ("copy", copy),
+        ("vectorized_model_fixer", vectorized_model_fixer()),
+        ("arithmetic_graph_fixer", arithmetic_graph_fixer(skip_optimizations)),
+        ("unsupported_node_reporter", unsupported_node_reporter()),
+        ("bad_matmul_reporter", bad_matmul_reporter()),
+        ("untypable_node_reporter", untypable_node_reporter()),
+        ("conjugacy_graph_fixer", conjugacy_graph_fixer(skip_optimizations)),
+        ("requirements_fixer", requirements_fixer),
+        ("observations_fixer", observations_fixer),
+        (
+            "observe_true_fixer",
             conditional_graph_fixer(
                 condition=lambda gb: gb._fix_observe_true, fixer=observe_true_fixer
             ),
-        ]
+        ),
+    ]
+    all_fixers = sequential_graph_fixer(
+        [profiled_graph_fixer(name, fixer) for name, fixer in passes]
     )
     current, _, errors = all_fixers(current)
     current._finish(prof.fix_problems)
@@ -3,7 +3,7 @@
 # This source code is licensed under the MIT license found in the
 # LICENSE file in the root directory of this source tree.
 
-from typing import Callable, Dict, List, Type
+from typing import Callable, Dict, List, Optional, Type
 
 import beanmachine.ppl.compiler.bmg_nodes as bn
 from beanmachine.ppl.compiler.bm_graph_builder import BMGraphBuilder
@@ -24,7 +24,7 @@ from beanmachine.ppl.compiler.sizer import is_scalar, Sizer
 
 # TODO Move this to a utils module
 from beanmachine.ppl.compiler.support import _prod
-from torch import Size, tensor
+from torch import as_tensor, Size, tensor
 
 
 # These graph fixers turn vectorized models into unvectorized models.
@@ -44,6 +44,10 @@ from torch import Size, tensor
 #   return tensor([f0()), f1())])
 #
 # which we can represent in BMG.
+#
+# Devectorizing makes the size of the graph proportional to the number of tensor
+# elements, so where BMG has an equivalent matrix operator we keep the operation
+# vectorized instead; see _vectorized_matrix_operator_node_fixer below.
 
 
 def _is_fixable_size(s: Size) -> bool:
@@ -206,7 +210,10 @@ def _is_fixable_sample(sizer: Sizer, n: bn.BMGNode) -> bool:
 _indexable_node_types = [
     bn.ColumnIndexNode,
     bn.ConstantTensorNode,
+    bn.ElementwiseMultiplyNode,
     bn.IndexNode,
+    bn.MatrixAddNode,
+    bn.MatrixExpNode,
     bn.MatrixMultiplicationNode,
     bn.MatrixScaleNode,
     bn.SampleNode,
@@ -215,6 +222,34 @@ _indexable_node_types = [
     bn.UntypedConstantNode,
 ]
 
+# These are the node types which always produce a matrix in BMG when they are not
+# scalars, and so can be the operands of BMG matrix operators.
+_matrix_node_types = [
+    bn.ConstantTensorNode,
+    bn.ElementwiseMultiplyNode,
+    bn.MatrixAddNode,
+    bn.MatrixExpNode,
+    bn.MatrixMultiplicationNode,
+    bn.MatrixScaleNode,
+    bn.TensorNode,
+    bn.ToMatrixNode,
+    bn.UntypedConstantNode,
+]
+
+# These are the elementwise operators which we rewrite into BMG matrix operators,
+# and the BMG matrix operators themselves.
+_matrix_operator_node_types = [
+    bn.AdditionNode,
+    bn.ElementwiseMultiplyNode,
+    bn.ExpNode,
+    bn.MatrixAddNode,
+    bn.MatrixExpNode,
+    bn.MatrixMultiplicationNode,
+    bn.MatrixScaleNode,
+    bn.MultiplicationNode,
+    bn.NegateNode,
+]
+
 
 def _vectorized_distribution_node_fixer(bmg: BMGraphBuilder, sizer: Sizer) -> NodeFixer:
     distribution_factories = _distribution_factories(bmg)
@@ -238,30 +273,40 @@ def _vectorized_distribution_node_fixer(bmg: BMGraphBuilder, sizer: Sizer) -> No
         # And now everyone is happy; the operators get scalars and the
         # consumer gets a matrix.
         #
+        # If every element of the distribution takes the same arguments, as in
+        # Bernoulli([[0.5, 0.5], [0.5, 0.5]]) or Normal(mu, tensor([1.0, 1.0])),
+        # the samples are independent and identically distributed, and we
+        # generate a single distribution node which all of the samples share:
+        #
+        #                    --> sample -->
+        # scalars --> dist                  to_matrix  --> consumer
+        #                    --> sample -->
         #
-        # TODO: Consider optimizing distributions where the tensor elements are all
-        # the same; if we have Bernoulli([[0.5, 0.5], [0.5, 0.5]]) then that can be
-        # represented in BMG as an IID_SAMPLE(2,2) from Bernoulli(0.5). We could
-        # write another fixer which makes this transformation, or we could modify
-        # this fixer.  NOTE that not all inference algorithms might support
-        # IID_SAMPLE nodes; look into this before attempting the optimization.
+        # BMG can represent that as a single matrix-valued IID_SAMPLE node, but
+        # NMC, the default BMG inference, rejects unobserved matrix-valued
+        # samples, so we still generate one sample per element.
 
         if not _is_fixable_sample(sizer, node):
             return Inapplicable
         assert isinstance(node, bn.SampleNode)
         dist = node.operand
+        factory = distribution_factories[type(dist)]
+        size = sizer[dist]
+        iid_args = [_iid_argument(bmg, sizer, i) for i in dist.inputs]
+        if all(a is not None for a in iid_args):
+            b = factory(*iid_args)
+            samples = [bmg.add_sample(b) for _ in range(_prod(size))]
+            return bmg.add_tensor(size, *samples)
         # We need to generate n new distribution and sample nodes, each of
         # which takes some scalar indexed from its inputs. The factory method that
         # builds the distribution is in the distribution factories list.
         # _generate_arglists constructs the arguments to that factory method.
         arglists = _generate_arglists(bmg, sizer, dist)
         samples = []
-        factory = distribution_factories[type(dist)]
         for arglist in arglists:
             b = factory(*arglist)
             s = bmg.add_sample(b)
             samples.append(s)
-        size = sizer[dist]
         # We now have n new operator nodes; stick them into a tensor.  We then
         # return that tensor. The caller will retarget the input edge of the
         # consumer from the original operator to the tensor, and the graph is
@@ -272,6 +317,101 @@ def _vectorized_distribution_node_fixer(bmg: BMGraphBuilder, sizer: Sizer) -> No
     return vect_dist_fixer
 
 
+def _is_constant(n: bn.BMGNode) -> bool:
+    return isinstance(n, (bn.ConstantTensorNode, bn.UntypedConstantNode))
+
+
+def _iid_argument(
+    bmg: BMGraphBuilder, sizer: Sizer, n: bn.BMGNode
+) -> Optional[bn.BMGNode]:
+    # The scalar argument that every element of a vectorized distribution takes
+    # from its input n, or None if the elements take different arguments.
+    if is_scalar(sizer[n]):
+        return n
+    if _is_constant(n):
+        values = as_tensor(n.value).reshape(-1)
+        if bool((values == values[0]).all()):
+            return bmg.add_constant(values[0])
+    return None
+
+
+def _has_stochastic_operand(node: bn.BMGNode) -> bool:
+    # Operators on constants only are folded into a constant instead.
+    return not all(_is_constant(i) for i in node.inputs)
+
+
+def _feeds_matrix_operators(node: bn.BMGNode) -> bool:
+    return all(
+        isinstance(o, tuple(_matrix_operator_node_types)) for o in node.outputs.items
+    )
+
+
+def _keeps_element_type(node: bn.BMGNode) -> bool:
+    # BMG matrix operators require operands of the same type, so their result
+    # can be less precise than that of the scalar operators:
+    #
+    # * The product of a positive constant and a negative real is known to be
+    #   a negative real, but the elementwise product of a positive real matrix
+    #   and a negative real matrix is only known to be a real matrix. We leave
+    #   multiplications by constants to the scalar operators.
+    # * The negation of a positive real is a negative real, but the matrix
+    #   scale of a positive real matrix by -1 is a real matrix. We only rewrite
+    #   a negation whose result stays a matrix; if it is indexed right away,
+    #   the scalar negations cost nothing extra and stay visible to later
+    #   rewrites such as log1p(-x) to log(complement(x)).
+    if isinstance(node, bn.MultiplicationNode):
+        return not any(_is_constant(i) for i in node.inputs)
+    if isinstance(node, bn.NegateNode):
+        return _feeds_matrix_operators(node)
+    return True
+
+
+def _vectorized_matrix_operator_node_fixer(
+    bmg: BMGraphBuilder, sizer: Sizer
+) -> NodeFixer:
+    def _is_matrix_node(n: bn.BMGNode) -> bool:
+        return isinstance(n, tuple(_matrix_node_types)) and _is_fixable_size(sizer[n])
+
+    def _same_size_matrix_operands(node: bn.BMGNode) -> bool:
+        # BMG matrix operators do not broadcast, so every operand must be a matrix
+        # of exactly the size of the result.
+        size = sizer[node]
+        return _is_fixable_size(size) and all(
+            _is_matrix_node(i) and sizer[i] == size for i in node.inputs
+        )
+
+    def vect_matrix_op_fixer(node: bn.BMGNode) -> NodeFixerResult:
+        # Rather than devectorizing an elementwise operator on matrices into one
+        # scalar operator per element, as _vectorized_operator_node_fixer does, we
+        # rewrite it into the equivalent BMG matrix operator when there is one:
+        #
+        # matrix + matrix  -->  MatrixAdd
+        # matrix * matrix  -->  ElementwiseMultiply
+        # exp(matrix)      -->  MatrixExp
+        # -matrix          -->  MatrixScale(-1, matrix)
+        #
+        # The graph then grows with the number of tensor operations in the model
+        # rather than the number of tensor elements. Consumers that need scalars
+        # still index into the result.
+        if not _has_stochastic_operand(node):
+            return Inapplicable
+        if not _same_size_matrix_operands(node):
+            return Inapplicable
+        if not _keeps_element_type(node):
+            return Inapplicable
+        if isinstance(node, bn.AdditionNode) and len(node.inputs) == 2:
+            return bmg.add_matrix_addition(node.inputs[0], node.inputs[1])
+        if isinstance(node, bn.MultiplicationNode) and len(node.inputs) == 2:
+            return bmg.add_elementwise_multiplication(node.inputs[0], node.inputs[1])
+        if isinstance(node, bn.ExpNode):
+            return bmg.add_matrix_exp(node.inputs[0])
+        if isinstance(node, bn.NegateNode):
+            return bmg.add_matrix_scale(bmg.add_constant(-1.0), node.inputs[0])
+        return Inapplicable
+
+    return vect_matrix_op_fixer
+
+
 def _operator_factories(bmg: BMGraphBuilder) -> Dict[Type, Callable]:
     return {
         # Note that we expect devectorization to run *before* multiary
@@ -376,9 +516,12 @@ def vop_fixer(bmg: BMGraphBuilder) -> GraphFixerResult:
     sizer = Sizer()
 
     dist_fixer = _vectorized_distribution_node_fixer(bmg, sizer)
+    matrix_oper_fixer = _vectorized_matrix_operator_node_fixer(bmg, sizer)
     oper_fixer = _vectorized_operator_node_fixer(bmg, sizer)
     scale_fixer = matrix_scale_fixer(bmg, sizer)
-    node_fixer = node_fixer_first_match([dist_fixer, oper_fixer, scale_fixer])
+    node_fixer = node_fixer_first_match(
+        [dist_fixer, matrix_oper_fixer, oper_fixer, scale_fixer]
+    )
     vof = ancestors_first_graph_fixer(sizer, node_fixer)
     bmg, made_progress, errors = vof(bmg)
 
@@ -410,14 +553,18 @@ def vobs_fixer(bmg: BMGraphBuilder) -> GraphFixerResult:
             for i in range(0, observed._size[0]):
                 s = observed.inputs[i]
                 assert isinstance(s, bn.SampleNode)
-                bmg.add_observation(s, o.value[i])
+                bmg.add_observation(
+                    s, o.value[i], o.rv_identifier, o.value_index + (i,)
+                )
         else:
             assert dim == 2
             for i in range(0, observed._size[0]):
                 for j in range(0, observed._size[1]):
                     s = observed.inputs[i * observed._size[1] + j]
                     assert isinstance(s, bn.SampleNode)
-                    bmg.add_observation(s, o.value[i][j])
+                    bmg.add_observation(
+                        s, o.value[i][j], o.rv_identifier, o.value_index + (i, j)
+                    )
         bmg.remove_leaf(o)
         made_change = True
     return bmg, made_change, ErrorReport()
@@ -3,7 +3,7 @@
 # This source code is licensed under the MIT license found in the
 # LICENSE file in the root directory of this source tree.
 
-from typing import Dict, List, Set
+from typing import Any, Dict, List, Set
 
 import beanmachine.ppl.compiler.bmg_nodes as bn
 import beanmachine.ppl.compiler.profiler as prof
@@ -15,11 +15,20 @@ from beanmachine.ppl.compiler.bmg_node_types import (
     factor_type,
     operator_type,
 )
-from beanmachine.ppl.compiler.bmg_types import _size_to_rc
+from beanmachine.ppl.compiler.bmg_types import (
+    _size_to_rc,
+    Boolean,
+    Natural,
+    supremum,
+    type_of_value,
+)
+from beanmachine.ppl.compiler.error_report import ErrorReport, ImpossibleObservation
 from beanmachine.ppl.compiler.fix_problems import (
     default_skip_optimizations,
     fix_problems,
 )
+from beanmachine.ppl.compiler.lattice_typer import LatticeTyper
+from beanmachine.ppl.model.rv_identifier import RVIdentifier
 
 
 def _reshape(t: torch.Tensor):
@@ -34,15 +43,51 @@ class GeneratedGraph:
     bmg: BMGraphBuilder
     node_to_graph_id: Dict[bn.BMGNode, int]
     query_to_query_id: Dict[bn.Query, int]
+    observations: List[bn.Observation]
 
     def __init__(self, bmg: BMGraphBuilder) -> None:
         self.graph = Graph()
         self.bmg = bmg
         self.node_to_graph_id = {}
         self.query_to_query_id = {}
+        self.observations = []
 
     def _add_observation(self, node: bn.Observation) -> None:
         self.graph.observe(self.node_to_graph_id[node.observed], node.value)
+        self.observations.append(node)
+
+    def rebind_observations(self, observations: Dict[RVIdentifier, Any]) -> None:
+        """Replace the observed values in the generated graph with new values for
+        the same random variables, without recompiling the model. This is only valid
+        if the structure of the graph does not depend on the observed values, that is
+        if the new values have the same shapes as the old ones and no optimization
+        which folds observed values into the graph has been applied."""
+        typer = LatticeTyper()
+        errors = ErrorReport()
+        for o in self.observations:
+            rv = o.rv_identifier
+            assert rv is not None
+            v = observations[rv]
+            for i in o.value_index:
+                v = v[i]
+            # Convert the value in the same way that the observations fixer did
+            # when the graph was compiled.
+            sample_type = typer[o.observed]
+            if supremum(type_of_value(v), sample_type) != sample_type:
+                o.value = v
+                errors.add_error(ImpossibleObservation(o, sample_type))
+                continue
+            if isinstance(o.value, bool) or sample_type == Boolean:
+                v = bool(v)
+            elif isinstance(o.value, int) or sample_type == Natural:
+                v = int(v)
+            elif isinstance(o.value, float):
+                v = float(v)
+            o.value = v
+        errors.raise_errors()
+        self.graph.remove_observations()
+        for o in self.observations:
+            self.graph.observe(self.node_to_graph_id[o.observed], o.value)
 
     def _add_query(self, node: bn.Query) -> None:
         query_id = self.graph.query(self.node_to_graph_id[node.operator])
@@ -0,0 +1,127 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+#
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+
+"""An optional on-disk cache of lifted model functions, so that short-lived
+processes do not have to re-parse and re-transform every function of a model.
+
+The cache is enabled by setting the environment variable
+BEANSTALK_LIFTED_CACHE_DIR to a directory, or by setting
+_lifted_cache_dir in this module. The lifted code depends only on the source code of
+the original function and the names of its outer variables; the values of global
+and outer variables are bound when the cached code is loaded, exactly as when the
+code is freshly generated."""
+
+import ast
+import hashlib
+import importlib.util
+import inspect
+import marshal
+import os
+import pickle
+import tempfile
+from typing import Callable, NamedTuple, Optional
+
+import beanmachine
+
+
+_BEANSTALK_LIFTED_CACHE_DIR = "BEANSTALK_LIFTED_CACHE_DIR"
+
+# Increment this whenever the lifting transformation changes in a way which is
+# not reflected in the beanmachine version, so that stale entries are not used.
+_LIFTED_CACHE_FORMAT = 1
+
+# You can set this to a directory to enable the cache without using the
+# environment variable.
+_lifted_cache_dir: Optional[str] = None
+
+
+class LiftedFunction(NamedTuple):
+    helper_name: str
+    original_source: str
+    helper_ast: ast.AST
+    transformed_source: str
+    compiled_helper: object
+
+
+def _cache_dir() -> Optional[str]:
+    return _lifted_cache_dir or os.environ.get(_BEANSTALK_LIFTED_CACHE_DIR)
+
+
+def cache_key(f: Callable) -> Optional[str]:
+    """Returns the key of the given function in the cache, or None if the cache is
+    disabled or the source code of the function is not available."""
+    if _cache_dir() is None:
+        return None
+    try:
+        lines, _ = inspect.getsourcelines(f)
+    except (OSError, TypeError):
+        return None
+    code = getattr(f, "__code__", None)
+    freevars = code.co_freevars if code is not None else ()
+    h = hashlib.sha256()
+    for part in [
+        str(_LIFTED_CACHE_FORMAT),
+        beanmachine.__version__,
+        importlib.util.MAGIC_NUMBER.hex(),
+        f.__name__,
+        ",".join(freevars),
+        "".join(lines),
+    ]:
+        h.update(part.encode("utf-8"))
+        h.update(b"\0")
+    return h.hexdigest()
+
+
+def _path(key: str) -> str:
+    directory = _cache_dir()
+    assert directory is not None
+    return os.path.join(directory, key + ".lifted")
+
+
+def load(key: Optional[str]) -> Optional[LiftedFunction]:
+    if key is None:
+        return None
+    try:
+        with open(_path(key), "rb") as f:
+            entry = pickle.load(f)
+        return LiftedFunction(
+            entry["helper_name"],
+            entry["original_source"],
+            entry["helper_ast"],
+            entry["transformed_source"],
+            marshal.loads(entry["compiled_helper"]),
+        )
+    except Exception:
+        # A missing, stale or corrupt entry is just a cache miss.
+        return None
+
+
+def store(key: Optional[str], lifted: LiftedFunction) -> None:
+    if key is None:
+        return
+    entry = {
+        "helper_name": lifted.helper_name,
+        "original_source": lifted.original_source,
+        "helper_ast": lifted.helper_ast,
+        "transformed_source": lifted.transformed_source,
+        "compiled_helper": marshal.dumps(lifted.compiled_helper),
+    }
+    path = _path(key)
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Many processes may populate the cache concurrently; write to a temporary
+        # file and atomically move it into place so readers never see a partial
+        # entry.
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                pickle.dump(entry, f)
+            os.replace(temp_path, path)
+        except BaseException:
+            os.remove(temp_path)
+            raise
+    except OSError:
+        # Failing to populate the cache should never fail the compilation.
+        pass
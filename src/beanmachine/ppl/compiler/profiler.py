@@ -4,6 +4,7 @@
 # LICENSE file in the root directory of this source tree.
 
 import time
+from contextvars import ContextVar, Token
 from typing import Dict, List, Optional
 
 
@@ -65,13 +66,49 @@ class ProfileReport:
         return self._to_string("")
 
 
+class PassStatistics:
+    """Statistics of one run of a compiler pass. The node counts are the number of
+    nodes that are ancestors of a sample, query, observation or factor; iterations
+    is the number of iterations of the fixpoint combinators in the pass, and
+    type_computations is the number of times a typer computed the type of a node."""
+
+    name: str
+    total_time: int
+    nodes_before: int
+    nodes_after: int
+    iterations: int
+    type_computations: int
+
+    def __init__(self, name: str, nodes_before: int) -> None:
+        self.name = name
+        self.total_time = 0
+        self.nodes_before = nodes_before
+        self.nodes_after = nodes_before
+        self.iterations = 0
+        self.type_computations = 0
+        self._begin_time = 0
+        self._token: Optional[Token] = None
+
+    def __str__(self) -> str:
+        return (
+            f"{self.name}: {self.total_time // 1000000} ms, "
+            + f"nodes {self.nodes_before} -> {self.nodes_after}, "
+            + f"iterations {self.iterations}, "
+            + f"type computations {self.type_computations}"
+        )
+
+
 class ProfilerData:
     events: List[Event]
     in_flight: List[Event]
+    passes: List[PassStatistics]
+    passes_in_flight: List[PassStatistics]
 
     def __init__(self) -> None:
         self.events = []
         self.in_flight = []
+        self.passes = []
+        self.passes_in_flight = []
 
     def begin(self, kind: str, timestamp: Optional[int] = None) -> None:
 
@@ -89,6 +126,35 @@ class ProfilerData:
             if top.kind == kind:
                 break
 
+    def begin_pass(self, name: str, nodes_before: int) -> PassStatistics:
+        # A pass is also recorded as an event, so that it shows up in the profile
+        # report nested within the enclosing phase.
+        p = PassStatistics(name, nodes_before)
+        p._begin_time = time.time_ns()
+        p._token = _current_profiler_data.set(self)
+        self.passes.append(p)
+        self.passes_in_flight.append(p)
+        self.begin(name, p._begin_time)
+        return p
+
+    def finish_pass(self, p: PassStatistics, nodes_after: int) -> None:
+        t = time.time_ns()
+        self.finish(p.name, t)
+        assert self.passes_in_flight[-1] is p
+        self.passes_in_flight.pop()
+        assert p._token is not None
+        _current_profiler_data.reset(p._token)
+        p.total_time = t - p._begin_time
+        p.nodes_after = nodes_after
+
+    def count_iteration(self) -> None:
+        if len(self.passes_in_flight) > 0:
+            self.passes_in_flight[-1].iterations += 1
+
+    def count_type_computation(self) -> None:
+        if len(self.passes_in_flight) > 0:
+            self.passes_in_flight[-1].type_computations += 1
+
     def __str__(self) -> str:
         return "\n".join(str(e) for e in self.events)
 
@@ -148,3 +214,18 @@ def event_list_to_report(events) -> ProfileReport:
     assert len(begins) == 0
     assert current == root
     return root
+
+
+# The profiler data of the compile whose compiler pass is running in the current
+# thread, if any. Typers do not know which compile they serve, so they count the
+# types they compute in it rather than in a global counter, which concurrent
+# compiles would mix up.
+_current_profiler_data: ContextVar[Optional[ProfilerData]] = ContextVar(
+    "_current_profiler_data", default=None
+)
+
+
+def count_type_computation() -> None:
+    pd = _current_profiler_data.get()
+    if pd is not None:
+        pd.count_type_computation()
@@ -0,0 +1,90 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+#
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+
+"""Tests for reusing compiled graphs across calls to BMGInference.infer"""
+import asyncio
+import unittest
+
+import beanmachine.ppl as bm
+from beanmachine.ppl.inference import BMGInference
+from torch import tensor
+from torch.distributions import Bernoulli, Beta
+
+
+@bm.random_variable
+def coin():
+    return Beta(2.0, 2.0)
+
+
+@bm.random_variable
+def flip(n):
+    return Bernoulli(coin())
+
+
+class BMGCompileCacheTest(unittest.TestCase):
+    def test_compiled_graph_is_reused(self) -> None:
+        queries = [coin()]
+        inference = BMGInference(cache_compiled_graphs=True)
+
+        heads = {flip(i): tensor(1.0) for i in range(10)}
+        samples = inference.infer(queries, heads, 200, 1)
+        self.assertEqual(len(inference._compiled_graphs), 1)
+        graph = next(iter(inference._compiled_graphs.values()))
+        heads_mean = samples[coin()].mean()
+
+        # Only the observed values change, so the graph is reused.
+        tails = {flip(i): tensor(0.0) for i in range(10)}
+        samples = inference.infer(queries, tails, 200, 1)
+        self.assertEqual(len(inference._compiled_graphs), 1)
+        self.assertIs(next(iter(inference._compiled_graphs.values())), graph)
+        tails_mean = samples[coin()].mean()
+        self.assertGreater(heads_mean, 0.7)
+        self.assertLess(tails_mean, 0.3)
+
+        # A different set of observed random variables needs a new graph.
+        inference.infer(queries, {flip(0): tensor(1.0)}, 10, 1)
+        self.assertEqual(len(inference._compiled_graphs), 2)
+
+    def test_compiled_graph_is_not_cached(self) -> None:
+        queries = [coin()]
+        observations = {flip(0): tensor(1.0)}
+
+        inference = BMGInference()
+        inference.infer(queries, observations, 10, 1)
+        self.assertEqual(len(inference._compiled_graphs), 0)
+
+        # Conjugacy optimizations fold the observed values into the graph.
+        inference = BMGInference(cache_compiled_graphs=True)
+        inference.infer(queries, observations, 10, 1, skip_optimizations=set())
+        self.assertEqual(len(inference._compiled_graphs), 0)
+
+    def test_compiled_graph_impossible_observation(self) -> None:
+        queries = [coin()]
+        inference = BMGInference(cache_compiled_graphs=True)
+        inference.infer(queries, {flip(0): tensor(1.0)}, 10, 1)
+        with self.assertRaises(ValueError) as ex:
+            inference.infer(queries, {flip(0): tensor(0.5)}, 10, 1)
+        self.assertIn(
+            "A Bernoulli distribution is observed to have value", str(ex.exception)
+        )
+
+    def test_infer_async(self) -> None:
+        queries = [coin()]
+        inference = BMGInference(cache_compiled_graphs=True)
+
+        async def infer_both():
+            heads = {flip(i): tensor(1.0) for i in range(10)}
+            tails = {flip(i): tensor(0.0) for i in range(10)}
+            return await asyncio.gather(
+                inference.infer_async(queries, heads, 200, 1),
+                inference.infer_async(queries, tails, 200, 1),
+            )
+
+        # Both calls share a cached graph; they must not see each other's
+        # observations.
+        heads_samples, tails_samples = asyncio.run(infer_both())
+        self.assertEqual(len(inference._compiled_graphs), 1)
+        self.assertGreater(heads_samples[coin()].mean(), 0.7)
+        self.assertLess(tails_samples[coin()].mean(), 0.3)
@@ -0,0 +1,62 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+#
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+
+"""Tests for running the global HMC and NUTS algorithms of BMG through BMGInference"""
+import unittest
+
+import beanmachine.ppl as bm
+from beanmachine.graph import InferConfig, InferenceType
+from beanmachine.ppl.inference import BMGInference
+from torch import tensor
+from torch.distributions import Normal
+
+
+@bm.random_variable
+def mu():
+    return Normal(0.0, 2.0)
+
+
+@bm.random_variable
+def x(n):
+    return Normal(mu(), 1.0)
+
+
+# The exact posterior mean of mu is 8/9.
+observations = {x(0): tensor(0.5), x(1): tensor(1.5)}
+
+
+class BMGGlobalInferenceTest(unittest.TestCase):
+    def test_bmg_nuts(self) -> None:
+        infer_config = InferConfig()
+        infer_config.num_warmup = 500
+        samples = BMGInference().infer(
+            [mu()],
+            observations,
+            num_samples=1000,
+            num_chains=2,
+            inference_type=InferenceType.NUTS,
+            infer_config=infer_config,
+        )
+        self.assertEqual(samples[mu()].shape, (2, 1000))
+        self.assertAlmostEqual(samples[mu()].mean().item(), 8 / 9, delta=0.1)
+
+    def test_bmg_hmc(self) -> None:
+        infer_config = InferConfig()
+        infer_config.num_warmup = 500
+        infer_config.keep_warmup = True
+        infer_config.path_length = 1.0
+        infer_config.step_size = 0.1
+        samples = BMGInference().infer(
+            [mu()],
+            observations,
+            num_samples=1000,
+            num_chains=2,
+            inference_type=InferenceType.HMC,
+            infer_config=infer_config,
+        )
+        # The warmup samples are kept, but excluded by default.
+        self.assertEqual(samples[mu()].shape, (2, 1000))
+        self.assertEqual(samples.get_variable(mu(), True).shape, (2, 1500))
+        self.assertAlmostEqual(samples[mu()].mean().item(), 8 / 9, delta=0.1)
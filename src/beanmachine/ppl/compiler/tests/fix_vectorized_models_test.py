@@ -127,6 +127,21 @@ def normal_log_probs():
     return Normal(mu, gamma()).log_prob(x)
 
 
+@bm.functional
+def elementwise_operators():
+    return beta_2_2() * beta1234() - beta_2_2()
+
+
+@bm.random_variable
+def normal_3():
+    return Normal(tensor([0.0, 0.0, 0.0]), 1.0)
+
+
+@bm.functional
+def iid_operators():
+    return (normal_3() + normal_3() * 2.0).exp()
+
+
 class FixVectorizedModelsTest(unittest.TestCase):
     def test_fix_vectorized_models_1(self) -> None:
         self.maxDiff = None
@@ -792,8 +807,8 @@ digraph "graph" {
         observed = BMGInference().to_dot(queries, observations, after_transform=True)
         expected = """
 digraph "graph" {
-  N00[label=2];
-  N01[label=10.0];
+  N00[label=10.0];
+  N01[label=2];
   N02[label=2.0];
   N03[label=3.0];
   N04[label=Beta];
@@ -813,25 +828,11 @@ digraph "graph" {
   N18[label="+"];
   N19[label=ToMatrix];
   N20[label=MatrixScale];
-  N21[label=0];
-  N22[label=ColumnIndex];
-  N23[label=index];
-  N24[label=Exp];
-  N25[label=1];
-  N26[label=index];
-  N27[label=Exp];
-  N28[label=ColumnIndex];
-  N29[label=index];
-  N30[label=Exp];
-  N31[label=index];
-  N32[label=Exp];
-  N33[label=ToMatrix];
-  N34[label=Query];
-  N00 -> N19;
-  N00 -> N19;
-  N00 -> N33;
-  N00 -> N33;
-  N01 -> N20;
+  N21[label=MatrixExp];
+  N22[label=Query];
+  N00 -> N20;
+  N01 -> N19;
+  N01 -> N19;
   N02 -> N04;
   N02 -> N10;
   N03 -> N04;
@@ -853,27 +854,8 @@ digraph "graph" {
   N17 -> N18;
   N18 -> N19;
   N19 -> N20;
-  N20 -> N22;
-  N20 -> N28;
+  N20 -> N21;
   N21 -> N22;
-  N21 -> N23;
-  N21 -> N29;
-  N22 -> N23;
-  N22 -> N26;
-  N23 -> N24;
-  N24 -> N33;
-  N25 -> N26;
-  N25 -> N28;
-  N25 -> N31;
-  N26 -> N27;
-  N27 -> N33;
-  N28 -> N29;
-  N28 -> N31;
-  N29 -> N30;
-  N30 -> N33;
-  N31 -> N32;
-  N32 -> N33;
-  N33 -> N34;
 }
 """
         self.assertEqual(expected.strip(), observed.strip())
@@ -1084,3 +1066,150 @@ The log_prob was created in function call normal_log_probs().
         """
         observed = str(ex.exception)
         self.assertEqual(observed.strip(), expected.strip())
+
+    def test_fix_vectorized_models_12(self) -> None:
+        self.maxDiff = None
+        observations = {}
+        queries = [elementwise_operators()]
+
+        observed = BMGInference().to_dot(queries, observations, after_transform=False)
+
+        # The model before the rewrite:
+
+        expected = """
+digraph "graph" {
+  N00[label="[2.0,2.0]"];
+  N01[label="[3.0,4.0]"];
+  N02[label=Beta];
+  N03[label=Sample];
+  N04[label="[1.0,2.0]"];
+  N05[label=Beta];
+  N06[label=Sample];
+  N07[label="*"];
+  N08[label="-"];
+  N09[label="+"];
+  N10[label=Query];
+  N00 -> N02;
+  N01 -> N02;
+  N01 -> N05;
+  N02 -> N03;
+  N03 -> N07;
+  N03 -> N08;
+  N04 -> N05;
+  N05 -> N06;
+  N06 -> N07;
+  N07 -> N09;
+  N08 -> N09;
+  N09 -> N10;
+}
+"""
+        self.assertEqual(expected.strip(), observed.strip())
+
+        # After: the product, negation and sum of the vector samples are
+        # ElementwiseMultiply, MatrixScale and MatrixAdd nodes.
+
+        observed = BMGInference().to_dot(queries, observations, after_transform=True)
+        expected = """
+digraph "graph" {
+  N00[label=2];
+  N01[label=1];
+  N02[label=2.0];
+  N03[label=3.0];
+  N04[label=Beta];
+  N05[label=Sample];
+  N06[label=4.0];
+  N07[label=Beta];
+  N08[label=Sample];
+  N09[label=ToMatrix];
+  N10[label=ToRealMatrix];
+  N11[label=1.0];
+  N12[label=Beta];
+  N13[label=Sample];
+  N14[label=Beta];
+  N15[label=Sample];
+  N16[label=ToMatrix];
+  N17[label=ToRealMatrix];
+  N18[label=ElementwiseMult];
+  N19[label=-1.0];
+  N20[label=MatrixScale];
+  N21[label=MatrixAdd];
+  N22[label=Query];
+  N00 -> N09;
+  N00 -> N16;
+  N01 -> N09;
+  N01 -> N16;
+  N02 -> N04;
+  N02 -> N07;
+  N02 -> N14;
+  N03 -> N04;
+  N03 -> N12;
+  N04 -> N05;
+  N05 -> N09;
+  N06 -> N07;
+  N06 -> N14;
+  N07 -> N08;
+  N08 -> N09;
+  N09 -> N10;
+  N10 -> N18;
+  N10 -> N20;
+  N11 -> N12;
+  N12 -> N13;
+  N13 -> N16;
+  N14 -> N15;
+  N15 -> N16;
+  N16 -> N17;
+  N17 -> N18;
+  N18 -> N21;
+  N19 -> N20;
+  N20 -> N21;
+  N21 -> N22;
+}
+"""
+        self.assertEqual(expected.strip(), observed.strip())
+
+    def test_fix_vectorized_models_13(self) -> None:
+        self.maxDiff = None
+        observations = {}
+        queries = [iid_operators()]
+
+        observed = BMGInference().to_dot(queries, observations, after_transform=True)
+
+        # Every element of the vector sample has the same distribution, so the
+        # element samples share a single Normal node, and the operators on the
+        # vector stay matrix operators.
+
+        expected = """
+digraph "graph" {
+  N00[label=3];
+  N01[label=1];
+  N02[label=0.0];
+  N03[label=1.0];
+  N04[label=Normal];
+  N05[label=Sample];
+  N06[label=Sample];
+  N07[label=Sample];
+  N08[label=ToMatrix];
+  N09[label=2.0];
+  N10[label=MatrixScale];
+  N11[label=MatrixAdd];
+  N12[label=MatrixExp];
+  N13[label=Query];
+  N00 -> N08;
+  N01 -> N08;
+  N02 -> N04;
+  N03 -> N04;
+  N04 -> N05;
+  N04 -> N06;
+  N04 -> N07;
+  N05 -> N08;
+  N06 -> N08;
+  N07 -> N08;
+  N08 -> N10;
+  N08 -> N11;
+  N09 -> N10;
+  N10 -> N11;
+  N11 -> N12;
+  N12 -> N13;
+}
+"""
+        self.assertEqual(expected.strip(), observed.strip())
@@ -85,11 +85,11 @@ digraph "graph" {
   N06[label=1.0];
   N07[label=HalfNormal];
   N08[label=Sample];
-  N09[label=4.0];
-  N10[label=2];
-  N11[label="*"];
-  N12[label=-0.0];
-  N13[label=Exp];
+  N09[label=2];
+  N10[label=1];
+  N11[label=4.0];
+  N12[label="*"];
+  N13[label=0.0];
   N14[label="8.836000051815063e-05"];
   N15[label=2.0];
   N16[label="*"];
@@ -97,93 +97,92 @@ digraph "graph" {
   N18[label="**"];
   N19[label="*"];
   N20[label="-"];
-  N21[label=Exp];
-  N22[label=Exp];
-  N23[label=Exp];
-  N24[label=ToMatrix];
-  N25[label=ToPosRealMatrix];
-  N26[label=MatrixScale];
-  N27[label=0];
-  N28[label=ColumnIndex];
-  N29[label=index];
-  N30[label=0.0010000000474974513];
-  N31[label="+"];
-  N32[label=1];
-  N33[label=index];
-  N34[label=ColumnIndex];
+  N21[label=ToMatrix];
+  N22[label=MatrixExp];
+  N23[label=MatrixScale];
+  N24[label=ToRealMatrix];
+  N25[label="[[0.0010000000474974513,0.0],\\\\n[0.0,0.0010000000474974513]]"];
+  N26[label=MatrixAdd];
+  N27[label=Cholesky];
+  N28[label=0.0];
+  N29[label=Normal];
+  N30[label=Sample];
+  N31[label=Sample];
+  N32[label=ToMatrix];
+  N33[label="@"];
+  N34[label=0];
   N35[label=index];
-  N36[label=index];
-  N37[label="+"];
-  N38[label=ToMatrix];
-  N39[label=Cholesky];
-  N40[label=-0.0];
-  N41[label=Normal];
-  N42[label=Sample];
-  N43[label=Normal];
-  N44[label=Sample];
-  N45[label=ToMatrix];
-  N46[label="@"];
-  N47[label=index];
-  N48[label=Normal];
-  N49[label=Sample];
-  N50[label=Phi];
-  N51[label=Log];
-  N52[label="-"];
-  N53[label="*"];
-  N54[label="-"];
-  N55[label=29850.0];
+  N36[label=Normal];
+  N37[label=Sample];
+  N38[label=Phi];
+  N39[label=Log];
+  N40[label="-"];
+  N41[label="*"];
+  N42[label="-"];
+  N43[label=ToMatrix];
+  N44[label=ToRealMatrix];
+  N45[label=29850.0];
+  N46[label=complement];
+  N47[label=Log];
+  N48[label="-"];
+  N49[label="*"];
+  N50[label="-"];
+  N51[label=2016.0];
+  N52[label=index];
+  N53[label=Normal];
+  N54[label=Sample];
+  N55[label=Phi];
   N56[label=complement];
   N57[label=Log];
   N58[label="-"];
   N59[label="*"];
   N60[label="-"];
-  N61[label="+"];
-  N62[label=2016.0];
-  N63[label=index];
-  N64[label=Normal];
-  N65[label=Sample];
-  N66[label=Phi];
-  N67[label=complement];
-  N68[label=Log];
+  N61[label=ToMatrix];
+  N62[label=ToRealMatrix];
+  N63[label=MatrixAdd];
+  N64[label=index];
+  N65[label=index];
+  N66[label="+"];
+  N67[label=ToNegReal];
+  N68[label=Log1mexp];
   N69[label="-"];
-  N70[label="*"];
-  N71[label="-"];
-  N72[label="+"];
-  N73[label=ToReal];
-  N74[label=Log1mexp];
-  N75[label="-"];
-  N76[label=ToReal];
-  N77[label="+"];
-  N78[label="Bernoulli(logits)"];
-  N79[label=Sample];
-  N80[label="Observation True"];
-  N81[label=ToMatrix];
-  N82[label=Query];
+  N70[label=ToReal];
+  N71[label="+"];
+  N72[label="Bernoulli(logits)"];
+  N73[label=Sample];
+  N74[label="Observation True"];
+  N75[label=ToMatrix];
+  N76[label=Query];
   N00 -> N01;
   N01 -> N02;
-  N02 -> N11;
-  N02 -> N11;
+  N02 -> N12;
+  N02 -> N12;
   N03 -> N04;
   N04 -> N05;
   N05 -> N16;
   N05 -> N16;
   N06 -> N07;
-  N06 -> N41;
-  N06 -> N43;
+  N06 -> N29;
   N07 -> N08;
-  N08 -> N48;
-  N08 -> N64;
-  N09 -> N53;
-  N10 -> N24;
-  N10 -> N24;
-  N10 -> N38;
-  N10 -> N38;
-  N10 -> N45;
-  N10 -> N81;
-  N11 -> N26;
-  N12 -> N13;
+  N08 -> N36;
+  N08 -> N53;
+  N09 -> N21;
+  N09 -> N21;
+  N09 -> N32;
+  N09 -> N43;
+  N09 -> N61;
+  N09 -> N75;
+  N10 -> N32;
+  N10 -> N43;
+  N10 -> N52;
+  N10 -> N61;
+  N10 -> N65;
+  N10 -> N75;
+  N11 -> N41;
   N12 -> N23;
-  N13 -> N24;
+  N13 -> N21;
+  N13 -> N21;
+  N13 -> N43;
   N14 -> N19;
   N15 -> N16;
   N16 -> N18;
@@ -191,85 +190,69 @@ digraph "graph" {
   N18 -> N19;
   N19 -> N20;
   N20 -> N21;
-  N20 -> N22;
-  N21 -> N24;
-  N22 -> N24;
+  N20 -> N21;
+  N21 -> N22;
+  N22 -> N23;
   N23 -> N24;
-  N24 -> N25;
+  N24 -> N26;
   N25 -> N26;
-  N26 -> N28;
-  N26 -> N34;
-  N27 -> N28;
-  N27 -> N29;
-  N27 -> N35;
-  N27 -> N47;
+  N26 -> N27;
+  N27 -> N33;
   N28 -> N29;
-  N28 -> N33;
+  N29 -> N30;
   N29 -> N31;
-  N30 -> N31;
-  N30 -> N37;
-  N31 -> N38;
+  N30 -> N32;
+  N31 -> N32;
   N32 -> N33;
-  N32 -> N34;
-  N32 -> N36;
-  N32 -> N45;
-  N32 -> N63;
-  N32 -> N81;
-  N33 -> N38;
+  N33 -> N35;
+  N33 -> N52;
   N34 -> N35;
-  N34 -> N36;
-  N35 -> N38;
+  N34 -> N64;
+  N35 -> N36;
   N36 -> N37;
   N37 -> N38;
+  N37 -> N75;
   N38 -> N39;
-  N39 -> N46;
+  N38 -> N46;
+  N39 -> N40;
   N40 -> N41;
-  N40 -> N43;
   N41 -> N42;
-  N42 -> N45;
+  N42 -> N43;
   N43 -> N44;
-  N44 -> N45;
-  N45 -> N46;
+  N44 -> N63;
+  N45 -> N49;
   N46 -> N47;
-  N46 -> N63;
   N47 -> N48;
   N48 -> N49;
   N49 -> N50;
-  N49 -> N81;
-  N50 -> N51;
-  N50 -> N56;
-  N51 -> N52;
+  N50 -> N61;
+  N51 -> N59;
   N52 -> N53;
   N53 -> N54;
-  N54 -> N61;
-  N55 -> N59;
+  N54 -> N55;
+  N54 -> N75;
+  N55 -> N56;
   N56 -> N57;
   N57 -> N58;
   N58 -> N59;
   N59 -> N60;
   N60 -> N61;
-  N61 -> N72;
-  N62 -> N70;
+  N61 -> N62;
+  N62 -> N63;
   N63 -> N64;
-  N64 -> N65;
+  N63 -> N65;
+  N64 -> N66;
   N65 -> N66;
-  N65 -> N81;
   N66 -> N67;
+  N66 -> N71;
   N67 -> N68;
   N68 -> N69;
   N69 -> N70;
   N70 -> N71;
   N71 -> N72;
   N72 -> N73;
-  N72 -> N74;
-  N73 -> N77;
-  N74 -> N75;
+  N73 -> N74;
   N75 -> N76;
-  N76 -> N77;
-  N77 -> N78;
-  N78 -> N79;
-  N79 -> N80;
-  N81 -> N82;
 }
 """
         self.assertEqual(expected.strip(), observed.strip())
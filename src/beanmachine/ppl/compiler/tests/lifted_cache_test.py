@@ -0,0 +1,81 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+#
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+
+"""Tests for lifted_cache.py"""
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import beanmachine.ppl as bm
+import beanmachine.ppl.compiler.lifted_cache as lifted_cache
+from beanmachine.ppl.compiler.bm_to_bmg import _bm_function_to_bmg_function
+from beanmachine.ppl.compiler.runtime import BMGRuntime
+from torch.distributions import Bernoulli, Beta
+
+
+@bm.random_variable
+def coin():
+    return Beta(2.0, 2.0)
+
+
+def make_flip(offset):
+    @bm.functional
+    def flip_plus():
+        return Bernoulli(coin()).sample() + offset
+
+    return flip_plus
+
+
+class LiftedCacheTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.directory = tempfile.TemporaryDirectory()
+        self.old_dir = lifted_cache._lifted_cache_dir
+        lifted_cache._lifted_cache_dir = self.directory.name
+
+    def tearDown(self) -> None:
+        lifted_cache._lifted_cache_dir = self.old_dir
+        self.directory.cleanup()
+
+    def test_lifted_cache_round_trip(self) -> None:
+        f = coin.__wrapped__
+        fresh = _bm_function_to_bmg_function(f, BMGRuntime())
+        self.assertEqual(len(os.listdir(self.directory.name)), 1)
+
+        # A second lifting is served from the cache without transforming the
+        # function again.
+        with patch(
+            "beanmachine.ppl.compiler.bm_to_bmg._transform_function"
+        ) as transform:
+            cached = _bm_function_to_bmg_function(f, BMGRuntime())
+            transform.assert_not_called()
+        self.assertEqual(fresh.transformed_source, cached.transformed_source)
+        self.assertIsNot(fresh.runtime, cached.runtime)
+
+    def test_lifted_cache_binds_outer_variables(self) -> None:
+        # Both closures share the same source code, and therefore the same
+        # cache entry, but they are closed over different values.
+        f1 = make_flip(1).__wrapped__
+        f2 = make_flip(2).__wrapped__
+        self.assertEqual(lifted_cache.cache_key(f1), lifted_cache.cache_key(f2))
+        _bm_function_to_bmg_function(f1, BMGRuntime())
+        lifted = _bm_function_to_bmg_function(f2, BMGRuntime())
+        self.assertEqual(len(os.listdir(self.directory.name)), 1)
+        self.assertIs(lifted.original_function, f2)
+
+    def test_lifted_cache_disabled(self) -> None:
+        lifted_cache._lifted_cache_dir = None
+        with patch.dict(os.environ, {}, clear=True):
+            self.assertIsNone(lifted_cache.cache_key(coin.__wrapped__))
+            _bm_function_to_bmg_function(coin.__wrapped__, BMGRuntime())
+        self.assertEqual(os.listdir(self.directory.name), [])
+
+    def test_lifted_cache_corrupt_entry(self) -> None:
+        key = lifted_cache.cache_key(coin.__wrapped__)
+        with open(os.path.join(self.directory.name, key + ".lifted"), "wb") as f:
+            f.write(b"not a pickle")
+        self.assertIsNone(lifted_cache.load(key))
+        lifted = _bm_function_to_bmg_function(coin.__wrapped__, BMGRuntime())
+        self.assertIn("coin_helper", lifted.transformed_source)
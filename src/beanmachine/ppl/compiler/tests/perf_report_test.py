@@ -5,11 +5,13 @@
 
 import platform
 import re
+import threading
 import unittest
 
 import beanmachine.graph as graph
 import beanmachine.ppl as bm
 import beanmachine.ppl.compiler.performance_report as pr
+import beanmachine.ppl.compiler.profiler as prof
 from beanmachine.ppl.inference import BMGInference
 from torch import tensor
 from torch.distributions import Bernoulli, Beta
@@ -211,3 +213,63 @@ nmc_infer:(1) -- ms
 Total time: -- ms
 """
         self.assertEqual(tidy(expected).strip(), tidy(observed).strip())
+
+    def test_bmg_compiler_pass_report(self) -> None:
+        # The performance report contains statistics of every pass of the
+        # compiler, and the time of each pass in the compiler profile report.
+        queries = [coin()]
+        observations = {flip(): tensor(1.0)}
+        _, report = BMGInference()._infer(queries, observations, 10)
+
+        names = [p.name for p in report.compiler_passes]
+        self.assertEqual(
+            [
+                "copy",
+                "vectorized_model_fixer",
+                "arithmetic_graph_fixer",
+                "unsupported_node_reporter",
+                "bad_matmul_reporter",
+                "untypable_node_reporter",
+                "conjugacy_graph_fixer",
+                "requirements_fixer",
+                "observations_fixer",
+                "observe_true_fixer",
+            ],
+            names,
+        )
+        for p in report.compiler_passes:
+            self.assertLess(0, p.nodes_before)
+            self.assertLess(0, p.nodes_after)
+            self.assertLessEqual(0, p.total_time)
+        vectorized = report.compiler_passes[1]
+        self.assertLess(0, vectorized.iterations)
+        arithmetic = report.compiler_passes[2]
+        self.assertEqual(1, arithmetic.iterations)
+        self.assertLess(0, sum(p.type_computations for p in report.compiler_passes))
+        fix_problems = report.profiler_report.infer.fix_problems
+        self.assertEqual(1, fix_problems.requirements_fixer.calls)
+
+    def test_type_computations_per_compile(self) -> None:
+        # Type computations are counted in the pass of the compile that runs in
+        # the same thread, so concurrent compiles do not count each other's.
+        pd1 = prof.ProfilerData()
+        pd2 = prof.ProfilerData()
+        p1 = pd1.begin_pass("p1", 1)
+        prof.count_type_computation()
+
+        def other_compile():
+            p2 = pd2.begin_pass("p2", 1)
+            for _ in range(3):
+                prof.count_type_computation()
+            pd2.finish_pass(p2, 1)
+
+        t = threading.Thread(target=other_compile)
+        t.start()
+        t.join()
+        prof.count_type_computation()
+        pd1.finish_pass(p1, 1)
+        # Outside of a pass nothing is counted.
+        prof.count_type_computation()
+
+        self.assertEqual(2, p1.type_computations)
+        self.assertEqual(3, pd2.passes[0].type_computations)
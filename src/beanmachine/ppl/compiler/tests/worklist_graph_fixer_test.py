@@ -0,0 +1,98 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+#
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+
+import unittest
+
+import beanmachine.ppl.compiler.bmg_nodes as bn
+import torch
+from beanmachine.ppl.compiler.bm_graph_builder import BMGraphBuilder
+from beanmachine.ppl.compiler.fix_arithmetic import neg_neg_fixer
+from beanmachine.ppl.compiler.fix_multiary_ops import multiary_addition_fixer
+from beanmachine.ppl.compiler.fix_problem import (
+    ancestors_first_graph_fixer,
+    fixpoint_graph_fixer,
+    NodeFixerResult,
+    worklist_graph_fixer,
+)
+from beanmachine.ppl.compiler.fix_problems import arithmetic_graph_fixer
+from beanmachine.ppl.compiler.lattice_typer import LatticeTyper
+from beanmachine.ppl.model.rv_identifier import RVIdentifier
+
+
+def _rv_id() -> RVIdentifier:
+    return RVIdentifier(wrapper=lambda a, b: a, arguments=(1, 1))
+
+
+class WorklistGraphFixerTest(unittest.TestCase):
+    def test_worklist_graph_fixer_neg_chain(self) -> None:
+        # -(-(...-(x)...)) with an even number of negations is fixed to x; each
+        # fix exposes a new pair of negations to the consumer of the chain.
+        bmg = BMGraphBuilder()
+        x = bmg.add_sample(bmg.add_normal(bmg.add_constant(0.0), bmg.add_constant(1.0)))
+        y = x
+        num_negations = 200
+        for _ in range(num_negations):
+            y = bmg.add_negate(y)
+        q = bmg.add_query(y, _rv_id())
+
+        fixer_calls = 0
+        node_fixer = neg_neg_fixer(bmg)
+
+        def counting_fixer(node: bn.BMGNode) -> NodeFixerResult:
+            nonlocal fixer_calls
+            fixer_calls += 1
+            return node_fixer(node)
+
+        _, made_progress, errors = worklist_graph_fixer(LatticeTyper(), counting_fixer)(
+            bmg
+        )
+        self.assertTrue(made_progress)
+        self.assertFalse(errors.any())
+        self.assertIs(q.operator, x)
+        # Each node is only revisited when one of its inputs changes, so the amount
+        # of work is linear in the size of the graph, whereas repeatedly passing
+        # over the whole graph would be quadratic.
+        self.assertLess(fixer_calls, 20 * num_negations)
+
+    def test_worklist_graph_fixer_matches_fixpoint(self) -> None:
+        def build():
+            # ((((a + b) + c) + d) + e) where every addend is a sample
+            bmg = BMGraphBuilder()
+            norm = bmg.add_normal(bmg.add_constant(0.0), bmg.add_constant(1.0))
+            total = bmg.add_sample(norm)
+            for _ in range(4):
+                total = bmg.add_addition(total, bmg.add_sample(norm))
+            q = bmg.add_query(total, _rv_id())
+            return bmg, q
+
+        bmg, q = build()
+        worklist_graph_fixer(LatticeTyper(), multiary_addition_fixer(bmg))(bmg)
+        bmg2, q2 = build()
+        fixpoint_graph_fixer(
+            ancestors_first_graph_fixer(LatticeTyper(), multiary_addition_fixer(bmg2))
+        )(bmg2)
+
+        self.assertIsInstance(q.operator, bn.AdditionNode)
+        self.assertEqual(len(q.operator.inputs), 5)
+        self.assertEqual(type(q.operator), type(q2.operator))
+        self.assertEqual(len(q.operator.inputs), len(q2.operator.inputs))
+
+    def test_worklist_graph_fixer_deep_type_change(self) -> None:
+        # log(1 - exp(sum([log(phi(x)), log(phi(x))]))) is only known to be a
+        # log1mexp once the sum has been rewritten into an addition of negative
+        # reals; the type that changes is three edges below the log.
+        bmg = BMGraphBuilder()
+        x = bmg.add_sample(bmg.add_normal(bmg.add_constant(0.0), bmg.add_constant(1.0)))
+        lp = bmg.add_log(bmg.add_phi(x))
+        total = bmg.add_sum(bmg.add_tensor(torch.Size([2]), lp, lp))
+        comp = bmg.add_addition(
+            bmg.add_constant(1.0), bmg.add_negate(bmg.add_exp(total))
+        )
+        q = bmg.add_query(bmg.add_log(comp), _rv_id())
+
+        _, made_progress, errors = arithmetic_graph_fixer(set())(bmg)
+        self.assertTrue(made_progress)
+        self.assertFalse(errors.any())
+        self.assertIsInstance(q.operator, bn.Log1mexpNode)
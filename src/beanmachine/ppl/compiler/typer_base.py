@@ -37,8 +37,10 @@
 # * __contains__(node)->bool allows you to use the "in" operator to determine if a node's
 #   type information has already been cached. (TODO: Is this useful? Maybe remove it.)
 #
-# * update_type(node)->None informs the type cache that a node has been updated. It
+# * update_type(node)->Set[node] informs the type cache that a node has been updated. It
 #   recomputes the node's type and efficiently propagates the change to the descendents.
+#   It returns the set of nodes whose type changed, so that incremental graph
+#   rewriters know which nodes need to be examined again.
 #
 # All a typer needs to do is:
 #
@@ -51,9 +53,10 @@
 
 from abc import ABC, abstractmethod
 from queue import Queue
-from typing import Dict, Generic, TypeVar
+from typing import Dict, Generic, Optional, Set, TypeVar
 
 import beanmachine.ppl.compiler.bmg_nodes as bn
+import beanmachine.ppl.compiler.profiler as prof
 
 
 T = TypeVar("T")
@@ -81,7 +84,7 @@ class TyperBase(ABC, Generic[T]):
     def _inputs_known(self, node: bn.BMGNode) -> bool:
         return all(i in self._nodes for i in node.inputs)
 
-    def update_type(self, node: bn.BMGNode) -> None:
+    def update_type(self, node: bn.BMGNode) -> Set[bn.BMGNode]:
         # Preconditions:
         #
         # * The node's type might already be known, but might now be wrong.
@@ -97,6 +100,7 @@ class TyperBase(ABC, Generic[T]):
         # * Node type is correct
         # * Any changes caused by node type being updated have been
         #   propagated to its relevant outputs.
+        # * The returned set contains every typed node whose type changed.
         #
 
         # If no one previously wanted the type of this node, then there's
@@ -105,7 +109,7 @@ class TyperBase(ABC, Generic[T]):
         # type, we can compute it then.
 
         if node not in self._nodes:
-            return
+            return set()
 
         # We have been asked to update the type of a node, presumably
         # because its inputs have been edited. Those inputs might not
@@ -123,10 +127,15 @@ class TyperBase(ABC, Generic[T]):
         # changed then the type analysis might be wrong for some
         # of its outputs.  Propagate the change to outputs, and
         # then to their outputs, and so on.
+        changed = set()
         if current_type != new_type:
-            self._propagate_update_to_outputs(node)
+            changed.add(node)
+            self._propagate_update_to_outputs(node, changed)
+        return changed
 
-    def _propagate_update_to_outputs(self, node: bn.BMGNode) -> None:
+    def _propagate_update_to_outputs(
+        self, node: bn.BMGNode, changed: Optional[Set[bn.BMGNode]] = None
+    ) -> None:
         # We've either just typed node for the first time, or its type
         # has just changed. That means that the types of its outputs
         # might have also changed.
@@ -154,10 +163,12 @@ class TyperBase(ABC, Generic[T]):
             assert cur in self._nodes
             current_type = self[cur]
             assert self._inputs_known(cur)
-            new_type = self._compute_type_inputs_known(cur)
+            new_type = self._compute_type(cur)
             self._nodes[cur] = new_type
             if current_type == new_type:
                 continue
+            if changed is not None:
+                changed.add(cur)
             for o in cur.outputs.items:
                 if o in self._nodes:
                     work.put(o)
@@ -192,7 +203,7 @@ class TyperBase(ABC, Generic[T]):
             # work stack and we will come back to it after the inputs are
             # all processed.
             if self._inputs_known(cur):
-                self._nodes[cur] = self._compute_type_inputs_known(cur)
+                self._nodes[cur] = self._compute_type(cur)
             else:
                 work.append(cur)
                 for i in cur.inputs:
@@ -202,6 +213,10 @@ class TyperBase(ABC, Generic[T]):
         assert self._inputs_known(node)
         assert node in self._nodes
 
+    def _compute_type(self, node: bn.BMGNode) -> T:
+        prof.count_type_computation()
+        return self._compute_type_inputs_known(node)
+
     @abstractmethod
     def _compute_type_inputs_known(self, node: bn.BMGNode) -> T:
         pass
@@ -3,13 +3,16 @@
 # This source code is licensed under the MIT license found in the
 # LICENSE file in the root directory of this source tree.
 
-from typing import Callable, List, NamedTuple, Tuple
+import math
+from typing import Callable, List, NamedTuple, Optional, Tuple
 
 import numpy as np
 import plotly.graph_objs as go
 import torch
 from torch import Tensor
 
+from . import common_statistics as common_stats
+
 
 class SamplesSummary(NamedTuple):
     num_chain: int
@@ -52,11 +55,12 @@ def trace_helper(
 
 
 def plot_helper(
-    query_samples: Tensor, func: Callable
+    query_samples: Tensor, func: Callable, **kwargs
 ) -> Tuple[List[go.Scatter], List[str]]:
     """
     this function executes a plot-related function, passed as input parameter func, and
     outputs a tuple including plotly object and its corresponding legend.
+    Additional keyword arguments are passed to func.
     """
     num_chain, num_samples, single_sample_sz = _samples_info(query_samples)
 
@@ -70,7 +74,7 @@ def plot_helper(
             data = flattened_data[:, i]
             partial_label = f" for {list(index)}"
 
-            x_data, y_data = func(data.detach())
+            x_data, y_data = func(data.detach(), **kwargs)
             x_axis_data.append(x_data)
             y_axis_data.append(y_data)
             labels.append(partial_label)
@@ -80,22 +84,24 @@ def plot_helper(
     return trace_helper(x_axis, y_axis, all_labels[0])
 
 
-def autocorr(x: Tensor) -> Tuple[List[int], List[float]]:
-    def autocorr_calculation(x: Tensor, lag: int) -> Tensor:
-        y1 = x[: (len(x) - lag)]
-        y2 = x[lag:]
-
-        sum_product = (
-            (y1 - (x.mean(dim=0).expand(y1.size())))
-            * (y2 - (x.mean(dim=0).expand(y2.size())))
-        ).sum(0)
-        return sum_product / ((len(x) - lag) * torch.var(x, dim=0))
-
-    max_lag = x.size(0)
-    y_axis_data = [autocorr_calculation(x, lag).item() for lag in range(max_lag)]
-    x_axis_data = list(range(max_lag))
+def autocorr(x: Tensor, max_lag: Optional[int] = None) -> Tuple[List[int], List[float]]:
+    """
+    Computes the autocorrelation of the samples x at every lag smaller than max_lag
+    (or at every lag if max_lag is None), using FFTs.
+    """
+    acov = common_stats.autocovariance(x, dim=0, max_lag=max_lag)
+    y_axis_data = (acov / torch.var(x, dim=0)).tolist()
+    x_axis_data = list(range(len(y_axis_data)))
     return (x_axis_data, y_axis_data)
 
 
-def trace_plot(x: Tensor) -> Tuple[List[int], Tensor]:
-    return (list(range(x.size(0))), x)
+def trace_plot(
+    x: Tensor, max_points: Optional[int] = 10000
+) -> Tuple[List[int], Tensor]:
+    """
+    Returns the trace of the samples x. Traces that are longer than max_points are
+    downsampled to every k-th sample, so that the plot stays responsive (use None to
+    plot every sample).
+    """
+    stride = 1 if max_points is None else max(1, math.ceil(x.size(0) / max_points))
+    return (list(range(0, x.size(0), stride)), x[::stride])
@@ -3,8 +3,9 @@
 # This source code is licensed under the MIT license found in the
 # LICENSE file in the root directory of this source tree.
 
+import contextlib
 import warnings
-from typing import Optional, Tuple
+from typing import Dict, Iterator, Optional, Tuple
 
 import numpy as np
 import torch
@@ -35,7 +36,37 @@ def confidence_interval(query_samples: Tensor) -> Tensor:
     )
 
 
+# The within-chain and overall variances computed by `_compute_var`, keyed by the id
+# of the samples, while `cached_intermediates` is active. The samples are kept in the
+# cache so that their id cannot be reused.
+_var_cache: Optional[Dict[int, Tuple[Tensor, Tuple[Tensor, Tensor]]]] = None
+
+
+@contextlib.contextmanager
+def cached_intermediates() -> Iterator[None]:
+    """
+    Within this context, the variances that r_hat and effective_sample_size compute
+    from the same tensor of samples are computed only once.
+    """
+    global _var_cache
+    is_outermost = _var_cache is None
+    if is_outermost:
+        _var_cache = {}
+    try:
+        yield
+    finally:
+        if is_outermost:
+            _var_cache = None
+
+
 def _compute_var(query_samples: Tensor) -> Tuple[Tensor, Tensor]:
+    cache = _var_cache
+    original_samples = query_samples
+    if cache is not None:
+        cached_samples, cached_var = cache.get(id(query_samples), (None, None))
+        if cached_samples is query_samples:
+            return cached_var
+
     n_chains, n_samples = query_samples.shape[:2]
     if query_samples.dtype not in [torch.float32, torch.float64]:
         """TODO have separate diagnostics for discrete variables.
@@ -52,7 +83,10 @@ def _compute_var(query_samples: Tensor) -> Tuple[Tensor, Tensor]:
     # pyre-fixme[58]: `*` is not supported for operand types `float` and `Union[int,
     #  torch._tensor.Tensor]`.
     var_hat = (n_samples - 1) / n_samples * w + (1 / n_samples) * b
-    return w, var_hat.clamp(min=1e-10)
+    var_hat = var_hat.clamp(min=1e-10)
+    if cache is not None:
+        cache[id(original_samples)] = (original_samples, (w, var_hat))
+    return w, var_hat
 
 
 def r_hat(query_samples: Tensor) -> Optional[Tensor]:
@@ -74,33 +108,38 @@ def split_r_hat(query_samples: Tensor) -> Optional[Tensor]:
     return torch.sqrt(var_hat / w)
 
 
-def effective_sample_size(query_samples: Tensor) -> Tensor:
+def autocovariance(
+    samples: Tensor, dim: int = 0, max_lag: Optional[int] = None
+) -> Tensor:
+    """
+    Computes the autocovariance of the samples along dim with FFTs, in
+    O(n log(n)) time. The autocovariance at each lag is normalized by the number of
+    pairs of samples at that lag.
+
+    :param samples: the samples, with the draws along dim
+    :param dim: the dimension of the draws
+    :param max_lag: if provided, only the first max_lag lags are returned
+    :returns: the autocovariance, with the lags along dim
+    """
+    samples = samples.transpose(dim, -1)
+    n_samples = samples.shape[-1]
+    if max_lag is None or max_lag > n_samples:
+        max_lag = n_samples
+    centered_samples = samples - samples.mean(dim=-1, keepdim=True)
+    # zero-pad to avoid the circular wrap-around of the FFT
+    fft_len = 2 * n_samples
+    fvi = torch.fft.rfft(centered_samples, n=fft_len)
+    # multiply by complex conjugate and transform back to reals
+    acov = torch.fft.irfft(fvi.real.pow(2) + fvi.imag.pow(2), n=fft_len)
+    acov = acov[..., :max_lag]
+    num_per_lag = torch.arange(n_samples, n_samples - max_lag, -1, dtype=acov.dtype)
+    return (acov / num_per_lag).transpose(dim, -1)
+
+
+def _effective_sample_size(query_samples: Tensor) -> Tensor:
     n_chains, n_samples, *query_dim = query_samples.shape
 
-    if query_samples.dtype not in [torch.float32, torch.float64]:
-        """TODO have separate diagnostics for discrete variables.
-        This would require passing supprt-type information to Diagnostics.
-        """
-        query_samples = query_samples.float()
-
-    samples = query_samples - query_samples.mean(dim=1, keepdim=True)
-    samples = samples.transpose(1, -1)
-    # computes fourier transform (with padding)
-    padding = torch.zeros(samples.shape, dtype=samples.dtype)
-    padded_samples = torch.cat((samples, padding), dim=-1)
-    fvi = torch.view_as_real(torch.fft.fft(padded_samples))
-    # multiply by complex conjugate
-    acf = fvi.pow(2).sum(-1, keepdim=True)
-    # transform back to reals (with padding)
-    padding = torch.zeros(acf.shape, dtype=acf.dtype)
-    padded_acf = torch.cat((acf, padding), dim=-1)
-    rho_per_chain = torch.fft.ifft(torch.view_as_complex(padded_acf)).real
-
-    rho_per_chain = rho_per_chain.narrow(-1, 0, n_samples)
-    num_per_lag = torch.tensor(range(n_samples, 0, -1), dtype=samples.dtype)
-    rho_per_chain = torch.div(rho_per_chain, num_per_lag)
-    rho_per_chain = rho_per_chain.transpose(1, -1)
-
+    rho_per_chain = autocovariance(query_samples, dim=1)
     rho_avg = rho_per_chain.mean(dim=0)
     w, var_hat = _compute_var(query_samples)
     if n_chains > 1:
@@ -109,24 +148,49 @@ def effective_sample_size(query_samples: Tensor) -> Tensor:
         rho = rho_avg / var_hat
     rho[0] = 1
 
-    # reshape to 2d matrix where each row contains all samples for specific dim
-    rho_2d = torch.stack(torch.unbind(rho, dim=0), dim=-1).reshape(-1, n_samples)
-    rho_sum = torch.zeros(rho_2d.shape[0])
-
-    for i, chain in enumerate(torch.unbind(rho_2d, dim=0)):
-        total_sum = torch.tensor(0.0, dtype=samples.dtype)
-        for t in range(n_samples // 2):
-            rho_even = chain[2 * t]
-            rho_odd = chain[2 * t + 1]
-            if rho_even + rho_odd < 0:
-                break
-            else:
-                total_sum += rho_even + rho_odd
-        rho_sum[i] = total_sum
-
-    rho_sum = torch.reshape(rho_sum, query_dim)
+    # Geyer's initial positive sequence: sum the autocorrelations of consecutive
+    # pairs of lags until the first pair whose sum is negative, for all dimensions
+    # at once
+    n_pairs = n_samples // 2
+    rho_pairs = rho[: 2 * n_pairs].reshape(n_pairs, 2, *query_dim).sum(dim=1)
+    is_truncated = (rho_pairs < 0).cumsum(dim=0) > 0
+    rho_sum = rho_pairs.masked_fill(is_truncated, 0.0).sum(dim=0)
+
     tau = -1 + 2 * rho_sum
-    n_eff = torch.div(n_chains * n_samples, tau)
+    return torch.div(n_chains * n_samples, tau)
+
+
+def effective_sample_size(
+    query_samples: Tensor, chunk_size: Optional[int] = None
+) -> Tensor:
+    """
+    Computes the effective sample size of every dimension of the query.
+
+    :param query_samples: samples of shape (n_chains, n_samples, *query_dim)
+    :param chunk_size: if provided, the dimensions of the query are processed in
+        blocks of (at most) chunk_size dimensions, which bounds the memory that is
+        used by the FFTs on queries with many dimensions
+    :returns: the effective sample size, of shape query_dim
+    """
+    n_chains, n_samples, *query_dim = query_samples.shape
+
+    if query_samples.dtype not in [torch.float32, torch.float64]:
+        """TODO have separate diagnostics for discrete variables.
+        This would require passing supprt-type information to Diagnostics.
+        """
+        query_samples = query_samples.float()
+
+    if chunk_size is None or np.prod(query_dim) <= chunk_size:
+        n_eff = _effective_sample_size(query_samples)
+    else:
+        flat_samples = query_samples.reshape(n_chains, n_samples, -1)
+        n_eff = torch.cat(
+            [
+                _effective_sample_size(chunk)
+                for chunk in torch.split(flat_samples, chunk_size, dim=2)
+            ]
+        ).reshape(query_dim)
+
     if n_eff.isnan().any():
         warnings.warn("NaN encountered in computing effective sample size.")
         return torch.tensor(0.0)
@@ -6,11 +6,13 @@
 import functools
 import math
 import warnings
-from typing import Callable, Dict, List, Optional, Tuple
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Set, Tuple
 
 import numpy as np
 import pandas as pd
 import plotly
+import torch
 from beanmachine.ppl.inference.monte_carlo_samples import MonteCarloSamples
 from beanmachine.ppl.model.rv_identifier import RVIdentifier
 from plotly.subplots import make_subplots
@@ -19,10 +21,31 @@ from torch import Tensor
 from . import common_plots, common_statistics as common_stats
 
 
+def _split_batched_result(
+    result: Optional[Tensor], num_queries: int, query_dim: torch.Size
+) -> Optional[List[Optional[Tensor]]]:
+    """
+    Splits the result of a summary stat function on the stacked samples of
+    num_queries queries into the result of each query. Returns None if the result does
+    not have the expected shape (e.g. when the function returns a single value on
+    failure), in which case the function should be evaluated for each query instead.
+    """
+    if result is None:
+        return [None] * num_queries
+    # the dimension of the queries in the result
+    query_axis = -len(query_dim) - 1
+    if result.dim() <= len(query_dim) or result.shape[query_axis] != num_queries:
+        return None
+    return list(result.unbind(query_axis))
+
+
 class BaseDiagnostics:
     def __init__(self, samples: MonteCarloSamples):
         self.samples = samples
         self.statistics_dict = {}
+        # names of the summary stat functions that can be evaluated on the samples of
+        # multiple queries stacked along a new dimension after the sample dimension
+        self.batchable_statistics: Set[str] = set()
         self.plots_dict = {}
 
     def _prepare_query_list(
@@ -35,17 +58,26 @@ class BaseDiagnostics:
                 raise ValueError(f"query {self._stringify_query(query)} does not exist")
         return query_list
 
-    def summaryfn(self, func: Callable, display_names: List[str]) -> Callable:
+    def summaryfn(
+        self, func: Callable, display_names: List[str], batchable: bool = False
+    ) -> Callable:
         """
         this function keeps a directory of all summary-related functions,
         so it could handle the overridden functions and new ones that user defines
 
         :param func: method which is going to be executed when summary() is called.
         :param display_name: the name appears in the summary() output dataframe
+        :param batchable: whether func computes its result independently for every
+            element of the samples, so that summary() can evaluate it once on the
+            samples of all queries with the same shape stacked together
         :returns: user-visible function that can be called over a list of queries
         """
         statistics_name = func.__name__
         self.statistics_dict[statistics_name] = (func, display_names)
+        if batchable:
+            self.batchable_statistics.add(statistics_name)
+        else:
+            self.batchable_statistics.discard(statistics_name)
         return self._standalone_summary_stat_function(statistics_name, func)
 
     def _prepare_summary_stat_input(
@@ -69,22 +101,19 @@ class BaseDiagnostics:
         if len(results) > 0:
             single_result_set = results[0]
             if single_result_set is not None and len(single_result_set) > 0:
-                for flattened_index in range(single_result_set[0].numel()):
-                    index = np.unravel_index(
-                        flattened_index, tuple(single_result_set[0].size())
-                    )
-                    row_data = []
-                    rowname = f"{self._stringify_query(query)}{list(index)}"
-
-                    for result in results:
-                        num_of_sets = result.size()[0]
-                        for set_num in range(num_of_sets):
-                            row_data.append(result[set_num][index].item())
-                    cur = pd.DataFrame([row_data], columns=func_list, index=[rowname])
-                    if out_pd.empty:
-                        out_pd = cur
-                    else:
-                        out_pd = pd.concat([out_pd, cur])
+                # one column for each set of each result, with one row per element
+                columns = [
+                    column.reshape(-1).tolist()
+                    for result in results
+                    for column in result.unbind(0)
+                ]
+                rownames = [
+                    f"{self._stringify_query(query)}{list(index)}"
+                    for index in np.ndindex(*single_result_set[0].size())
+                ]
+                out_pd = pd.DataFrame(
+                    list(zip(*columns)), columns=func_list, index=rownames
+                )
         return out_pd
 
     def _stringify_query(self, query: RVIdentifier) -> str:
@@ -123,23 +152,86 @@ class BaseDiagnostics:
             frames = pd.concat([frames, out_df])
         return frames
 
+    def _execute_batched_summary_stat_funcs(
+        self,
+        queries: List[RVIdentifier],
+        queried_samples: List[Tensor],
+        func_dict: Dict[str, Tuple[Callable, str]],
+    ) -> List[pd.DataFrame]:
+        """
+        this function executes the summary stat functions for queries whose samples
+        have the same shape. The batchable functions are evaluated once on the
+        stacked samples of all of the queries, and the other functions are evaluated
+        for each query. Returns one table per query.
+        """
+        stacked_samples = None
+        if len(queries) > 1 and queried_samples[0].dim() >= 2:
+            stacked_samples = torch.stack(queried_samples, dim=2)
+        query_results = [[] for _ in queries]
+        func_lists = [[] for _ in queries]
+        for name, (func, display_names) in func_dict.items():
+            results = None
+            if stacked_samples is not None and name in self.batchable_statistics:
+                results = _split_batched_result(
+                    func(stacked_samples), len(queries), queried_samples[0].shape[2:]
+                )
+            if results is None:
+                results = [func(samples) for samples in queried_samples]
+            for idx, result in enumerate(results):
+                # in the case of r hat and other algorithms, they may return None
+                # if the samples do not have enough chains or have the wrong shape
+                if result is None:
+                    continue
+                # the first dimension is equivalant to the size of the display_names
+                if len(display_names) <= 1:
+                    result = result.unsqueeze(0)
+                query_results[idx].append(result)
+                func_lists[idx].extend(display_names)
+        return [
+            self._create_table(query, results, func_list)
+            for query, results, func_list in zip(queries, query_results, func_lists)
+        ]
+
     def summary(
         self,
         query_list: Optional[List[RVIdentifier]] = None,
         chain: Optional[int] = None,
+        num_threads: Optional[int] = None,
     ) -> pd.DataFrame:
         """
         this function outputs a table summarizing results of registered functions
         in self.statistics_dict for requested queries in query_list,
-        if chain is None, results correspond to the aggreagated chains
+        if chain is None, results correspond to the aggreagated chains.
+        Queries whose samples have the same shape are summarized together, and the
+        groups of queries are distributed over num_threads threads if provided
         """
-        frames = pd.DataFrame()
         query_list = self._prepare_query_list(query_list)
+        groups: Dict[tuple, Tuple[List[RVIdentifier], List[Tensor]]] = {}
         for query in query_list:
-            out_df = self._execute_summary_stat_funcs(
-                query, self.statistics_dict, chain
+            queried_samples = self._prepare_summary_stat_input(query, chain)
+            queries, samples = groups.setdefault(
+                (queried_samples.shape, queried_samples.dtype), ([], [])
             )
-            frames = pd.concat([frames, out_df])
+            queries.append(query)
+            samples.append(queried_samples)
+
+        def _summarize_group(group):
+            queries, samples = group
+            return self._execute_batched_summary_stat_funcs(
+                queries, samples, self.statistics_dict
+            )
+
+        # the intermediates are shared between the functions evaluated on the same
+        # samples
+        with common_stats.cached_intermediates():
+            if num_threads is None or num_threads <= 1:
+                group_frames = list(map(_summarize_group, groups.values()))
+            else:
+                with ThreadPoolExecutor(max_workers=num_threads) as executor:
+                    group_frames = list(executor.map(_summarize_group, groups.values()))
+        frames = pd.concat(
+            [pd.DataFrame()] + [df for dfs in group_frames for df in dfs]
+        )
         frames.sort_index(inplace=True)
         return frames
 
@@ -174,11 +266,12 @@ class BaseDiagnostics:
         func_dict: Dict[str, Tuple[Callable, str]],
         chain: Optional[int] = None,
         display: Optional[bool] = False,
+        **kwargs,
     ):  # task T57168727 to add type
         figs = []
         queried_samples = self._prepare_plots_input(query, chain)
         for _k, (func, display_name) in func_dict.items():
-            trace, labels = common_plots.plot_helper(queried_samples, func)
+            trace, labels = common_plots.plot_helper(queried_samples, func, **kwargs)
             title = f"{self._stringify_query(query)} {display_name}"
             fig = self._display_results(
                 trace,
@@ -232,7 +325,8 @@ class BaseDiagnostics:
 
     def _standalone_plot_function(self, func_name: str, func: Callable) -> Callable:
         """
-        this function makes each registered plot function directly callable by the user
+        this function makes each registered plot function directly callable by the user,
+        with additional keyword arguments (e.g. max_lag for autocorr) passed to func
         """
 
         @functools.wraps(func)
@@ -240,12 +334,17 @@ class BaseDiagnostics:
             query_list: List[RVIdentifier],
             chain: Optional[int] = None,
             display: Optional[bool] = False,
+            **kwargs,
         ):
             figs = []
             query_list = self._prepare_query_list(query_list)
             for query in query_list:
                 fig = self._execute_plot_funcs(
-                    query, {func_name: self.plots_dict[func_name]}, chain, display
+                    query,
+                    {func_name: self.plots_dict[func_name]},
+                    chain,
+                    display,
+                    **kwargs,
                 )
                 figs.extend(fig)
             return figs
@@ -279,16 +378,24 @@ class Diagnostics(BaseDiagnostics):
         """
         every function related to summary stat should be registered in the constructor
         """
-        self.mean = self.summaryfn(common_stats.mean, display_names=["avg"])
-        self.std = self.summaryfn(common_stats.std, display_names=["std"])
+        self.mean = self.summaryfn(
+            common_stats.mean, display_names=["avg"], batchable=True
+        )
+        self.std = self.summaryfn(
+            common_stats.std, display_names=["std"], batchable=True
+        )
         self.confidence_interval = self.summaryfn(
-            common_stats.confidence_interval, display_names=["2.5%", "50%", "97.5%"]
+            common_stats.confidence_interval,
+            display_names=["2.5%", "50%", "97.5%"],
+            batchable=True,
         )
         self.split_r_hat = self.summaryfn(
-            common_stats.split_r_hat, display_names=["r_hat"]
+            common_stats.split_r_hat, display_names=["r_hat"], batchable=True
         )
         self.effective_sample_size = self.summaryfn(
-            common_stats.effective_sample_size, display_names=["n_eff"]
+            common_stats.effective_sample_size,
+            display_names=["n_eff"],
+            batchable=True,
         )
         self.trace = self.plotfn(common_plots.trace_plot, display_name="trace")
         self.autocorr = self.plotfn(common_plots.autocorr, display_name="autocorr")
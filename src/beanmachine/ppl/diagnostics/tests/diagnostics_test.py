@@ -7,6 +7,7 @@ import unittest
 from typing import Dict
 
 import beanmachine.ppl as bm
+import beanmachine.ppl.diagnostics.common_plots as common_plots
 import beanmachine.ppl.diagnostics.common_statistics as common_statistics
 import numpy as np
 import pandas as pd
@@ -230,12 +231,66 @@ class DiagnosticsTest(unittest.TestCase):
         self.assertAlmostEqual(dim1, 1.9605, delta=0.001)
         self.assertAlmostEqual(dim2, 15.1438, delta=0.001)
 
+    def test_effective_sample_size_chunks(self):
+        samples = torch.randn(2, 50, 3, 4).cumsum(dim=1)
+        n_eff = common_statistics.effective_sample_size(samples)
+        self.assertEqual(n_eff.shape, (3, 4))
+        # the dimensions are independent of each other, so processing them in
+        # blocks does not change the results
+        for chunk_size in [1, 5, 12]:
+            n_eff_chunked = common_statistics.effective_sample_size(
+                samples, chunk_size=chunk_size
+            )
+            self.assertTrue(torch.allclose(n_eff, n_eff_chunked, rtol=1e-4))
+        for i in range(3):
+            for j in range(4):
+                self.assertAlmostEqual(
+                    n_eff[i, j].item(),
+                    common_statistics.effective_sample_size(samples[:, :, i, j]).item(),
+                    delta=1e-3,
+                )
+
+    def test_autocorr_max_lag(self):
+        torch.manual_seed(0)
+        samples = torch.randn(1, 500).cumsum(dim=1)
+        x, y = common_plots.autocorr(samples[0], max_lag=50)
+        self.assertEqual(x, list(range(50)))
+        expected_acf = acf(samples[0].numpy(), True, nlags=49, fft=False)
+        for lag in range(50):
+            # statsmodels normalizes by the biased estimate of the variance
+            self.assertAlmostEqual(y[lag] * 500 / 499, expected_acf[lag], delta=1e-4)
+
+    def test_trace_plot_downsampling(self):
+        samples = torch.arange(25000.0)
+        x, y = common_plots.trace_plot(samples)
+        self.assertLessEqual(len(x), 10000)
+        self.assertEqual(x, y.long().tolist())
+        x, y = common_plots.trace_plot(samples, max_points=None)
+        self.assertEqual(len(x), 25000)
+
     def test_effective_sample_size_columns(self):
         mh = bm.SingleSiteAncestralMetropolisHastings()
         samples = mh.infer([normal()], {}, 5, 2)
         out_df = Diagnostics(samples).summary()
         self.assertTrue("n_eff" in out_df.columns)
 
+    def test_batched_summary(self):
+        mh = bm.SingleSiteAncestralMetropolisHastings()
+        query_list = [beta(0), beta(1), beta(2), normal(), diri(1, 5)]
+        samples = mh.infer(query_list, {}, 50, 2)
+        diagnostics = Diagnostics(samples)
+        out_df = diagnostics.summary()
+        # queries with the same shape are summarized together, which does not
+        # change the results
+        for query in query_list:
+            query_df = diagnostics.summary([query])
+            pd.testing.assert_frame_equal(out_df.loc[query_df.index], query_df)
+        n_eff = diagnostics.effective_sample_size([beta(1)])
+        self.assertTrue(
+            np.allclose(out_df.loc[n_eff.index]["n_eff"], n_eff["n_eff"], rtol=1e-4)
+        )
+        pd.testing.assert_frame_equal(out_df, diagnostics.summary(num_threads=2))
+
     def test_singleton_dims(self):
         mh = bm.SingleSiteAncestralMetropolisHastings()
         obs = {bar(): torch.ones(3, 1, 2)}
@@ -5,6 +5,10 @@
 
 from beanmachine.ppl.inference.bmg_inference import BMGInference
 from beanmachine.ppl.inference.compositional_infer import CompositionalInference
+from beanmachine.ppl.inference.enumerative_gibbs_inference import (
+    GlobalEnumerativeGibbs,
+    SingleSiteEnumerativeGibbs,
+)
 from beanmachine.ppl.inference.hmc_inference import (
     GlobalHamiltonianMonteCarlo,
     SingleSiteHamiltonianMonteCarlo,
@@ -13,7 +17,25 @@ from beanmachine.ppl.inference.nuts_inference import (
     GlobalNoUTurnSampler,
     SingleSiteNoUTurnSampler,
 )
+from beanmachine.ppl.inference.parallel_tempering import ParallelTempering
 from beanmachine.ppl.inference.predictive import empirical, simulate
+from beanmachine.ppl.inference.reducers import (
+    OnlineReducer,
+    RunningEffectiveSampleSize,
+    RunningMean,
+    RunningQuantiles,
+    RunningVariance,
+)
+from beanmachine.ppl.inference.sample_sink import (
+    DiscardSampleSink,
+    InMemorySampleSink,
+    NpySampleSink,
+    SampleSink,
+)
+from beanmachine.ppl.inference.sgmcmc_inference import (
+    StochasticGradientHamiltonianMonteCarlo,
+    StochasticGradientLangevinDynamics,
+)
 from beanmachine.ppl.inference.single_site_ancestral_mh import (
     SingleSiteAncestralMetropolisHastings,
 )
@@ -29,15 +51,29 @@ from beanmachine.ppl.legacy.inference import RejectionSampling
 __all__ = [
     "BMGInference",
     "CompositionalInference",
+    "DiscardSampleSink",
+    "GlobalEnumerativeGibbs",
     "GlobalHamiltonianMonteCarlo",
     "GlobalNoUTurnSampler",
+    "InMemorySampleSink",
+    "NpySampleSink",
+    "OnlineReducer",
+    "ParallelTempering",
     "RejectionSampling",
+    "RunningEffectiveSampleSize",
+    "RunningMean",
+    "RunningQuantiles",
+    "RunningVariance",
+    "SampleSink",
     "SingleSiteAncestralMetropolisHastings",
+    "SingleSiteEnumerativeGibbs",
     "SingleSiteHamiltonianMonteCarlo",
     "SingleSiteNewtonianMonteCarlo",
     "SingleSiteNoUTurnSampler",
     "SingleSiteRandomWalk",
     "SingleSiteUniformMetropolisHastings",
+    "StochasticGradientHamiltonianMonteCarlo",
+    "StochasticGradientLangevinDynamics",
     "VerboseLevel",
     "empirical",
     "seed",
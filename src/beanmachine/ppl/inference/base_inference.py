@@ -7,16 +7,20 @@ import copy
 import warnings
 from abc import ABCMeta, abstractmethod
 from functools import partial
-from typing import List, Optional, Set, Tuple
+from typing import Collection, Dict, Iterable, List, Optional, Set, Tuple
 
 import torch
 from beanmachine.ppl.inference.monte_carlo_samples import MonteCarloSamples
 from beanmachine.ppl.inference.proposer.base_proposer import BaseProposer
+from beanmachine.ppl.inference.reducers import OnlineReducer
+from beanmachine.ppl.inference.sample_sink import InMemorySampleSink, SampleSink
 from beanmachine.ppl.inference.sampler import Sampler
 from beanmachine.ppl.inference.utils import (
     _execute_in_new_thread,
     _verify_queries_and_observations,
+    batched_nodes,
     seed as set_seed,
+    sum_to_batch_shape,
     VerboseLevel,
 )
 from beanmachine.ppl.model.rv_identifier import RVIdentifier
@@ -27,6 +31,189 @@ from tqdm.notebook import tqdm as notebook_tqdm
 from typing_extensions import Literal
 
 
+# summary statistics of a chain, with one dictionary (keyed by the names of the
+# reducers) for each query
+ChainSummaries = List[Dict[str, torch.Tensor]]
+
+
+def _num_retained_draws(num_draws: int, thinning: int) -> int:
+    return -(-num_draws // thinning)
+
+
+def _is_retained(iteration: int, num_adaptive_samples: int, thinning: int) -> bool:
+    # adaptive and non-adaptive draws are thinned separately, so that the first
+    # draw after adaptation is always retained
+    if iteration >= num_adaptive_samples:
+        iteration -= num_adaptive_samples
+    return iteration % thinning == 0
+
+
+def _query_values(world: World, queries: List[RVIdentifier]) -> List[torch.Tensor]:
+    samples = []
+    for query in queries:
+        raw_val = world.call(query)
+        if not isinstance(raw_val, torch.Tensor):
+            raise TypeError(
+                "The value returned by a queried function must be a tensor."
+            )
+        samples.append(raw_val)
+    return samples
+
+
+def _update_reducers(
+    chain_reducers: List[Dict[str, OnlineReducer]], samples: List[torch.Tensor]
+) -> None:
+    for query_reducers, raw_val in zip(chain_reducers, samples):
+        for reducer in query_reducers.values():
+            reducer.update(raw_val)
+
+
+def _finalize_reducers(
+    chain_reducers: List[Dict[str, OnlineReducer]]
+) -> ChainSummaries:
+    return [
+        {name: reducer.finalize() for name, reducer in query_reducers.items()}
+        for query_reducers in chain_reducers
+    ]
+
+
+def _initialize_vectorized_world(
+    queries: List[RVIdentifier],
+    observations: RVDict,
+    initialize_fn: InitializeFn,
+    max_init_retries: int,
+    batch_shape: torch.Size,
+) -> World:
+    """Initialize every chain independently, then stack the values of the latent
+    variables of the chains along the leading batch dimension."""
+    worlds = [
+        World.initialize_world(queries, observations, initialize_fn, max_init_retries)
+        for _ in range(batch_shape.numel())
+    ]
+    latent_nodes = worlds[0].latent_nodes
+    if any(world.latent_nodes != latent_nodes for world in worlds):
+        raise ValueError(
+            "Chains can only be vectorized for models with a static structure."
+        )
+    world = worlds[0].replace(
+        {node: torch.stack([w[node] for w in worlds]) for node in latent_nodes}
+    )
+    nodes_with_batch_dims = batched_nodes(world)
+    for node in world:
+        node_log_prob = world.get_variable(node).log_prob
+        if (
+            node in nodes_with_batch_dims
+            and node_log_prob.shape[: len(batch_shape)] != batch_shape
+        ) or not torch.isfinite(node_log_prob).all():
+            raise ValueError(
+                f"Unable to evaluate {node} with vectorized chains. The model "
+                "should broadcast over a leading chain dimension."
+            )
+    return world
+
+
+def _batched_query_values(
+    world: World,
+    queries: List[RVIdentifier],
+    nodes_with_batch_dims: Set[RVIdentifier],
+    batch_shape: torch.Size,
+) -> List[torch.Tensor]:
+    """Return the values of the queries in a world with vectorized chains, where the
+    values that do not depend on the latent variables are expanded to the batch."""
+    samples = []
+    for query, raw_val in zip(queries, _query_values(world, queries)):
+        if query in world:
+            is_batched = query in nodes_with_batch_dims
+        else:
+            # functionals are only batched if they depend on the latent variables
+            is_batched = raw_val.shape[: len(batch_shape)] == batch_shape
+        if not is_batched:
+            raw_val = raw_val.expand(batch_shape + raw_val.shape)
+        samples.append(raw_val)
+    return samples
+
+
+def _group_by_family(nodes: Iterable[RVIdentifier]) -> List[List[RVIdentifier]]:
+    """Return the nodes grouped by random variable family."""
+    families = {}
+    for node in nodes:
+        families.setdefault(node.wrapper, []).append(node)
+    return list(families.values())
+
+
+class _LogLikelihoodRecorder:
+    """
+    Records the log likelihoods of the observations at the draws it is given. The
+    log probs of the observations of a random variable family are reduced together
+    as a single stacked tensor per draw, and they are only split into one tensor per
+    observation once all draws are recorded.
+
+    Args:
+        observations: The observations to record the log likelihoods of.
+        batch_shape: The shape of the leading batch dimensions of vectorized chains.
+        nodes_with_batch_dims: The nodes whose log probs carry the batch dimensions
+            (see ``batched_nodes``). Only used if ``batch_shape`` is not empty.
+    """
+
+    def __init__(
+        self,
+        observations: RVDict,
+        batch_shape: torch.Size = torch.Size(),  # noqa: B008
+        nodes_with_batch_dims: Collection[RVIdentifier] = (),
+    ):
+        self._nodes = list(observations)
+        self._families = _group_by_family(self._nodes)
+        self._batch_shape = batch_shape
+        self._is_batched = [
+            [not batch_shape or node in nodes_with_batch_dims for node in family]
+            for family in self._families
+        ]
+        self._draws: List[List[torch.Tensor]] = [[] for _ in self._families]
+
+    def _family_log_likelihoods(
+        self, world: World, family: List[RVIdentifier], is_batched: List[bool]
+    ) -> torch.Tensor:
+        """Returns the log likelihoods of the nodes of a family at the current draw,
+        of shape batch_shape + (len(family),)"""
+        log_probs = [world.get_variable(node).log_prob for node in family]
+        if any(lp.shape != log_probs[0].shape for lp in log_probs) or any(
+            flag != is_batched[0] for flag in is_batched
+        ):
+            return torch.stack(
+                [
+                    sum_to_batch_shape(log_prob, self._batch_shape, flag)
+                    for log_prob, flag in zip(log_probs, is_batched)
+                ],
+                dim=-1,
+            )
+        # reduce the log probs of the whole family at once
+        kept_shape = self._batch_shape if is_batched[0] else torch.Size()
+        stacked = torch.stack(log_probs, dim=-1).reshape(kept_shape + (-1, len(family)))
+        return stacked.sum(-2).expand(self._batch_shape + (len(family),))
+
+    def record(self, world: World) -> None:
+        for node in self._nodes:
+            # some proposers leave the observations to be re-run on demand
+            if node not in world:
+                world.call(node)
+        for family, is_batched, draws in zip(
+            self._families, self._is_batched, self._draws
+        ):
+            draws.append(self._family_log_likelihoods(world, family, is_batched))
+
+    def finalize(self) -> List[torch.Tensor]:
+        """Returns the recorded log likelihoods of every observation (in the order of
+        the observations), of shape batch_shape + (num_draws,)"""
+        log_likelihoods = {}
+        for family, draws in zip(self._families, self._draws):
+            if draws:
+                stacked = torch.stack(draws, dim=-1)
+            else:
+                stacked = torch.empty(self._batch_shape + (len(family), 0))
+            log_likelihoods.update(zip(family, stacked.unbind(-2)))
+        return [log_likelihoods[node] for node in self._nodes]
+
+
 class BaseInference(metaclass=ABCMeta):
     """
     Abstract class all inference methods should inherit from.
@@ -34,6 +221,12 @@ class BaseInference(metaclass=ABCMeta):
 
     # maximum value of a seed
     _MAX_SEED_VAL: int = 2**32 - 1
+    # whether the algorithm can run multiple chains stacked along a leading batch
+    # dimension (see `_vectorized_chains_infer`)
+    _supports_vectorized_chains: bool = False
+    # shape of the leading batch dimension of the values in the worlds, which is set
+    # by `_vectorized_chains_infer` on the copy of the inference that it runs
+    _batch_shape: torch.Size = torch.Size()
 
     @abstractmethod
     def get_proposers(
@@ -63,12 +256,17 @@ class BaseInference(metaclass=ABCMeta):
         show_progress_bar: bool,
         initialize_fn: InitializeFn,
         max_init_retries: int,
+        sample_sink: SampleSink,
+        thinning: int,
+        reducers: Dict[str, OnlineReducer],
+        record_log_likelihoods: bool,
         chain_id: int,
         seed: Optional[int] = None,
-    ) -> Tuple[List[torch.Tensor], List[torch.Tensor]]:
+    ) -> Tuple[SampleSink, List[torch.Tensor], ChainSummaries]:
         """
-        Run a single chain of inference. Return a list of samples (in the same order as
-        the queries) and a list of log likelihood on observations
+        Run a single chain of inference. Return the (closed) sink that the samples of
+        the chain were written to (in the same order as the queries), a list of log
+        likelihood on observations and the online summaries of the queries
 
         Args:
             queries: A list of queries.
@@ -79,6 +277,12 @@ class BaseInference(metaclass=ABCMeta):
             initialize_fn: A callable that takes in a distribution and returns a Tensor.
             max_init_retries: The number of attempts to make to initialize values for an
                 inference before throwing an error.
+            sample_sink: The sink to create the sink of the current chain from.
+            thinning: Only every ``thinning``-th draw is retained.
+            reducers: The online reducers to compute for every query.
+            record_log_likelihoods: Whether to record the log likelihoods of the
+                observations at the retained non-adaptive draws (otherwise an empty
+                list is returned).
             chain_id: The index of the current chain.
             seed: If provided, the seed will be used to initialize the state of the
             random number generators for the current chain
@@ -99,31 +303,151 @@ class BaseInference(metaclass=ABCMeta):
             initialize_fn,
             max_init_retries,
         )
-        samples = [[] for _ in queries]
-        log_likelihoods = [[] for _ in observations]
+        chain_sink = sample_sink.for_chain(
+            chain_id,
+            _num_retained_draws(num_adaptive_samples, thinning)
+            + _num_retained_draws(num_samples, thinning),
+        )
+        recorder = _LogLikelihoodRecorder(
+            observations if record_log_likelihoods else {}
+        )
+        chain_reducers = [copy.deepcopy(reducers) for _ in queries]
+
+        # Main inference loop
+        for iteration, world in enumerate(
+            tqdm(
+                sampler,
+                total=num_samples + num_adaptive_samples,
+                desc="Samples collected",
+                disable=not show_progress_bar,
+                position=chain_id,
+            )
+        ):
+            is_retained = _is_retained(iteration, num_adaptive_samples, thinning)
+            is_reduced = bool(reducers) and iteration >= num_adaptive_samples
+            if not (is_retained or is_reduced):
+                continue
+            # Extract samples
+            samples = _query_values(world, queries)
+            if is_reduced:
+                _update_reducers(chain_reducers, samples)
+            if is_retained:
+                if iteration >= num_adaptive_samples:
+                    recorder.record(world)
+                chain_sink.append(samples)
+
+        chain_sink.close()
+        return chain_sink, recorder.finalize(), _finalize_reducers(chain_reducers)
+
+    def _vectorized_chains_infer(
+        self,
+        queries: List[RVIdentifier],
+        observations: RVDict,
+        num_samples: int,
+        num_adaptive_samples: int,
+        show_progress_bar: bool,
+        initialize_fn: InitializeFn,
+        max_init_retries: int,
+        sample_sink: SampleSink,
+        thinning: int,
+        reducers: Dict[str, OnlineReducer],
+        record_log_likelihoods: bool,
+        num_chains: int,
+    ) -> List[Tuple[SampleSink, List[torch.Tensor], ChainSummaries]]:
+        """
+        Run all chains of inference together in the current process, with the values of
+        the latent variables of every chain stacked along a leading batch dimension.
+        This requires the model to broadcast over the leading dimension and its graph
+        structure to be the same in every chain. Return a list of results in the same
+        format as ``_single_chain_infer``, one for each chain.
+
+        Args:
+            queries: A list of queries.
+            observations: A dictionary of observations.
+            num_samples: Number of samples.
+            num_adaptive_samples: Number of adaptive samples.
+            show_progress_bar: Whether to display the progress bar.
+            initialize_fn: A callable that takes in a distribution and returns a Tensor.
+            max_init_retries: The number of attempts to make to initialize values for an
+                inference before throwing an error.
+            sample_sink: The sink to create the sinks of the chains from.
+            thinning: Only every ``thinning``-th draw is retained.
+            reducers: The online reducers to compute for every query.
+            record_log_likelihoods: Whether to record the log likelihoods of the
+                observations at the retained non-adaptive draws (otherwise an empty
+                list is returned for every chain).
+            num_chains: The number of chains to stack together.
+        """
+        if not self._supports_vectorized_chains:
+            raise NotImplementedError(
+                f"{self.__class__.__name__} does not support vectorized chains."
+            )
+        batch_shape = torch.Size([num_chains])
+        world = _initialize_vectorized_world(
+            queries, observations, initialize_fn, max_init_retries, batch_shape
+        )
+        nodes_with_batch_dims = batched_nodes(world)
+
+        kernel = copy.deepcopy(self)
+        kernel._batch_shape = batch_shape
+        sampler = Sampler(kernel, world, num_samples, num_adaptive_samples)
+        num_retained_draws = _num_retained_draws(
+            num_adaptive_samples, thinning
+        ) + _num_retained_draws(num_samples, thinning)
+        chain_sinks = [
+            sample_sink.for_chain(chain, num_retained_draws)
+            for chain in range(num_chains)
+        ]
+        recorder = _LogLikelihoodRecorder(
+            observations if record_log_likelihoods else {},
+            batch_shape,
+            nodes_with_batch_dims,
+        )
+        chain_reducers = [
+            [copy.deepcopy(reducers) for _ in queries] for _ in range(num_chains)
+        ]
 
         # Main inference loop
-        for world in tqdm(
-            sampler,
-            total=num_samples + num_adaptive_samples,
-            desc="Samples collected",
-            disable=not show_progress_bar,
-            position=chain_id,
+        for iteration, world in enumerate(
+            tqdm(
+                sampler,
+                total=num_samples + num_adaptive_samples,
+                desc="Samples collected",
+                disable=not show_progress_bar,
+            )
         ):
-            for idx, obs in enumerate(observations):
-                log_likelihoods[idx].append(world.log_prob([obs]))
+            is_retained = _is_retained(iteration, num_adaptive_samples, thinning)
+            is_reduced = bool(reducers) and iteration >= num_adaptive_samples
+            if not (is_retained or is_reduced):
+                continue
             # Extract samples
-            for idx, query in enumerate(queries):
-                raw_val = world.call(query)
-                if not isinstance(raw_val, torch.Tensor):
-                    raise TypeError(
-                        "The value returned by a queried function must be a tensor."
+            samples = _batched_query_values(
+                world, queries, nodes_with_batch_dims, batch_shape
+            )
+            if is_reduced:
+                for chain, query_reducers_list in enumerate(chain_reducers):
+                    _update_reducers(
+                        query_reducers_list, [val[chain] for val in samples]
                     )
-                samples[idx].append(raw_val)
+            if is_retained:
+                if iteration >= num_adaptive_samples:
+                    recorder.record(world)
+                for chain, chain_sink in enumerate(chain_sinks):
+                    chain_sink.append([val[chain] for val in samples])
 
-        samples = [torch.stack(val) for val in samples]
-        log_likelihoods = [torch.stack(val) for val in log_likelihoods]
-        return samples, log_likelihoods
+        # split the results into chains
+        log_likelihoods = recorder.finalize()
+        results = []
+        for chain, chain_sink in enumerate(chain_sinks):
+            chain_sink.close()
+            results.append(
+                (
+                    chain_sink,
+                    [val[chain] for val in log_likelihoods],
+                    _finalize_reducers(chain_reducers[chain]),
+                )
+            )
+        return results
 
     def infer(
         self,
@@ -138,6 +462,11 @@ class BaseInference(metaclass=ABCMeta):
         run_in_parallel: bool = False,
         mp_context: Optional[Literal["fork", "spawn", "forkserver"]] = None,
         verbose: Optional[VerboseLevel] = None,
+        vectorize_chains: bool = False,
+        sample_sink: Optional[SampleSink] = None,
+        thinning: int = 1,
+        reducers: Optional[Dict[str, OnlineReducer]] = None,
+        record_log_likelihoods: bool = False,
     ) -> MonteCarloSamples:
         """
         Performs inference and returns a ``MonteCarloSamples`` object with samples from the posterior.
@@ -161,6 +490,24 @@ class BaseInference(metaclass=ABCMeta):
                 to used for parallel inference.
             verbose: (Deprecated) Whether to display the progress bar. This option
                 is deprecated, please use ``show_progress_bar`` instead.
+            vectorize_chains: Whether to run all chains together in the current process
+                by stacking them along a leading batch dimension (defaults to False).
+                This is only supported by global HMC and NUTS, and requires the model
+                to broadcast over the leading dimension.
+            sample_sink: Where to write the samples to as they are drawn. Defaults to
+                an ``InMemorySampleSink``. Use a ``NpySampleSink`` to stream the
+                samples to disk instead of keeping them in memory.
+            thinning: Only retain every ``thinning``-th draw of the adaptive and of
+                the non-adaptive samples (defaults to 1, which retains every draw).
+            reducers: Summary statistics to compute on the fly for every query,
+                keyed by name (e.g. ``{"mean": RunningMean()}``). They are updated
+                with every non-adaptive draw, regardless of ``thinning``, and can be
+                retrieved with ``MonteCarloSamples.get_online_summary``. Combine them
+                with a ``DiscardSampleSink`` to keep the summaries only.
+            record_log_likelihoods: Whether to record the log likelihood of every
+                observation at every retained non-adaptive draw, e.g. to compute
+                information criteria with ArviZ (defaults to False, in which case
+                ``MonteCarloSamples.log_likelihoods`` is None).
         """
         if verbose is not None:
             warnings.warn(
@@ -177,6 +524,12 @@ class BaseInference(metaclass=ABCMeta):
         )
         if num_adaptive_samples is None:
             num_adaptive_samples = self._get_default_num_adaptive_samples(num_samples)
+        if sample_sink is None:
+            sample_sink = InMemorySampleSink()
+        if thinning < 1:
+            raise ValueError("thinning should be a positive integer")
+        if reducers is None:
+            reducers = {}
 
         single_chain_infer = partial(
             self._single_chain_infer,
@@ -187,8 +540,27 @@ class BaseInference(metaclass=ABCMeta):
             show_progress_bar,
             initialize_fn,
             max_init_retries,
+            sample_sink,
+            thinning,
+            reducers,
+            record_log_likelihoods,
         )
-        if not run_in_parallel:
+        if vectorize_chains:
+            chain_results = self._vectorized_chains_infer(
+                queries,
+                observations,
+                num_samples,
+                num_adaptive_samples,
+                show_progress_bar,
+                initialize_fn,
+                max_init_retries,
+                sample_sink,
+                thinning,
+                reducers,
+                record_log_likelihoods,
+                num_chains,
+            )
+        elif not run_in_parallel:
             chain_results = map(single_chain_infer, range(num_chains))
         else:
             ctx = mp.get_context(mp_context)
@@ -209,22 +581,39 @@ class BaseInference(metaclass=ABCMeta):
             ) as p:
                 chain_results = p.starmap(single_chain_infer, enumerate(seeds))
 
-        all_samples, all_log_liklihoods = zip(*chain_results)
+        chain_sinks, all_log_liklihoods, all_summaries = zip(*chain_results)
         # the hash of RVIdentifier can change when it is being sent to another process,
         # so we have to rely on the order of the returned list to determine which samples
         # correspond to which RVIdentifier
-        all_samples = [dict(zip(queries, samples)) for samples in all_samples]
-        # in python the order of keys in a dict is fixed, so we can rely on it
-        all_log_liklihoods = [
-            dict(zip(observations.keys(), log_likelihoods))
-            for log_likelihoods in all_log_liklihoods
-        ]
+        if queries:
+            all_samples = dict(zip(queries, sample_sink.merge(list(chain_sinks))))
+        else:
+            all_samples = [{} for _ in chain_sinks]
+        if record_log_likelihoods:
+            # in python the order of keys in a dict is fixed, so we can rely on it
+            all_log_liklihoods = [
+                dict(zip(observations.keys(), log_likelihoods))
+                for log_likelihoods in all_log_liklihoods
+            ]
+        else:
+            all_log_liklihoods = None
+        online_summaries = {
+            name: {
+                query: torch.stack(
+                    [summaries[idx][name] for summaries in all_summaries]
+                )
+                for idx, query in enumerate(queries)
+            }
+            for name in reducers
+        }
 
         return MonteCarloSamples(
             all_samples,
-            num_adaptive_samples,
+            _num_retained_draws(num_adaptive_samples, thinning),
             all_log_liklihoods,
             observations,
+            online_summaries=online_summaries,
+            logll_include_adaptive_samples=False,
         )
 
     def sampler(
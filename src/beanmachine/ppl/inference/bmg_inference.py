@@ -6,18 +6,27 @@
 """An inference engine which uses Bean Machine Graph to make
 inferences on Bean Machine models."""
 
-from typing import Dict, List, Optional, Set, Tuple
+import asyncio
+import threading
+from concurrent.futures import Executor
+from contextlib import nullcontext
+from functools import partial
+from typing import Any, Dict, Hashable, List, Optional, Set, Tuple
 
 import beanmachine.ppl.compiler.performance_report as pr
 import beanmachine.ppl.compiler.profiler as prof
 import graphviz
+import numpy as np
 import torch
 from beanmachine.graph import Graph, InferConfig, InferenceType
 
 from beanmachine.ppl.compiler.bm_graph_builder import rv_to_query
-from beanmachine.ppl.compiler.fix_problems import default_skip_optimizations
+from beanmachine.ppl.compiler.fix_problems import (
+    default_skip_optimizations,
+    observation_dependent_optimizations,
+)
 from beanmachine.ppl.compiler.gen_bmg_cpp import to_bmg_cpp
-from beanmachine.ppl.compiler.gen_bmg_graph import to_bmg_graph
+from beanmachine.ppl.compiler.gen_bmg_graph import GeneratedGraph, to_bmg_graph
 from beanmachine.ppl.compiler.gen_bmg_python import to_bmg_python
 from beanmachine.ppl.compiler.gen_dot import to_dot
 from beanmachine.ppl.compiler.gen_mini import to_mini
@@ -27,6 +36,13 @@ from beanmachine.ppl.inference.monte_carlo_samples import MonteCarloSamples
 from beanmachine.ppl.inference.utils import _verify_queries_and_observations
 from beanmachine.ppl.model.rv_identifier import RVIdentifier
 
+
+def _value_signature(value: Any) -> Hashable:
+    if isinstance(value, torch.Tensor):
+        return (value.dtype, value.shape)
+    return type(value)
+
+
 # TODO[Walid]: At some point, to facilitate checking the idea that this works pretty
 # much like any other BM inference, we should probably make this class a subclass of
 # AbstractMCInference.
@@ -37,30 +53,41 @@ class BMGInference:
     inference algorithms.
 
     Internally, BMGInference consists of a compiler
-    and C++ runtime implementations of various inference algorithms. Currently,
-    only Newtonian Monte Carlo (NMC) inference is supported, and is the
-    algorithm used by default.
+    and C++ runtime implementations of various inference algorithms. Newtonian
+    Monte Carlo (NMC) inference is the algorithm used by default; for models whose
+    latent variables are all continuous, the global gradient-based HMC and NUTS
+    algorithms are also supported.
 
     Please note that this is a highly experimental implementation under active
     development, and that the subset of Bean Machine model is limited. Limitations
     include that the runtime graph should be static (meaning, it does not change
     during inference), and that the types of primitive distributions supported
     is currently limited.
+
+    Args:
+        cache_compiled_graphs: Whether to keep the compiled graphs around and reuse
+            them when inference is performed again with the same queries and the
+            same observed random variables (with values of the same shapes), only
+            rebinding the observed values. Note that the model is not recompiled
+            in that case, so changes to any data that the model closes over are
+            not picked up.
     """
 
     _fix_observe_true: bool = False
-    _pd: Optional[prof.ProfilerData] = None
 
-    def __init__(self):
-        pass
+    def __init__(self, cache_compiled_graphs: bool = False):
+        self._cache_compiled_graphs = cache_compiled_graphs
+        self._compiled_graphs: Dict[Hashable, GeneratedGraph] = {}
+        self._compiled_graph_locks: Dict[Hashable, threading.Lock] = {}
 
-    def _begin(self, s: str) -> None:
-        pd = self._pd
+    # The profiler data is created for each call of _infer and passed around
+    # explicitly, rather than stored on self, so that concurrent calls (for instance
+    # through infer_async) do not record into each other's profiles.
+    def _begin(self, pd: Optional[prof.ProfilerData], s: str) -> None:
         if pd is not None:
             pd.begin(s)
 
-    def _finish(self, s: str) -> None:
-        pd = self._pd
+    def _finish(self, pd: Optional[prof.ProfilerData], s: str) -> None:
         if pd is not None:
             pd.finish(s)
 
@@ -68,105 +95,81 @@ class BMGInference:
         self,
         queries: List[RVIdentifier],
         observations: Dict[RVIdentifier, torch.Tensor],
+        pd: Optional[prof.ProfilerData] = None,
     ) -> BMGRuntime:
         _verify_queries_and_observations(queries, observations, True)
         rt = BMGRuntime()
-        rt._pd = self._pd
+        rt._pd = pd
         bmg = rt.accumulate_graph(queries, observations)
         # TODO: Figure out a better way to pass this flag around
         bmg._fix_observe_true = self._fix_observe_true
         return rt
 
-    def _transpose_samples(self, raw):
-        self._begin(prof.transpose_samples)
-        samples = []
-        num_samples = len(raw)
-        bmg_query_count = len(raw[0])
-
-        # Suppose we have two queries and three samples;
-        # the shape we get from BMG is:
-        #
-        # [
-        #   [s00, s01],
-        #   [s10, s11],
-        #   [s20, s21]
-        # ]
-        #
-        # That is, each entry in the list has values from both queries.
-        # But what we need in the final dictionary is:
-        #
-        # {
-        #   RV0: tensor([[s00, s10, s20]]),
-        #   RV1: tensor([[s01, s11, s21]])
-        # }
-
-        transposed = [torch.tensor([x]) for x in zip(*raw)]
-        assert len(transposed) == bmg_query_count
-        assert len(transposed[0]) == 1
-        assert len(transposed[0][0]) == num_samples
-
-        # We now have
-        #
-        # [
-        #   tensor([[s00, s10, s20]]),
-        #   tensor([[s01, s11, s21]])
-        # ]
-        #
-        # which looks like what we need. But we have an additional problem:
-        # if the the sample is a matrix then it is in columns but we need it in rows.
-        #
-        # If an element of transposed is (1 x num_samples x rows x 1) then we
-        # will just reshape it to (1 x num_samples x rows).
-        #
-        # If it is (1 x num_samples x rows x columns) for columns > 1 then
-        # we transpose it to (1 x num_samples x columns x rows)
-        #
-        # If it is any other shape we leave it alone.
-
-        for i in range(len(transposed)):
-            t = transposed[i]
-            if len(t.shape) == 4:
-                if t.shape[3] == 1:
-                    assert t.shape[0] == 1
-                    assert t.shape[1] == num_samples
-                    samples.append(t.reshape(1, num_samples, t.shape[2]))
-                else:
-                    samples.append(t.transpose(2, 3))
-            else:
-                samples.append(t)
-
-        assert len(samples) == bmg_query_count
-        assert len(samples[0]) == 1
-        assert len(samples[0][0]) == num_samples
+    def _compiled_graph_key(
+        self,
+        queries: List[RVIdentifier],
+        observations: Dict[RVIdentifier, torch.Tensor],
+        skip_optimizations: Set[str],
+    ) -> Optional[Hashable]:
+        # Returns None if the compiled graph can not be reused for other values of
+        # the observations.
+        if not self._cache_compiled_graphs or self._fix_observe_true:
+            return None
+        if not observation_dependent_optimizations <= skip_optimizations:
+            return None
+        return (
+            tuple(queries),
+            tuple((rv, _value_signature(v)) for rv, v in observations.items()),
+            frozenset(skip_optimizations),
+        )
 
-        self._finish(prof.transpose_samples)
+    def _samples_to_tensors(
+        self, raw: List[np.ndarray], pd: Optional[prof.ProfilerData] = None
+    ) -> List[torch.Tensor]:
+        self._begin(pd, prof.transpose_samples)
+        # BMG gives us one contiguous array per query, of shape
+        # (num_chains, num_samples, *value_shape), with matrix-valued samples
+        # already laid out in rows. We wrap them as tensors without copying, except
+        # for scalar real-valued samples, which are converted to the default dtype
+        # as they were when the samples were transferred value by value.
+        samples = []
+        for r in raw:
+            t = torch.from_numpy(r)
+            if r.ndim == 2 and t.is_floating_point():
+                t = t.to(torch.get_default_dtype())
+            samples.append(t)
+        self._finish(pd, prof.transpose_samples)
         return samples
 
     def _build_mcsamples(
-        self, rv_to_query, samples, query_to_query_id, num_samples: int, num_chains: int
+        self,
+        rv_to_query,
+        samples: List[torch.Tensor],
+        query_to_query_id,
+        num_samples: int,
+        num_chains: int,
+        num_adaptive_samples: int = 0,
+        pd: Optional[prof.ProfilerData] = None,
     ) -> MonteCarloSamples:
-        self._begin(prof.build_mcsamples)
-
-        assert len(samples) == num_chains
-
-        results = []
-        for chain_num in range(num_chains):
-            result: Dict[RVIdentifier, torch.Tensor] = {}
-            for (rv, query) in rv_to_query.items():
-                query_id = query_to_query_id[query]
-                result[rv] = samples[chain_num][query_id]
-            results.append(result)
-        # MonteCarloSamples almost provides just what we need here,
-        # but it requires the input to be of a different type in the
-        # cases of num_chains==1 and !=1 respectively. Furthermore,
-        # we had to tweak it to support the right operator for merging
-        # saumple values when num_chains!=1.
-        if num_chains == 1:
-            mcsamples = MonteCarloSamples(results[0], 0, stack_not_cat=True)
+        self._begin(pd, prof.build_mcsamples)
+
+        result: Dict[RVIdentifier, torch.Tensor] = {}
+        for (rv, query) in rv_to_query.items():
+            query_id = query_to_query_id[query]
+            result[rv] = samples[query_id]
+            assert result[rv].shape[:2] == (
+                num_chains,
+                num_adaptive_samples + num_samples,
+            )
+        if len(result) == 0:
+            # MonteCarloSamples needs a leading chain dimension to count the chains.
+            mcsamples = MonteCarloSamples(
+                [{} for _ in range(num_chains)], num_adaptive_samples
+            )
         else:
-            mcsamples = MonteCarloSamples(results, 0, stack_not_cat=False)
+            mcsamples = MonteCarloSamples(result, num_adaptive_samples)
 
-        self._finish(prof.build_mcsamples)
+        self._finish(pd, prof.build_mcsamples)
 
         return mcsamples
 
@@ -179,50 +182,67 @@ class BMGInference:
         inference_type: InferenceType = InferenceType.NMC,
         produce_report: bool = True,
         skip_optimizations: Set[str] = default_skip_optimizations,
+        infer_config: Optional[InferConfig] = None,
     ) -> Tuple[MonteCarloSamples, PerformanceReport]:
-        if produce_report:
-            self._pd = prof.ProfilerData()
-
-        rt = self._accumulate_graph(queries, observations)
-        bmg = rt._bmg
-        report = pr.PerformanceReport()
-
-        self._begin(prof.infer)
-
-        generated_graph = to_bmg_graph(bmg, skip_optimizations)
-        g = generated_graph.graph
-        query_to_query_id = generated_graph.query_to_query_id
-
-        samples = []
-
-        # BMG requires that we have at least one query.
-        if len(query_to_query_id) != 0:
-            g.collect_performance_data(produce_report)
-            self._begin(prof.graph_infer)
-            default_config = InferConfig()
-            # TODO[Walid]: In the following we were previously silently using the default seed
-            # specified in pybindings.cpp (and not passing the local one in). In the current
-            # code we are explicitly passing in the same default value used in that file (5123401).
-            # We really need a way to defer to the value defined in pybindings.py here.
-            try:
-                raw = g.infer(
-                    num_samples, inference_type, 5123401, num_chains, default_config
-                )
-            except RuntimeError as e:
-                raise RuntimeError(
-                    "Error during BMG inference\n"
-                    + "Note: the runtime error from BMG may not be interpretable.\n"
-                ) from e
-
-            self._finish(prof.graph_infer)
-            if produce_report:
-                self._begin(prof.deserialize_perf_report)
-                js = g.performance_report()
-                report = pr.json_to_perf_report(js)
-                self._finish(prof.deserialize_perf_report)
-            assert len(raw) == num_chains
-            assert all([len(r) == num_samples for r in raw])
-            samples = [self._transpose_samples(r) for r in raw]
+        if infer_config is None:
+            infer_config = InferConfig()
+        pd = prof.ProfilerData() if produce_report else None
+
+        key = self._compiled_graph_key(queries, observations, skip_optimizations)
+        # A cached graph is shared by all the calls with the same key, so we must not
+        # rebind its observations while another thread is running inference on it.
+        lock = (
+            nullcontext()
+            if key is None
+            else self._compiled_graph_locks.setdefault(key, threading.Lock())
+        )
+        with lock:
+            generated_graph = None if key is None else self._compiled_graphs.get(key)
+            if generated_graph is not None:
+                _verify_queries_and_observations(queries, observations, True)
+                self._begin(pd, prof.infer)
+                generated_graph.rebind_observations(observations)
+            else:
+                rt = self._accumulate_graph(queries, observations, pd)
+                bmg = rt._bmg
+                self._begin(pd, prof.infer)
+                generated_graph = to_bmg_graph(bmg, skip_optimizations)
+                if key is not None:
+                    self._compiled_graphs[key] = generated_graph
+            report = pr.PerformanceReport()
+
+            g = generated_graph.graph
+            query_to_query_id = generated_graph.query_to_query_id
+
+            samples = []
+
+            # BMG requires that we have at least one query.
+            if len(query_to_query_id) != 0:
+                g.collect_performance_data(produce_report)
+                self._begin(pd, prof.graph_infer)
+                # TODO[Walid]: In the following we were previously silently using the default seed
+                # specified in pybindings.cpp (and not passing the local one in). In the current
+                # code we are explicitly passing in the same default value used in that file (5123401).
+                # We really need a way to defer to the value defined in pybindings.py here.
+                try:
+                    raw = g.infer_to_numpy(
+                        num_samples, inference_type, 5123401, num_chains, infer_config
+                    )
+                except RuntimeError as e:
+                    raise RuntimeError(
+                        "Error during BMG inference\n"
+                        + "Note: the runtime error from BMG may not be interpretable.\n"
+                    ) from e
+
+                self._finish(pd, prof.graph_infer)
+                if produce_report:
+                    self._begin(pd, prof.deserialize_perf_report)
+                    js = g.performance_report()
+                    report = pr.json_to_perf_report(js)
+                    self._finish(pd, prof.deserialize_perf_report)
+                # Queries of the same node share a BMG query.
+                assert len(raw) == len(set(query_to_query_id.values()))
+                samples = self._samples_to_tensors(raw, pd)
 
         # TODO: Make _rv_to_query public. Add it to BMGraphBuilder?
         mcsamples = self._build_mcsamples(
@@ -231,12 +251,17 @@ class BMGInference:
             query_to_query_id,
             num_samples,
             num_chains,
+            infer_config.num_warmup if infer_config.keep_warmup else 0,
+            pd,
         )
 
-        self._finish(prof.infer)
+        self._finish(pd, prof.infer)
 
-        if produce_report:
-            report.profiler_report = self._pd.to_report()  # pyre-ignore
+        if pd is not None:
+            report.profiler_report = pd.to_report()
+            # Statistics of each pass of the compiler; empty if a cached
+            # compiled graph was used.
+            report.compiler_passes = pd.passes
 
         return mcsamples, report
 
@@ -248,6 +273,7 @@ class BMGInference:
         num_chains: int = 4,
         inference_type: InferenceType = InferenceType.NMC,
         skip_optimizations: Set[str] = default_skip_optimizations,
+        infer_config: Optional[InferConfig] = None,
     ) -> MonteCarloSamples:
         """
         Perform inference by (runtime) compilation of Python source code associated
@@ -259,8 +285,11 @@ class BMGInference:
             observations: observations dict
             num_samples: number of samples in each chain
             num_chains: number of chains generated
-            inference_type: inference method, currently only NMC is supported
+            inference_type: inference method; NMC, HMC and NUTS are supported
             skip_optimizations: list of optimization to disable in this call
+            infer_config: other settings of the inference method, such as the
+                number of warmup samples, and the initial step size, path length
+                and mass matrix adaptation of HMC and NUTS
 
         Returns:
             MonteCarloSamples: The requested samples
@@ -275,9 +304,56 @@ class BMGInference:
             inference_type,
             False,
             skip_optimizations,
+            infer_config,
         )
         return samples
 
+    def infer_async(
+        self,
+        queries: List[RVIdentifier],
+        observations: Dict[RVIdentifier, torch.Tensor],
+        num_samples: int,
+        num_chains: int = 4,
+        inference_type: InferenceType = InferenceType.NMC,
+        skip_optimizations: Set[str] = default_skip_optimizations,
+        infer_config: Optional[InferConfig] = None,
+        executor: Optional[Executor] = None,
+    ) -> "asyncio.Future[MonteCarloSamples]":
+        """
+        Perform inference like ``infer``, but in a thread pool, and return an asyncio
+        future of the samples. Must be called from a running event loop. BMG releases
+        the GIL while it runs inference, so that other models (or other requests of
+        a server) can make progress concurrently.
+
+        Args:
+            queries: queried random variables
+            observations: observations dict
+            num_samples: number of samples in each chain
+            num_chains: number of chains generated
+            inference_type: inference method; NMC, HMC and NUTS are supported
+            skip_optimizations: list of optimization to disable in this call
+            infer_config: other settings of the inference method
+            executor: the executor to run inference in, defaults to the default
+                executor of the event loop
+
+        Returns:
+            asyncio.Future: A future of the requested samples
+        """
+        loop = asyncio.get_running_loop()
+        return loop.run_in_executor(
+            executor,
+            partial(
+                self.infer,
+                queries,
+                observations,
+                num_samples,
+                num_chains,
+                inference_type,
+                skip_optimizations,
+                infer_config,
+            ),
+        )
+
     def to_dot(
         self,
         queries: List[RVIdentifier],
@@ -19,6 +19,14 @@ from typing import (
 
 from beanmachine.ppl.inference.base_inference import BaseInference
 from beanmachine.ppl.inference.proposer.base_proposer import BaseProposer
+from beanmachine.ppl.inference.proposer.conjugate_gibbs_proposer import (
+    ConjugateGibbsProposer,
+    is_conjugate,
+)
+from beanmachine.ppl.inference.proposer.enumerative_gibbs_proposer import (
+    EnumerativeGibbsProposer,
+    is_enumerable,
+)
 from beanmachine.ppl.inference.proposer.nuts_proposer import NUTSProposer
 from beanmachine.ppl.inference.proposer.sequential_proposer import SequentialProposer
 from beanmachine.ppl.inference.proposer.single_site_uniform_proposer import (
@@ -43,11 +51,12 @@ else:
 
 class _DefaultInference(BaseInference):
     """
-    Mixed inference class that handles both discrete and continuous RVs
+    Mixed inference class that handles both discrete and continuous RVs. RVs with
+    a conjugate prior or a finite support are updated with exact Gibbs steps.
     """
 
     def __init__(self):
-        self._disc_proposers = {}
+        self._single_site_proposers = {}
         self._cont_proposer = None
         self._continuous_rvs = set()
 
@@ -59,14 +68,21 @@ class _DefaultInference(BaseInference):
     ) -> List[BaseProposer]:
         proposers = []
         for node in target_rvs:
-            if node not in self._disc_proposers:
+            if node in self._continuous_rvs:
+                continue
+            if node not in self._single_site_proposers:
                 support = world.get_variable(node).distribution.support
-                if not support.is_discrete:
+                if is_conjugate(world, node):
+                    # conjugate nodes are updated exactly by Gibbs sampling instead
+                    self._single_site_proposers[node] = ConjugateGibbsProposer(node)
+                elif not support.is_discrete:
                     self._continuous_rvs.add(node)
                     continue
+                elif is_enumerable(world, node):
+                    self._single_site_proposers[node] = EnumerativeGibbsProposer([node])
                 else:
-                    self._disc_proposers[node] = SingleSiteUniformProposer(node)
-            proposers.append(self._disc_proposers[node])
+                    self._single_site_proposers[node] = SingleSiteUniformProposer(node)
+            proposers.append(self._single_site_proposers[node])
         if self._cont_proposer is not None:
             if len(self._cont_proposer._target_rvs) != len(self._continuous_rvs):
                 raise ValueError(
@@ -112,7 +128,13 @@ class CompositionalInference(BaseInference):
     The ``CompositionalInference`` class enables combining multiple inference algorithms
     and blocking random variables together. By default, continuous variables will be
     blocked together and use the ``GlobalNoUTurnProposer``. Discrete variables will
-    be proposed independently with ``SingleSiteUniformProposer``.
+    be proposed independently, from their exact conditional distribution with
+    ``EnumerativeGibbsProposer`` if they are scalars with a finite support, and with
+    ``SingleSiteUniformProposer`` otherwise. Variables with a
+    Beta, Normal, Gamma or Dirichlet prior whose children are all conjugate
+    likelihoods of it (i.e. Bernoulli or Binomial, Normal, Poisson or Categorical,
+    respectively) are instead sampled from their exact conditional distribution
+    with ``ConjugateGibbsProposer``.
     To override the default behavior, you can pass an ``inference_dict``. To learn more
     about Compositional Inference, please see the `Compositional Inference
     <https://beanmachine.org/docs/compositional_inference/>`_ page on our website.
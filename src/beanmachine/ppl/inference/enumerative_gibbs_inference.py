@@ -0,0 +1,63 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+#
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+
+from typing import List, Set
+
+from beanmachine.ppl.inference.base_inference import BaseInference
+from beanmachine.ppl.inference.proposer.base_proposer import BaseProposer
+from beanmachine.ppl.inference.proposer.enumerative_gibbs_proposer import (
+    EnumerativeGibbsProposer,
+)
+from beanmachine.ppl.model.rv_identifier import RVIdentifier
+from beanmachine.ppl.world import World
+
+
+class GlobalEnumerativeGibbs(BaseInference):
+    """
+    Global enumerative Gibbs sampler. This sampler blocks multiple discrete variables
+    together and samples them jointly from their exact conditional distribution by
+    enumerating their joint support. Since the joint support grows exponentially
+    with the number of variables, this is meant to be used on small blocks of
+    correlated variables in ``CompositionalInference``, e.g.::
+
+        CompositionalInference({(model.foo, model.bar): bm.GlobalEnumerativeGibbs()})
+    """
+
+    def __init__(self):
+        self._proposer = None
+
+    def get_proposers(
+        self,
+        world: World,
+        target_rvs: Set[RVIdentifier],
+        num_adaptive_sample: int,
+    ) -> List[BaseProposer]:
+        if self._proposer is None:
+            self._proposer = EnumerativeGibbsProposer(target_rvs)
+        return [self._proposer]
+
+
+class SingleSiteEnumerativeGibbs(BaseInference):
+    """
+    Single site enumerative Gibbs sampler. This sampler updates each discrete
+    variable in the World one at a time by sampling from its exact conditional
+    distribution, which is computed by enumerating its support.
+    """
+
+    def __init__(self):
+        self._proposers = {}
+
+    def get_proposers(
+        self,
+        world: World,
+        target_rvs: Set[RVIdentifier],
+        num_adaptive_sample: int,
+    ) -> List[BaseProposer]:
+        proposers = []
+        for node in target_rvs:
+            if node not in self._proposers:
+                self._proposers[node] = EnumerativeGibbsProposer([node])
+            proposers.append(self._proposers[node])
+        return proposers
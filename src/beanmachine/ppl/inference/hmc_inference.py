@@ -3,7 +3,7 @@
 # This source code is licensed under the MIT license found in the
 # LICENSE file in the root directory of this source tree.
 
-from typing import List, Set
+from typing import Collection, List, Optional, Set
 
 from beanmachine.ppl.inference.base_inference import BaseInference
 from beanmachine.ppl.inference.proposer.base_proposer import BaseProposer
@@ -28,8 +28,16 @@ class GlobalHamiltonianMonteCarlo(BaseInference):
             to smaller step size. Defaults to 0.8.
         nnc_compile: (Experimental) If True, NNC compiler will be used to accelerate the
             inference (defaults to False).
+        full_mass_matrix (bool): Whether to adapt a dense mass matrix that captures
+            the correlation between random variables instead of a diagonal one.
+            Defaults to False.
+        mass_matrix_blocks (list, Optional): Optional list of groups of random
+            variables. If provided, the dense mass matrix only captures the correlation
+            within each group. Only used when full_mass_matrix is True.
     """
 
+    _supports_vectorized_chains = True
+
     def __init__(
         self,
         trajectory_length: float,
@@ -38,6 +46,8 @@ class GlobalHamiltonianMonteCarlo(BaseInference):
         adapt_mass_matrix: bool = True,
         target_accept_prob: float = 0.8,
         nnc_compile: bool = False,
+        full_mass_matrix: bool = False,
+        mass_matrix_blocks: Optional[List[Collection[RVIdentifier]]] = None,
     ):
         self.trajectory_length = trajectory_length
         self.initial_step_size = initial_step_size
@@ -45,6 +55,8 @@ class GlobalHamiltonianMonteCarlo(BaseInference):
         self.adapt_mass_matrix = adapt_mass_matrix
         self.target_accept_prob = target_accept_prob
         self.nnc_compile = nnc_compile
+        self.full_mass_matrix = full_mass_matrix
+        self.mass_matrix_blocks = mass_matrix_blocks
         self._proposer = None
 
     def _get_default_num_adaptive_samples(self, num_samples: int) -> int:
@@ -67,6 +79,9 @@ class GlobalHamiltonianMonteCarlo(BaseInference):
                 self.adapt_mass_matrix,
                 self.target_accept_prob,
                 self.nnc_compile,
+                self._batch_shape,
+                self.full_mass_matrix,
+                self.mass_matrix_blocks,
             )
         return [self._proposer]
 
@@ -86,6 +101,9 @@ class SingleSiteHamiltonianMonteCarlo(BaseInference):
         adapt_mass_matrix (bool): Whether to adapt the mass matrix. Defaults to True,
         target_accept_prob (float): Target accept prob. Increasing this value would lead
             to smaller step size. Defaults to 0.8.
+        full_mass_matrix (bool): Whether to adapt a dense mass matrix that captures
+            the correlation between random variables instead of a diagonal one.
+            Defaults to False.
     """
 
     def __init__(
@@ -96,6 +114,7 @@ class SingleSiteHamiltonianMonteCarlo(BaseInference):
         adapt_mass_matrix: bool = True,
         target_accept_prob: float = 0.8,
         nnc_compile: bool = False,
+        full_mass_matrix: bool = False,
     ):
         self.trajectory_length = trajectory_length
         self.initial_step_size = initial_step_size
@@ -103,6 +122,7 @@ class SingleSiteHamiltonianMonteCarlo(BaseInference):
         self.adapt_mass_matrix = adapt_mass_matrix
         self.target_accept_prob = target_accept_prob
         self.nnc_compile = nnc_compile
+        self.full_mass_matrix = full_mass_matrix
         self._proposers = {}
 
     def _get_default_num_adaptive_samples(self, num_samples: int) -> int:
@@ -127,6 +147,7 @@ class SingleSiteHamiltonianMonteCarlo(BaseInference):
                     self.adapt_mass_matrix,
                     self.target_accept_prob,
                     self.nnc_compile,
+                    full_mass_matrix=self.full_mass_matrix,
                 )
             proposers.append(self._proposers[node])
         return proposers
@@ -36,6 +36,8 @@ class MonteCarloSamples(Mapping[RVIdentifier, torch.Tensor]):
         observations: Optional[RVDict] = None,
         stack_not_cat: bool = True,
         default_namespace: str = "posterior",
+        online_summaries: Optional[Dict[str, RVDict]] = None,
+        logll_include_adaptive_samples: bool = True,
     ):
         self.namespaces = {}
         self.default_namespace = default_namespace
@@ -61,15 +63,23 @@ class MonteCarloSamples(Mapping[RVIdentifier, torch.Tensor]):
             else:
                 logll = logll_results
             self.log_likelihoods = {}
-            self.adaptive_log_likelihoods = {}
+            # the log likelihoods might only be recorded for the non-adaptive samples
+            self.adaptive_log_likelihoods = (
+                {} if logll_include_adaptive_samples else None
+            )
             for rv, val in logll.items():
-                self.adaptive_log_likelihoods[rv] = val[:, :num_adaptive_samples]
-                self.log_likelihoods[rv] = val[:, num_adaptive_samples:]
+                if logll_include_adaptive_samples:
+                    self.adaptive_log_likelihoods[rv] = val[:, :num_adaptive_samples]
+                    val = val[:, num_adaptive_samples:]
+                self.log_likelihoods[rv] = val
         else:
             self.log_likelihoods = None
             self.adaptive_log_likelihoods = None
 
         self.observations = observations
+        # summary statistics that were computed during inference, keyed by the names
+        # of the reducers, with a leading chain dimension
+        self.online_summaries = online_summaries if online_summaries else {}
 
         # single_chain_view is only set when self.get_chain is called
         self.single_chain_view = False
@@ -115,20 +125,28 @@ class MonteCarloSamples(Mapping[RVIdentifier, torch.Tensor]):
 
         samples = {rv: self.get_variable(rv, True)[[chain]] for rv in self}
 
+        include_adapt_steps = self.adaptive_log_likelihoods is not None
         if self.log_likelihoods is None:
             logll = None
         else:
             logll = {
-                rv: self.get_log_likelihoods(rv, True)[[chain]]
+                rv: self.get_log_likelihoods(rv, include_adapt_steps)[[chain]]
                 for rv in self.log_likelihoods
             }
 
+        online_summaries = {
+            name: {rv: val[[chain]] for rv, val in summaries.items()}
+            for name, summaries in self.online_summaries.items()
+        }
+
         new_mcs = MonteCarloSamples(
             chain_results=samples,
             num_adaptive_samples=self.num_adaptive_samples,
             logll_results=logll,
             observations=self.observations,
             default_namespace=self.default_namespace,
+            online_summaries=online_summaries,
+            logll_include_adaptive_samples=include_adapt_steps,
         )
         new_mcs.single_chain_view = True
 
@@ -200,12 +218,31 @@ class MonteCarloSamples(Mapping[RVIdentifier, torch.Tensor]):
         logll = self.log_likelihoods[rv]
 
         if include_adapt_steps:
+            if self.adaptive_log_likelihoods is None:
+                raise ValueError(
+                    "The log likelihoods of the adaptive samples were not recorded."
+                )
             logll = torch.cat([self.adaptive_log_likelihoods[rv], logll], dim=1)
 
         if self.single_chain_view:
             logll = logll.squeeze(0)
         return logll
 
+    def get_online_summary(self, name: str, rv: RVIdentifier) -> torch.Tensor:
+        """
+        :param name: name of the reducer that was passed to infer
+        :param rv: random variable to see the summary of
+        :returns: the summary statistic of the variable, which has a leading chain
+            dimension unless the view is restricted to a single chain
+        """
+        if name not in self.online_summaries:
+            raise KeyError(f"No online summary named {name} was computed.")
+
+        summary = self.online_summaries[name][rv]
+        if self.single_chain_view:
+            summary = summary.squeeze(0)
+        return summary
+
     def get(
         self,
         rv: RVIdentifier,
@@ -3,7 +3,7 @@
 # This source code is licensed under the MIT license found in the
 # LICENSE file in the root directory of this source tree.
 
-from typing import List, Set
+from typing import Collection, List, Optional, Set
 
 from beanmachine.ppl.inference.base_inference import BaseInference
 from beanmachine.ppl.inference.proposer.base_proposer import BaseProposer
@@ -36,8 +36,16 @@ class GlobalNoUTurnSampler(BaseInference):
             lead to smaller step size. Defaults to 0.8.
         nnc_compile: (Experimental) If True, NNC compiler will be used to accelerate the
             inference (defaults to False).
+        full_mass_matrix (bool): Whether to adapt a dense mass matrix that captures
+            the correlation between random variables instead of a diagonal one.
+            Defaults to False.
+        mass_matrix_blocks (list, Optional): Optional list of groups of random
+            variables. If provided, the dense mass matrix only captures the correlation
+            within each group. Only used when full_mass_matrix is True.
     """
 
+    _supports_vectorized_chains = True
+
     def __init__(
         self,
         max_tree_depth: int = 10,
@@ -48,6 +56,8 @@ class GlobalNoUTurnSampler(BaseInference):
         multinomial_sampling: bool = True,
         target_accept_prob: float = 0.8,
         nnc_compile: bool = False,
+        full_mass_matrix: bool = False,
+        mass_matrix_blocks: Optional[List[Collection[RVIdentifier]]] = None,
     ):
         self.max_tree_depth = max_tree_depth
         self.max_delta_energy = max_delta_energy
@@ -57,6 +67,8 @@ class GlobalNoUTurnSampler(BaseInference):
         self.multinomial_sampling = multinomial_sampling
         self.target_accept_prob = target_accept_prob
         self.nnc_compile = nnc_compile
+        self.full_mass_matrix = full_mass_matrix
+        self.mass_matrix_blocks = mass_matrix_blocks
         self._proposer = None
 
     def _get_default_num_adaptive_samples(self, num_samples: int) -> int:
@@ -81,6 +93,9 @@ class GlobalNoUTurnSampler(BaseInference):
                 self.multinomial_sampling,
                 self.target_accept_prob,
                 self.nnc_compile,
+                self._batch_shape,
+                self.full_mass_matrix,
+                self.mass_matrix_blocks,
             )
         return [self._proposer]
 
@@ -109,6 +124,9 @@ class SingleSiteNoUTurnSampler(BaseInference):
             lead to smaller step size. Defaults to 0.8.
         nnc_compile: (Experimental) If True, NNC compiler will be used to accelerate the
             inference (defaults to False).
+        full_mass_matrix (bool): Whether to adapt a dense mass matrix that captures
+            the correlation between random variables instead of a diagonal one.
+            Defaults to False.
     """
 
     def __init__(
@@ -121,6 +139,7 @@ class SingleSiteNoUTurnSampler(BaseInference):
         multinomial_sampling: bool = True,
         target_accept_prob: float = 0.8,
         nnc_compile: bool = False,
+        full_mass_matrix: bool = False,
     ):
         self.max_tree_depth = max_tree_depth
         self.max_delta_energy = max_delta_energy
@@ -130,6 +149,7 @@ class SingleSiteNoUTurnSampler(BaseInference):
         self.multinomial_sampling = multinomial_sampling
         self.target_accept_prob = target_accept_prob
         self.nnc_compile = nnc_compile
+        self.full_mass_matrix = full_mass_matrix
         self._proposers = {}
 
     def _get_default_num_adaptive_samples(self, num_samples: int) -> int:
@@ -156,6 +176,7 @@ class SingleSiteNoUTurnSampler(BaseInference):
                     self.multinomial_sampling,
                     self.target_accept_prob,
                     self.nnc_compile,
+                    full_mass_matrix=self.full_mass_matrix,
                 )
             proposers.append(self._proposers[node])
         return proposers
@@ -0,0 +1,437 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+#
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+
+from __future__ import annotations
+
+import copy
+from typing import List, Optional, Sequence, Set, Tuple
+
+import torch
+from beanmachine.ppl.inference.base_inference import BaseInference
+from beanmachine.ppl.inference.proposer.base_proposer import BaseProposer
+from beanmachine.ppl.inference.sampler import Sampler
+from beanmachine.ppl.inference.utils import (
+    _execute_in_new_thread,
+    _verify_queries_and_observations,
+    seed as set_seed,
+)
+from beanmachine.ppl.model.rv_identifier import RVIdentifier
+from beanmachine.ppl.world import init_to_uniform, InitializeFn, RVDict, World
+from torch import multiprocessing as mp
+from typing_extensions import Literal
+
+
+def _log_likelihood(world: World, inverse_temperature: float) -> torch.Tensor:
+    """Return the (untempered) log likelihood of the observations in a world whose
+    likelihood is tempered by inverse_temperature."""
+    return world.log_prob(world.observations.keys()) / inverse_temperature
+
+
+def _replica_state(
+    world: World, latent_nodes: List[RVIdentifier], inverse_temperature: float
+) -> Tuple[List[torch.Tensor], torch.Tensor]:
+    """Return what is exchanged between replicas: the values of the latent variables,
+    in the order of latent_nodes, and the log likelihood. The nodes themselves are
+    not exchanged, since unpickling them in another process creates new instances of
+    the model, and so new RVIdentifiers."""
+    latent_values = [world[node] for node in latent_nodes]
+    return latent_values, _log_likelihood(world, inverse_temperature)
+
+
+def _replace_latents(
+    world: World, latent_nodes: List[RVIdentifier], values: List[torch.Tensor]
+) -> World:
+    if world.latent_nodes != set(latent_nodes):
+        raise ValueError(
+            "Replicas can only be run in parallel for models with a static structure."
+        )
+    return world.replace(dict(zip(latent_nodes, values)))
+
+
+def _run_replica(
+    connection,
+    kernel: BaseInference,
+    inverse_temperature: float,
+    queries: List[RVIdentifier],
+    observations: RVDict,
+    latent_nodes: List[RVIdentifier],
+    num_samples: Optional[int],
+    num_adaptive_samples: int,
+    initialize_fn: InitializeFn,
+    max_init_retries: int,
+    seed: int,
+) -> None:
+    """
+    Host a tempered replica in a subprocess. Every time that a number of iterations
+    and the latent values to restart from (or None) are received, the replica is
+    advanced by that many iterations and its state is sent back. Stops once None is
+    received. The latent values are ordered as latent_nodes, which are unpickled
+    together with the queries and the observations so that they are the same
+    RVIdentifiers as in the World of the replica.
+    """
+    set_seed(seed)
+    try:
+        world = World.initialize_world(
+            queries, observations, initialize_fn, max_init_retries
+        ).temper(inverse_temperature)
+        sampler = Sampler(kernel, world, num_samples, num_adaptive_samples)
+        while True:
+            message = connection.recv()
+            if message is None:
+                break
+            num_steps, values = message
+            if values is not None:
+                sampler.world = _replace_latents(sampler.world, latent_nodes, values)
+            for _ in range(num_steps):
+                next(sampler)
+            connection.send(
+                _replica_state(sampler.world, latent_nodes, inverse_temperature)
+            )
+    except (BrokenPipeError, EOFError):
+        # the main process has stopped listening
+        pass
+    except Exception as e:
+        # re-raised by the main process
+        connection.send(e)
+    finally:
+        connection.close()
+
+
+class ReplicaExchangeSampler(Sampler):
+    """
+    Sampler of the cold chain of ``ParallelTempering``. At each iteration, the cold
+    chain and each of the tempered replicas is advanced with its own copy of the
+    proposers. Every ``swap_interval`` iterations, the states of adjacent replicas
+    are swapped with the replica exchange acceptance probability, alternating between
+    the even and the odd pairs of replicas. Only the worlds of the cold chain are
+    generated.
+
+    Args:
+        kernel (ParallelTempering): Inference to get the temperatures and the
+            proposers from.
+        initial_world (World): Initial world of the cold chain.
+        queries (list): The queries, used to initialize the tempered replicas.
+        observations (dict): The observations, used to initialize the tempered
+            replicas.
+        num_samples (int, Optional): Number of samples. If none is specified,
+            num_samples = inf.
+        num_adaptive_samples (int, Optional): Number of adaptive samples, defaults
+            to 0.
+        initialize_fn (callable): Function to initialize the tempered replicas with.
+        max_init_retries (int): The number of attempts to make to initialize each
+            tempered replica.
+    """
+
+    def __init__(
+        self,
+        kernel: ParallelTempering,
+        initial_world: World,
+        queries: List[RVIdentifier],
+        observations: RVDict,
+        num_samples: Optional[int] = None,
+        num_adaptive_samples: int = 0,
+        initialize_fn: InitializeFn = init_to_uniform,
+        max_init_retries: int = 100,
+    ):
+        super().__init__(kernel, initial_world, num_samples, num_adaptive_samples)
+        self._inverse_temperatures = kernel.inverse_temperatures
+        self._swap_interval = kernel.swap_interval
+        self._iteration = 0
+        self._replicas: List[Sampler] = []
+        self._connections = []
+        self._processes = []
+        # the order in which the latent values are exchanged with the subprocesses
+        self._latent_nodes = list(initial_world.latent_nodes)
+        # latent values to restart each subprocess replica from after a swap
+        self._pending_values: List[Optional[List[torch.Tensor]]] = []
+        for inverse_temperature in self._inverse_temperatures[1:]:
+            # each replica starts with a pristine copy of the inference (i.e. its own
+            # adaptation state) and its own initialization
+            replica_kernel = copy.deepcopy(kernel.inference)
+            if not kernel.run_replicas_in_parallel:
+                world = World.initialize_world(
+                    queries, observations, initialize_fn, max_init_retries
+                ).temper(inverse_temperature)
+                self._replicas.append(
+                    Sampler(replica_kernel, world, num_samples, num_adaptive_samples)
+                )
+                continue
+            ctx = mp.get_context(kernel.mp_context)
+            connection, child_connection = ctx.Pipe()
+            seed = torch.randint(BaseInference._MAX_SEED_VAL, ()).item()
+            process = ctx.Process(
+                target=_execute_in_new_thread,
+                args=(
+                    _run_replica,
+                    child_connection,
+                    replica_kernel,
+                    inverse_temperature,
+                    queries,
+                    observations,
+                    self._latent_nodes,
+                    num_samples,
+                    num_adaptive_samples,
+                    initialize_fn,
+                    max_init_retries,
+                    seed,
+                ),
+                daemon=True,
+            )
+            process.start()
+            child_connection.close()
+            self._connections.append(connection)
+            self._processes.append(process)
+            self._pending_values.append(None)
+
+    def send(self, world: Optional[World] = None) -> World:
+        """
+        Advance the cold chain and the tempered replicas by one iteration, then
+        propose to swap the states of adjacent replicas if it is time to.
+
+        Args:
+            world: Optional World of the cold chain to use to propose. If none is
+                provided, `self.world` is used.
+        """
+        if (
+            self._connections
+            and self._iteration % self._swap_interval == 0
+            and self._num_samples_remaining > 0
+        ):
+            # the subprocess replicas run until the next swap while the cold chain
+            # is advanced in the current process
+            num_steps = int(min(self._swap_interval, self._num_samples_remaining))
+            for idx, connection in enumerate(self._connections):
+                connection.send((num_steps, self._pending_values[idx]))
+                self._pending_values[idx] = None
+        super().send(world)
+        for replica in self._replicas:
+            next(replica)
+        self._iteration += 1
+        if (
+            self._iteration % self._swap_interval == 0
+            or self._num_samples_remaining <= 0
+        ):
+            self._swap()
+        if self._num_samples_remaining <= 0:
+            self._shutdown()
+        return self.world
+
+    def _receive(self, connection) -> Tuple[List[torch.Tensor], torch.Tensor]:
+        state = connection.recv()
+        if isinstance(state, Exception):
+            self._shutdown()
+            raise state
+        return state
+
+    def _swap(self) -> None:
+        if self._connections:
+            states = [_replica_state(self.world, self._latent_nodes, 1.0)]
+            states += [self._receive(connection) for connection in self._connections]
+            log_likelihoods = [log_likelihood for _, log_likelihood in states]
+        else:
+            worlds = [self.world] + [replica.world for replica in self._replicas]
+            log_likelihoods = [
+                _log_likelihood(world, inverse_temperature)
+                for world, inverse_temperature in zip(
+                    worlds, self._inverse_temperatures
+                )
+            ]
+
+        # order[k] is the index of the replica whose state moves to the k-th
+        # temperature
+        order = list(range(len(self._inverse_temperatures)))
+        num_swaps = self._iteration // self._swap_interval
+        for k in range(num_swaps % 2, len(order) - 1, 2):
+            accept_log_prob = (
+                self._inverse_temperatures[k] - self._inverse_temperatures[k + 1]
+            ) * (log_likelihoods[k + 1] - log_likelihoods[k])
+            if torch.rand(()).log() < accept_log_prob:
+                order[k], order[k + 1] = order[k + 1], order[k]
+                log_likelihoods[k], log_likelihoods[k + 1] = (
+                    log_likelihoods[k + 1],
+                    log_likelihoods[k],
+                )
+
+        for k, idx in enumerate(order):
+            if idx == k:
+                continue
+            if self._connections:
+                values = states[idx][0]
+                if k == 0:
+                    self.world = _replace_latents(
+                        self.world, self._latent_nodes, values
+                    )
+                else:
+                    self._pending_values[k - 1] = values
+                continue
+            world = worlds[idx].temper(self._inverse_temperatures[k])
+            if k == 0:
+                self.world = world
+            else:
+                self._replicas[k - 1].world = world
+
+    def _shutdown(self) -> None:
+        # __init__ might have failed before the subprocesses were started
+        for connection in getattr(self, "_connections", []):
+            try:
+                connection.send(None)
+            except OSError:
+                pass
+            connection.close()
+        for process in getattr(self, "_processes", []):
+            process.join(timeout=1.0)
+            if process.is_alive():
+                process.terminate()
+        self._connections = []
+        self._processes = []
+
+    def close(self) -> None:
+        self._shutdown()
+        super().close()
+
+    def __del__(self) -> None:
+        self._shutdown()
+
+
+class ParallelTempering(BaseInference):
+    """
+    Parallel tempering (a.k.a. replica exchange) [1]. In addition to the chain that
+    targets the posterior, a number of replicas target tempered posteriors whose
+    likelihood is raised to the power of an inverse temperature between 0 and 1.
+    The flatter tempered posteriors are easier to explore, and the states of
+    replicas with adjacent temperatures are periodically swapped so that the modes
+    found at high temperatures reach the cold chain. This makes it possible to mix
+    between the modes of multimodal posteriors. Every replica is updated with its
+    own copy of the proposers of the given inference, and only the samples of the
+    cold chain are returned.
+
+    The replicas are run in the current process by default. With
+    ``run_replicas_in_parallel``, each tempered replica is run in its own subprocess
+    instead, and only the values of the latent variables and the log likelihoods
+    are exchanged between processes, which requires the model to have a static
+    structure.
+
+    Example::
+
+        ParallelTempering(
+            bm.GlobalNoUTurnSampler(), inverse_temperatures=[1.0, 0.3, 0.1, 0.03]
+        ).infer(queries, observations, num_samples=1000)
+
+    [1] Earl and Deem. `Parallel Tempering: Theory, Applications, and New
+    Perspectives`.
+
+    Args:
+        inference (BaseInference): The inference used to update every replica.
+        inverse_temperatures (list, Optional): The decreasing inverse temperatures
+            of the replicas, starting from 1.0 for the cold chain. Defaults to a
+            geometric ladder ``[1.0, 0.5, 0.25, ...]`` of ``num_replicas``
+            temperatures.
+        num_replicas (int): The number of replicas, including the cold chain, when
+            ``inverse_temperatures`` is not provided. Defaults to 4.
+        swap_interval (int): The number of iterations between swaps. Defaults to 1.
+        run_replicas_in_parallel (bool): Whether to run each tempered replica in a
+            subprocess. Defaults to False.
+        mp_context: The multiprocessing context used to start the subprocesses.
+    """
+
+    def __init__(
+        self,
+        inference: BaseInference,
+        inverse_temperatures: Optional[Sequence[float]] = None,
+        num_replicas: int = 4,
+        swap_interval: int = 1,
+        run_replicas_in_parallel: bool = False,
+        mp_context: Optional[Literal["fork", "spawn", "forkserver"]] = None,
+    ):
+        if inverse_temperatures is None:
+            inverse_temperatures = [0.5**k for k in range(num_replicas)]
+        inverse_temperatures = [float(beta) for beta in inverse_temperatures]
+        if (
+            len(inverse_temperatures) < 2
+            or inverse_temperatures[0] != 1.0
+            or inverse_temperatures[-1] <= 0.0
+            or any(
+                prev <= beta
+                for prev, beta in zip(inverse_temperatures, inverse_temperatures[1:])
+            )
+        ):
+            raise ValueError(
+                "The inverse temperatures should be decreasing from 1.0 and positive, "
+                "with at least two replicas."
+            )
+        if swap_interval < 1:
+            raise ValueError("swap_interval should be a positive integer")
+        self.inference = inference
+        self.inverse_temperatures = inverse_temperatures
+        self.swap_interval = swap_interval
+        self.run_replicas_in_parallel = run_replicas_in_parallel
+        self.mp_context = mp_context
+
+    def get_proposers(
+        self,
+        world: World,
+        target_rvs: Set[RVIdentifier],
+        num_adaptive_sample: int,
+    ) -> List[BaseProposer]:
+        return self.inference.get_proposers(world, target_rvs, num_adaptive_sample)
+
+    def _get_default_num_adaptive_samples(self, num_samples: int) -> int:
+        return self.inference._get_default_num_adaptive_samples(num_samples)
+
+    def sampler(
+        self,
+        queries: List[RVIdentifier],
+        observations: RVDict,
+        num_samples: Optional[int] = None,
+        num_adaptive_samples: Optional[int] = None,
+        initialize_fn: InitializeFn = init_to_uniform,
+        max_init_retries: int = 100,
+    ) -> ReplicaExchangeSampler:
+        """
+        Returns a generator that returns a new world of the cold chain each time it
+        is iterated. If num_samples is not provided, this method will return an
+        infinite generator.
+
+        Args:
+            queries: List of queries
+            observations: Observations as an RVDict keyed by RVIdentifier
+            num_samples: Number of samples, defaults to None for an infinite sampler.
+            num_adaptive_samples:  Number of adaptive samples. If not provided, BM will
+                fall back to algorithm-specific default value based on num_samples. If
+                num_samples is not provided either, then defaults to 0.
+            initialize_fn: A callable that takes in a distribution and returns a Tensor.
+                The default behavior is to sample from Uniform(-2, 2) then biject to
+                the support of the distribution.
+            max_init_retries: The number of attempts to make to initialize values for an
+                inference before throwing an error (default to 100).
+        """
+        _verify_queries_and_observations(
+            queries, observations, observations_must_be_rv=True
+        )
+        if num_adaptive_samples is None:
+            if num_samples is None:
+                num_adaptive_samples = 0
+            else:
+                num_adaptive_samples = self._get_default_num_adaptive_samples(
+                    num_samples
+                )
+
+        world = World.initialize_world(
+            queries,
+            observations,
+            initialize_fn,
+            max_init_retries,
+        )
+        kernel = copy.deepcopy(self)
+        return ReplicaExchangeSampler(
+            kernel,
+            world,
+            queries,
+            observations,
+            num_samples,
+            num_adaptive_samples,
+            initialize_fn,
+            max_init_retries,
+        )
@@ -3,10 +3,11 @@
 # This source code is licensed under the MIT license found in the
 # LICENSE file in the root directory of this source tree.
 
-from typing import Dict, List, Optional, Union
+from typing import Dict, List, Optional, Set, Union
 
 import torch
 from beanmachine.ppl.inference.monte_carlo_samples import MonteCarloSamples
+from beanmachine.ppl.inference.sample_sink import InMemorySampleSink, SampleSink
 from beanmachine.ppl.inference.single_site_ancestral_mh import (
     SingleSiteAncestralMetropolisHastings,
 )
@@ -14,18 +15,124 @@ from beanmachine.ppl.model.rv_identifier import RVIdentifier
 from beanmachine.ppl.world import init_from_prior, RVDict, World
 from torch import Tensor
 from torch.distributions import Categorical
-from tqdm.auto import trange
+from tqdm.auto import tqdm, trange
 
 
-def _concat_rv_dicts(rvdict: List) -> Dict:
-    out_dict = {}
-    keys = list(rvdict[0].keys())
-    for k in keys:
-        t = []
-        for x in rvdict:
-            t.append(x[k])
-        out_dict[k] = torch.cat(t, -1).squeeze(0)
-    return out_dict
+def _concat_draws(values: Tensor) -> Tensor:
+    """
+    Lay out the predictives of shape (num_chains, num_draws, *value_shape) the way
+    that the draws have always been returned by the sequential simulation, i.e.
+    concatenated along the last dimension of the value.
+    """
+    if values.dim() <= 2:
+        return values
+    num_chains, num_draws = values.shape[:2]
+    value_shape = values.shape[2:]
+    return values.movedim(1, -2).reshape(
+        (num_chains,) + value_shape[:-1] + (num_draws * value_shape[-1],)
+    )
+
+
+def _descendants(world: World, nodes: Set[RVIdentifier]) -> Set[RVIdentifier]:
+    descendants = set()
+    stack = list(nodes)
+    while stack:
+        node = stack.pop()
+        if node in descendants or node not in world:
+            continue
+        descendants.add(node)
+        stack.extend(world.get_variable(node).children)
+    return descendants
+
+
+def _ancestors(world: World, nodes: Set[RVIdentifier]) -> Set[RVIdentifier]:
+    ancestors = set()
+    stack = list(nodes)
+    while stack:
+        node = stack.pop()
+        if node in ancestors or node not in world:
+            continue
+        ancestors.add(node)
+        stack.extend(world.get_variable(node).parents)
+    return ancestors
+
+
+def _simulate_batch(
+    queries: List[RVIdentifier], draws: RVDict, batch_size: int
+) -> List[Tensor]:
+    """
+    Simulate the queries for a batch of posterior draws, given with a leading batch
+    dimension of size ``batch_size``, and return one value of shape
+    (batch_size, *value_shape) per query.
+
+    The draws are fed into the model all at once, so the model is only executed once
+    per batch. The first draw is also simulated on its own, and every node whose
+    batched value does not have the shape of its value for a single draw, e.g.
+    because its model function does not broadcast over the batch dimension, is
+    treated as having failed. The queries that fail or depend on a node that failed
+    are then simulated one draw at a time, conditioned on the values of the nodes
+    that were simulated successfully.
+
+    Since the batch dimension is only recognized by its size, a batch whose size is
+    the size of a dimension of the values of a single draw is ambiguous (e.g. the
+    model could index into the batch dimension instead of the value), so it is split
+    into smaller batches.
+    """
+    reference = World({rv: val[0] for rv, val in draws.items()}, init_from_prior)
+    reference_values = [reference.call(query) for query in queries]
+    if not all(isinstance(value, Tensor) for value in reference_values):
+        raise TypeError("The value returned by a queried function must be a tensor.")
+    value_sizes = {size for node in reference.keys() for size in reference[node].shape}
+    value_sizes.update(size for value in reference_values for size in value.shape)
+    if batch_size > 1 and batch_size in value_sizes:
+        # a single draw can not be mixed up with other draws
+        head = _simulate_batch(
+            queries, {rv: val[:-1] for rv, val in draws.items()}, batch_size - 1
+        )
+        tail = _simulate_batch(queries, {rv: val[-1:] for rv, val in draws.items()}, 1)
+        return [torch.cat([h, t]) for h, t in zip(head, tail)]
+    world = World(draws, init_from_prior)
+    values = []
+    for query in queries:
+        try:
+            values.append(world.call(query))
+        except (IndexError, RuntimeError, TypeError, ValueError):
+            values.append(None)
+    failed_nodes = set()
+    for node in world.latent_nodes:
+        if (
+            node not in reference
+            or world[node].shape != (batch_size,) + reference[node].shape
+        ):
+            failed_nodes.add(node)
+    failed_nodes = _descendants(world, failed_nodes)
+
+    failed_queries = [
+        idx
+        for idx, (query, value) in enumerate(zip(queries, values))
+        if not isinstance(value, Tensor)
+        or value.shape != (batch_size,) + reference_values[idx].shape
+        or query in failed_nodes
+    ]
+    if not failed_queries:
+        return values
+
+    # condition on the ancestors of the failed queries that were simulated correctly
+    fallback_queries = [queries[idx] for idx in failed_queries]
+    successful_nodes = (
+        _ancestors(reference, set(fallback_queries)) & world.latent_nodes
+    ) - failed_nodes
+    fallback_values = [[] for _ in failed_queries]
+    for i in range(batch_size):
+        observations = {rv: val[i] for rv, val in draws.items()}
+        observations.update({node: world[node][i] for node in successful_nodes})
+        draw_world = World(observations, init_from_prior)
+        for query, query_values in zip(fallback_queries, fallback_values):
+            query_values.append(draw_world.call(query))
+    values = list(values)
+    for idx, query_values in zip(failed_queries, fallback_values):
+        values[idx] = torch.stack(query_values)
+    return values
 
 
 class Predictive(object):
@@ -56,6 +163,8 @@ class Predictive(object):
         num_samples: Optional[int] = None,
         vectorized: Optional[bool] = False,
         progress_bar: Optional[bool] = True,
+        batch_size: int = 1000,
+        sample_sink: Optional[SampleSink] = None,
     ) -> MonteCarloSamples:
         """
         Generates predictives from a generative model.
@@ -73,10 +182,18 @@ class Predictive(object):
            # Monte carlo samples of shape (num_samples, sample_shape)
            predictives = simulate(queries, num_samples=1000)
 
+        Unless `vectorized` is set, the posterior draws of each chain are simulated in
+        batches of `batch_size` draws, which are fed into the model at once along a
+        leading batch dimension. The queries that do not broadcast over the batch
+        dimension are simulated one draw at a time instead.
+
         :param query: list of `random_variable`'s corresponding to the observations.
         :param posterior: Optional `MonteCarloSamples` or `RVDict` of the latent variables.
         :param num_samples: Number of prior predictive samples, defaults to 1. Should
             not be specified if `posterior` is specified.
+        :param batch_size: Number of posterior draws to simulate at once.
+        :param sample_sink: Where to write the posterior predictives to as they are
+            simulated. Defaults to keeping them in memory.
         :returns: `MonteCarloSamples` of the generated predictives.
         """
         assert (
@@ -106,28 +223,30 @@ class Predictive(object):
                 post_pred.add_groups(posterior)
                 return post_pred
             else:
-                # predictives are sequentially sampled
-                preds = []
-
-                for c in range(posterior.num_chains):
-                    rv_dicts = []
-                    for i in trange(
-                        posterior.get_num_samples(),
-                        desc="Samples collected",
-                        disable=not progress_bar,
-                    ):
-                        obs = {rv: posterior.get_chain(c)[rv][i] for rv in posterior}
-                        sampler = inference.sampler(
-                            queries, obs, num_samples, initialize_fn=init_from_prior
-                        )
-                        rv_dicts.append(
-                            Predictive._extract_values_from_world(
-                                next(sampler), queries
-                            )
-                        )
-                    preds.append(_concat_rv_dicts(rv_dicts))
+                if sample_sink is None:
+                    sample_sink = InMemorySampleSink()
+                num_draws = posterior.get_num_samples()
+                chain_sinks = []
+                with tqdm(
+                    total=posterior.num_chains * num_draws,
+                    desc="Samples collected",
+                    disable=not progress_bar,
+                ) as pbar:
+                    for c in range(posterior.num_chains):
+                        chain = posterior.get_chain(c)
+                        chain_sink = sample_sink.for_chain(c, num_draws)
+                        for start in range(0, num_draws, batch_size):
+                            stop = min(start + batch_size, num_draws)
+                            draws = {rv: chain[rv][start:stop] for rv in posterior}
+                            values = _simulate_batch(queries, draws, stop - start)
+                            for i in range(stop - start):
+                                chain_sink.append([val[i] for val in values])
+                            pbar.update(stop - start)
+                        chain_sink.close()
+                        chain_sinks.append(chain_sink)
+                preds = sample_sink.merge(chain_sinks)
                 post_pred = MonteCarloSamples(
-                    preds,
+                    {query: _concat_draws(val) for query, val in zip(queries, preds)},
                     default_namespace="posterior_predictive",
                 )
                 post_pred.add_groups(posterior)
@@ -5,6 +5,7 @@
 
 import math
 from abc import abstractmethod
+from typing import Set
 
 import torch
 import torch.distributions as dist
@@ -29,16 +30,28 @@ class BaseSingleSiteMHProposer(BaseProposer):
             world: World to calculate proposal for.
         """
         proposal_dist = forward_dist = self.get_proposal_distribution(world)
-        old_value = world[self.node]
         proposed_value = proposal_dist.sample()
         new_world = world.replace({self.node: proposed_value})
+        return new_world, self._accept_log_prob(world, new_world, forward_dist)
+
+    def _accept_log_prob(
+        self, world: World, new_world: World, forward_dist: dist.Distribution
+    ) -> torch.Tensor:
+        """Return the log of the MH acceptance probability of moving from world to
+        new_world, where the new value of self.node was sampled from forward_dist."""
+        old_value = world[self.node]
+        proposed_value = new_world[self.node]
         backward_dist = self.get_proposal_distribution(new_world)
 
         # calculate MH acceptance probability
+        # only the proposed node, its children (before and after the update) and
+        # the nodes newly created by the update can have a different log prob in
+        # the two worlds, so the rest of the joint cancels out in the MH ratio
+        markov_blanket = self._markov_blanket(world, new_world)
         # log P(x, y)
-        old_log_prob = world.log_prob()
+        old_log_prob = world.log_prob(markov_blanket & world.keys())
         # log P(x', y)
-        new_log_prob = new_world.log_prob()
+        new_log_prob = new_world.log_prob(markov_blanket)
         # log g(x'|x)
         forward_log_prob = forward_dist.log_prob(proposed_value).sum()
         # log g(x|x')
@@ -61,7 +74,18 @@ class BaseSingleSiteMHProposer(BaseProposer):
                 dtype=accept_log_prob.dtype,
             )
 
-        return new_world, accept_log_prob
+        return accept_log_prob
+
+    def _markov_blanket(self, world: World, new_world: World) -> Set[RVIdentifier]:
+        """Return the set of nodes whose log prob may differ between the current
+        world and the world where self.node has been replaced."""
+        new_nodes = new_world.keys() - world.keys()
+        return (
+            {self.node}
+            | world.get_variable(self.node).children
+            | new_world.get_variable(self.node).children
+            | new_nodes
+        )
 
     @abstractmethod
     def get_proposal_distribution(self, world: World) -> dist.Distribution:
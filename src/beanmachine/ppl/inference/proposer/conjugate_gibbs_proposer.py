@@ -0,0 +1,168 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+#
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+
+from typing import Callable, Dict, List, Optional, Tuple, Type
+
+import torch
+import torch.distributions as dist
+import torch.nn.functional as F
+from beanmachine.ppl.inference.proposer.base_single_site_mh_proposer import (
+    BaseSingleSiteMHProposer,
+)
+from beanmachine.ppl.model.rv_identifier import RVIdentifier
+from beanmachine.ppl.world import World
+from beanmachine.ppl.world.variable import TemperedVariable
+
+
+# For each supported prior, the likelihoods it is conjugate to, mapped to the name
+# of the likelihood parameter that must be the value of the prior node and the
+# names of the other parameters, which must not depend on it.
+_conjugate_likelihoods: Dict[Type, Dict[Type, Tuple[str, Tuple[str, ...]]]] = {
+    dist.Beta: {
+        dist.Bernoulli: ("probs", ()),
+        dist.Binomial: ("probs", ("total_count",)),
+    },
+    dist.Normal: {dist.Normal: ("loc", ("scale",))},
+    dist.Gamma: {dist.Poisson: ("rate", ())},
+    dist.Dirichlet: {dist.Categorical: ("probs", ())},
+}
+
+_Observations = List[Tuple[dist.Distribution, torch.Tensor]]
+
+
+def _beta_posterior(prior: dist.Beta, children: _Observations) -> dist.Distribution:
+    alpha = prior.concentration1
+    beta = prior.concentration0
+    for child_dist, value in children:
+        if isinstance(child_dist, dist.Binomial):
+            total_count = child_dist.total_count
+        else:
+            total_count = torch.ones_like(value)
+        alpha = alpha + value
+        beta = beta + total_count - value
+    return dist.Beta(alpha, beta)
+
+
+def _normal_posterior(prior: dist.Normal, children: _Observations) -> dist.Distribution:
+    precision = prior.scale.pow(-2)
+    weighted_sum = prior.loc * precision
+    for child_dist, value in children:
+        child_precision = child_dist.scale.pow(-2)
+        precision = precision + child_precision
+        weighted_sum = weighted_sum + value * child_precision
+    return dist.Normal(weighted_sum / precision, precision.rsqrt())
+
+
+def _gamma_posterior(prior: dist.Gamma, children: _Observations) -> dist.Distribution:
+    concentration = prior.concentration
+    rate = prior.rate
+    for _, value in children:
+        concentration = concentration + value
+        rate = rate + 1.0
+    return dist.Gamma(concentration, rate)
+
+
+def _dirichlet_posterior(
+    prior: dist.Dirichlet, children: _Observations
+) -> dist.Distribution:
+    concentration = prior.concentration
+    num_categories = concentration.shape[-1]
+    for _, value in children:
+        counts = F.one_hot(value.long(), num_categories)
+        concentration = concentration + counts.to(concentration.dtype)
+    return dist.Dirichlet(concentration)
+
+
+_posteriors: Dict[Type, Callable[..., dist.Distribution]] = {
+    dist.Beta: _beta_posterior,
+    dist.Normal: _normal_posterior,
+    dist.Gamma: _gamma_posterior,
+    dist.Dirichlet: _dirichlet_posterior,
+}
+
+
+def _conjugate_children(world: World, node: RVIdentifier) -> Optional[_Observations]:
+    """Return the distributions and values of the children of node if each of them
+    is a likelihood conjugate to the prior of node, parameterized directly by the
+    value of node, and None otherwise."""
+    var = world.get_variable(node)
+    likelihoods = _conjugate_likelihoods.get(type(var.distribution))
+    if likelihoods is None or len(var.children) == 0:
+        return None
+    children = []
+    for child in var.children:
+        child_var = world.get_variable(child)
+        child_dist = child_var.distribution
+        likelihood = likelihoods.get(type(child_dist))
+        if likelihood is None or (
+            isinstance(child_var, TemperedVariable)
+            and child_var.inverse_temperature != 1.0
+        ):
+            # the closed form posteriors assume that the likelihood is not tempered
+            return None
+        param = getattr(child_dist, likelihood[0])
+        # the comparison is not exact because, e.g., Categorical normalizes its probs
+        if param.shape != var.value.shape or not torch.allclose(param, var.value):
+            return None
+        children.append((child_dist, child_var.value))
+    return children
+
+
+def is_conjugate(world: World, node: RVIdentifier) -> bool:
+    """Return whether node is a Beta, Normal, Gamma or Dirichlet random variable
+    whose children in world are all Bernoulli or Binomial, Normal, Poisson or
+    Categorical random variables (respectively) parameterized by it, so that its
+    conditional distribution given the rest of world is known in closed form."""
+    return _conjugate_children(world, node) is not None
+
+
+def _other_params_unchanged(world: World, new_world: World, node: RVIdentifier) -> bool:
+    likelihoods = _conjugate_likelihoods[type(world.get_variable(node).distribution)]
+    for child in world.get_variable(node).children:
+        old_dist = world.get_variable(child).distribution
+        new_dist = new_world.get_variable(child).distribution
+        for name in likelihoods[type(old_dist)][1]:
+            if not torch.equal(getattr(old_dist, name), getattr(new_dist, name)):
+                return False
+    return True
+
+
+class ConjugateGibbsProposer(BaseSingleSiteMHProposer):
+    """
+    Single site Gibbs proposer for random variables with a conjugate prior. The new
+    value is sampled from the exact conditional distribution of the node given its
+    children, so the proposal is always accepted. If the node turns out not to be
+    conjugate (e.g. because the other parameters of its children depend on it, or
+    because the structure of the model changes with its value) the proposal falls
+    back to a regular Metropolis-Hastings step.
+    """
+
+    def get_proposal_distribution(self, world: World) -> dist.Distribution:
+        """Propose a new value for self.node from its conditional distribution,
+        or from its prior if the node is not conjugate in world."""
+        node_dist = world.get_variable(self.node).distribution
+        children = _conjugate_children(world, self.node)
+        if children is None:
+            return node_dist
+        return _posteriors[type(node_dist)](node_dist, children)
+
+    def propose(self, world: World):
+        node_dist = world.get_variable(self.node).distribution
+        children = _conjugate_children(world, self.node)
+        if children is None:
+            return super().propose(world)
+        forward_dist = _posteriors[type(node_dist)](node_dist, children)
+        new_world = world.replace({self.node: forward_dist.sample()})
+        if (
+            world.get_variable(self.node).children
+            == new_world.get_variable(self.node).children
+            and new_world.keys() == world.keys()
+            and is_conjugate(new_world, self.node)
+            and _other_params_unchanged(world, new_world, self.node)
+        ):
+            # Gibbs update: the MH acceptance probability is exactly 1
+            value = new_world[self.node]
+            return new_world, torch.zeros((), dtype=value.dtype, device=value.device)
+        return new_world, self._accept_log_prob(world, new_world, forward_dist)
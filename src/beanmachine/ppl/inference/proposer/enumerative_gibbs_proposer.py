@@ -0,0 +1,165 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+#
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+
+import math
+from typing import Iterable, List, Optional, Set, Tuple
+
+import torch
+import torch.distributions as dist
+from beanmachine.ppl.inference.proposer.base_proposer import BaseProposer
+from beanmachine.ppl.model.rv_identifier import RVIdentifier
+from beanmachine.ppl.world import World
+
+
+def is_enumerable(world: World, node: RVIdentifier) -> bool:
+    """Return whether node is a scalar random variable with a finite support that
+    can be enumerated by EnumerativeGibbsProposer."""
+    distribution = world.get_variable(node).distribution
+    return (
+        distribution.has_enumerate_support
+        and distribution.batch_shape == torch.Size()
+        and distribution.event_shape == torch.Size()
+    )
+
+
+class EnumerativeGibbsProposer(BaseProposer):
+    """
+    Gibbs proposer for scalar discrete random variables with a finite support. The
+    joint support of the target random variables is enumerated and every candidate
+    value is scored with the log prob of the Markov blanket of the targets only (the
+    rest of the World cancels out), then the new values are sampled from the exact
+    conditional distribution, so the proposal is always accepted.
+
+    When the model broadcasts over the values of the targets, all candidates are
+    scored together by evaluating the World once with the candidates stacked along a
+    new leading dimension. Otherwise (e.g. when the model converts the value to a
+    Python number) each candidate is scored in its own World.
+
+    Since the size of the joint support grows exponentially with the number of
+    targets, jointly enumerating only makes sense for small blocks of correlated
+    variables. The support of each target must not depend on the other targets.
+
+    Args:
+        target_rvs: The random variables to update jointly.
+    """
+
+    def __init__(self, target_rvs: Iterable[RVIdentifier]):
+        self._target_rvs: List[RVIdentifier] = list(target_rvs)
+
+    def _candidates(self, world: World) -> List[torch.Tensor]:
+        """Return the joint support of the targets as one tensor per target, whose
+        i-th elements are the values of the targets in the i-th candidate."""
+        supports = []
+        for node in self._target_rvs:
+            if not is_enumerable(world, node):
+                raise ValueError(
+                    f"{node} is not a scalar random variable with enumerable support."
+                )
+            supports.append(
+                world.enumerate_node(node).to(dtype=world[node].dtype).flatten()
+            )
+        if len(supports) == 1:
+            return supports
+        grid = torch.cartesian_prod(*supports)
+        return list(grid.unbind(-1))
+
+    def _markov_blanket(self, world: World) -> Set[RVIdentifier]:
+        blanket = set(self._target_rvs)
+        for node in self._target_rvs:
+            blanket |= world.get_variable(node).children
+        return blanket
+
+    def _batched_scores(
+        self, world: World, candidates: List[torch.Tensor]
+    ) -> Optional[torch.Tensor]:
+        """Score all candidates in a single evaluation of the World, or return None
+        if the model does not broadcast over the values of the targets."""
+        num_candidates = candidates[0].shape[0]
+        blanket = self._markov_blanket(world)
+        # place the candidates to the left of every batch dimension in the blanket
+        num_dims = max(world.get_variable(node).log_prob.dim() for node in blanket)
+        shape = (num_candidates,) + (1,) * num_dims
+        try:
+            batched_world = world.replace(
+                {
+                    node: values.reshape(shape)
+                    for node, values in zip(self._target_rvs, candidates)
+                }
+            )
+            if batched_world.keys() != world.keys():
+                return None
+            scores = torch.zeros(num_candidates)
+            for node in self._markov_blanket(batched_world):
+                # Every node in the blanket depends on the targets, so its log prob
+                # must keep the candidate dimension; if it does not, the model
+                # reduced over it (e.g. by summing a value that depends on the
+                # targets) and the candidates have been mixed together.
+                log_prob = batched_world.get_variable(node).log_prob
+                if (
+                    log_prob.dim() != num_dims + 1
+                    or log_prob.shape[0] != num_candidates
+                ):
+                    return None
+                scores = scores + log_prob.reshape(num_candidates, -1).sum(-1)
+        except (IndexError, RuntimeError, TypeError, ValueError):
+            return None
+        return scores
+
+    def _scores(
+        self, world: World, candidates: List[torch.Tensor]
+    ) -> Tuple[torch.Tensor, bool]:
+        """Return the log of the unnormalized conditional probability of every
+        candidate, and whether the structure of the World is the same for all of
+        them."""
+        scores = self._batched_scores(world, candidates)
+        if scores is not None:
+            return scores, True
+        is_static = True
+        scores = []
+        for values in zip(*candidates):
+            new_world = world.replace(dict(zip(self._target_rvs, values)))
+            new_nodes = new_world.keys() - world.keys()
+            is_static = is_static and len(new_nodes) == 0
+            scores.append(new_world.log_prob(self._markov_blanket(new_world)))
+        return torch.stack(scores), is_static
+
+    def propose(self, world: World) -> Tuple[World, torch.Tensor]:
+        candidates = self._candidates(world)
+        scores, is_static = self._scores(world, candidates)
+        forward_dist = dist.Categorical(logits=scores)
+        idx = forward_dist.sample()
+        new_world = world.replace(
+            {node: values[idx] for node, values in zip(self._target_rvs, candidates)}
+        )
+        if is_static:
+            # Gibbs update: the MH acceptance probability is exactly 1
+            return new_world, torch.zeros(())
+
+        # The values of the targets change which nodes are in the World, so the
+        # candidates are scored with different sets of nodes and the proposal has to
+        # be corrected with the MH acceptance probability.
+        new_candidates = self._candidates(new_world)
+        new_scores, _ = self._scores(new_world, new_candidates)
+        old_values = torch.stack([world[node] for node in self._target_rvs])
+        matches = (torch.stack(new_candidates, -1) == old_values).all(-1).nonzero()
+        if len(matches) == 0:
+            return new_world, torch.tensor(float("-inf"))
+        backward_dist = dist.Categorical(logits=new_scores)
+        markov_blanket = (
+            self._markov_blanket(world)
+            | self._markov_blanket(new_world)
+            | (new_world.keys() - world.keys())
+        )
+        accept_log_prob = (
+            new_world.log_prob(markov_blanket & new_world.keys())
+            + backward_dist.log_prob(matches[0, 0])
+            - world.log_prob(markov_blanket & world.keys())
+            - forward_dist.log_prob(idx)
+        )
+        # model size adjustment log (n/n')
+        accept_log_prob += math.log(len(world)) - math.log(len(new_world))
+        if torch.isnan(accept_log_prob):
+            accept_log_prob = torch.tensor(float("-inf"))
+        return new_world, accept_log_prob
@@ -5,19 +5,21 @@
 
 import math
 import warnings
-from typing import Callable, cast, Optional, Set, Tuple
+from typing import Callable, Collection, List, Optional, Set, Tuple
 
 import torch
 from beanmachine.ppl.experimental.nnc import nnc_jit
 from beanmachine.ppl.inference.proposer.base_proposer import BaseProposer
 from beanmachine.ppl.inference.proposer.hmc_utils import (
+    DictToVecConverter,
     DualAverageAdapter,
     MassMatrixAdapter,
     RealSpaceTransform,
     WindowScheme,
 )
+from beanmachine.ppl.inference.utils import batched_nodes, sum_to_batch_shape
 from beanmachine.ppl.model.rv_identifier import RVIdentifier
-from beanmachine.ppl.world import RVDict, World
+from beanmachine.ppl.world import World
 
 
 class HMCProposer(BaseProposer):
@@ -33,8 +35,10 @@ class HMCProposer(BaseProposer):
             Setting Path Lengths in Hamiltonian Monte Carlo" (2014).
             https://arxiv.org/abs/1111.4246
 
-    The current implementation does not use nor adapt a mass matrix -- which is
-    equivalent to setting the matrix M to I.
+    The positions, momentums and gradients of all of the target random variables are
+    packed into a single flattened Tensor (see ``DictToVecConverter``), so that the
+    leapfrog integration and the kinetic energy are computed with a few vectorized
+    operations regardless of the number of random variables.
 
     Args:
         initial_world: Initial world to propose from.
@@ -47,6 +51,18 @@ class HMCProposer(BaseProposer):
         target_accept_prob: Target accept prob, defaults to 0.8.
         nnc_compile: (Experimental) If True, NNC compiler will be used to accelerate the
             inference (defaults to False).
+        batch_shape: Shape of the leading batch dimensions of the values in
+            initial_world. When multiple chains are stacked along a leading dimension,
+            this should be ``(num_chains,)`` and every chain is accepted or rejected
+            independently, while the step size and mass matrix are shared across
+            chains. Defaults to ``()``, i.e. a single chain.
+        full_mass_matrix: Whether to adapt a dense mass matrix that captures the
+            correlation between the target random variables, defaults to False (i.e.
+            a diagonal mass matrix).
+        mass_matrix_blocks: Optional list of groups of target random variables. If
+            provided, the dense mass matrix only captures the correlation within each
+            group (i.e. it is block-diagonal), and random variables that are not in any
+            group only get a diagonal entry. Only used when full_mass_matrix is True.
     """
 
     def __init__(
@@ -60,13 +76,22 @@ class HMCProposer(BaseProposer):
         adapt_mass_matrix: bool = True,
         target_accept_prob: float = 0.8,
         nnc_compile: bool = False,
+        batch_shape: torch.Size = torch.Size(),  # noqa: B008
+        full_mass_matrix: bool = False,
+        mass_matrix_blocks: Optional[List[Collection[RVIdentifier]]] = None,
     ):
         self.world = initial_world
         self._target_rvs = target_rvs
+        self._batch_shape = batch_shape
+        # nodes whose log probs carry the batch dimensions (the structure of the
+        # world is static when the chains are batched)
+        self._batched_nodes = batched_nodes(initial_world) if batch_shape else set()
         self._to_unconstrained = RealSpaceTransform(initial_world, target_rvs)
-        self._positions = self._to_unconstrained(
+        unconstrained_vals = self._to_unconstrained(
             {node: initial_world[node] for node in self._target_rvs}
         )
+        self._dict2vec = DictToVecConverter(unconstrained_vals, batch_shape)
+        self._positions = self._dict2vec.to_vec(unconstrained_vals)
         # cache pe and pe_grad to prevent re-computation
         self._pe, self._pe_grad = self._potential_grads(self._positions)
         # initialize parameters
@@ -75,7 +100,11 @@ class HMCProposer(BaseProposer):
         self.adapt_step_size = adapt_step_size
         self.adapt_mass_matrix = adapt_mass_matrix
         # we need mass matrix adapter to sample momentums
-        self._mass_matrix_adapter = MassMatrixAdapter()
+        self._mass_matrix_adapter = MassMatrixAdapter(
+            batch_shape,
+            full_mass_matrix,
+            self._get_block_ids(mass_matrix_blocks) if full_mass_matrix else None,
+        )
         if self.adapt_step_size:
             self.step_size = self._find_reasonable_step_size(
                 torch.as_tensor(initial_step_size),
@@ -99,48 +128,102 @@ class HMCProposer(BaseProposer):
             # pyre-ignore[8]
             self._leapfrog_step = nnc_jit(self._leapfrog_step)
 
+    def _get_block_ids(
+        self, mass_matrix_blocks: Optional[List[Collection[RVIdentifier]]]
+    ) -> Optional[torch.Tensor]:
+        """Assigns each element of the flattened positions to a block of the mass
+        matrix. Elements of nodes that are not in any block get their own block."""
+        if mass_matrix_blocks is None:
+            return None
+        slices = self._dict2vec.slices
+        matrix_size = self._positions.shape[-1]
+        block_ids = torch.arange(matrix_size)
+        for block_idx, block in enumerate(mass_matrix_blocks):
+            for node in block:
+                if node not in slices:
+                    raise ValueError(f"{node} is not a target of the proposer.")
+                block_ids[slices[node]] = matrix_size + block_idx
+        return block_ids
+
     @property
     def _initialize_momentums(self) -> Callable:
         return self._mass_matrix_adapter.initialize_momentums
 
     @property
-    def _mass_inv(self) -> RVDict:
+    def _mass_inv(self) -> torch.Tensor:
         return self._mass_matrix_adapter.mass_inv
 
-    def _kinetic_energy(self, momentums: RVDict, mass_inv: RVDict) -> torch.Tensor:
+    def _kinetic_energy(
+        self, momentums: torch.Tensor, mass_inv: torch.Tensor
+    ) -> torch.Tensor:
         """Returns the kinetic energy KE = 1/2 * p^T @ M^{-1} @ p (equation 2.6 in [1])"""
-        r = torch.cat([momentums[node] for node in mass_inv])
-        r_scale = torch.cat([mass_inv[node] * momentums[node] for node in mass_inv])
-        return torch.dot(r, r_scale) / 2
-
-    def _kinetic_grads(self, momentums: RVDict, mass_inv: RVDict) -> RVDict:
-        """Returns a dictionary of gradients of kinetic energy function with respect to
-        the momentum at each site, computed as M^{-1} @ p"""
-        grads = {}
-        for node, r in momentums.items():
-            grads[node] = mass_inv[node] * r
-        return grads
-
-    def _potential_energy(self, positions: RVDict) -> torch.Tensor:
+        return (momentums * self._kinetic_grads(momentums, mass_inv)).sum(-1) / 2
+
+    def _kinetic_grads(
+        self, momentums: torch.Tensor, mass_inv: torch.Tensor
+    ) -> torch.Tensor:
+        """Returns the gradients of kinetic energy function with respect to the
+        momentums, computed as M^{-1} @ p"""
+        if mass_inv.dim() == 1:
+            # diagonal mass matrix
+            return mass_inv * momentums
+        return momentums @ mass_inv
+
+    def _world_from_positions(self, positions: torch.Tensor) -> World:
+        """Returns a new world where the target random variables are replaced by the
+        values in positions (after transforming back to the constrained space)"""
+        return self.world.replace(
+            self._to_unconstrained.inv(self._dict2vec.to_dict(positions))
+        )
+
+    def _potential_energy(self, positions: torch.Tensor) -> torch.Tensor:
         """Returns the potential energy PE = - L(world) (the joint log likelihood of the
         current values)"""
-        constrained_vals = self._to_unconstrained.inv(positions)
-        log_joint = self.world.replace(constrained_vals).log_prob()
+        unconstrained_vals = self._dict2vec.to_dict(positions)
+        constrained_vals = self._to_unconstrained.inv(unconstrained_vals)
+        log_joint = self._log_joint(self.world.replace(constrained_vals))
         log_joint = log_joint - self._to_unconstrained.log_abs_det_jacobian(
-            constrained_vals, positions
+            constrained_vals, unconstrained_vals, self._batch_shape
         )
         return -log_joint
 
-    def _potential_grads(self, positions: RVDict) -> Tuple[torch.Tensor, RVDict]:
-        """Returns potential energy as well as a dictionary of its gradient with
-        respect to the value at each site."""
-        nodes, values = zip(*positions.items())
-        for value in values:
-            value.requires_grad = True
+    def _log_joint(self, world: World) -> torch.Tensor:
+        """Returns the joint log prob of world, computed separately for each chain
+        if the chains are batched."""
+        if len(self._batch_shape) == 0:
+            return world.log_prob()
+        log_joint = torch.zeros(self._batch_shape)
+        for node in world:
+            log_joint = log_joint + sum_to_batch_shape(
+                world.get_variable(node).log_prob,
+                self._batch_shape,
+                node in self._batched_nodes,
+            )
+        return log_joint
+
+    def _select(
+        self, mask: torch.Tensor, new: torch.Tensor, old: torch.Tensor
+    ) -> torch.Tensor:
+        """Returns the values in new for the chains where mask is True and the values
+        in old for the rest."""
+        if mask.dim() == 0:
+            return new if mask else old
+        return torch.where(
+            mask.reshape(mask.shape + (1,) * (new.dim() - mask.dim())), new, old
+        )
+
+    def _potential_grads(
+        self, positions: torch.Tensor
+    ) -> Tuple[torch.Tensor, torch.Tensor]:
+        """Returns potential energy as well as its gradient with respect to the
+        positions."""
+        positions.requires_grad = True
 
         try:
             pe = self._potential_energy(positions)
-            grads = torch.autograd.grad(pe, values)
+            # the chains are independent, so the gradient of the summed potential
+            # energy gives the gradient of each chain
+            (grads,) = torch.autograd.grad(pe.sum(), positions)
         # We return NaN on Cholesky factorization errors which can be gracefully
         # handled by NUTS/HMC.
         # TODO: Change to torch.linalg.LinAlgError when in release.
@@ -152,24 +235,24 @@ class HMCProposer(BaseProposer):
                     " If automatic recovery does not happen, plese file an issue"
                     " at https://github.com/facebookresearch/beanmachine/issues/."
                 )
-                grads = [torch.full_like(v, float("nan")) for v in values]
-                pe = torch.tensor(
-                    float("nan"), device=grads[0].device, dtype=grads[0].dtype
+                grads = torch.full_like(positions, float("nan"))
+                pe = torch.full(
+                    self._batch_shape,
+                    float("nan"),
+                    device=grads.device,
+                    dtype=grads.dtype,
                 )
             else:
                 raise e
 
-        grads = dict(zip(nodes, grads))
-
-        for value in values:
-            value.requires_grad = False
+        positions.requires_grad = False
         return pe.detach(), grads
 
     def _hamiltonian(
         self,
-        positions: RVDict,
-        momentums: RVDict,
-        mass_inv: RVDict,
+        positions: torch.Tensor,
+        momentums: torch.Tensor,
+        mass_inv: torch.Tensor,
         pe: Optional[torch.Tensor] = None,
     ) -> torch.Tensor:
         """Returns the value of Hamiltonian equation (equatino 2.5 in [1]). This function
@@ -182,12 +265,12 @@ class HMCProposer(BaseProposer):
 
     def _leapfrog_step(
         self,
-        positions: RVDict,
-        momentums: RVDict,
+        positions: torch.Tensor,
+        momentums: torch.Tensor,
         step_size: torch.Tensor,
-        mass_inv: RVDict,
-        pe_grad: Optional[RVDict] = None,
-    ) -> Tuple[RVDict, RVDict, torch.Tensor, RVDict]:
+        mass_inv: torch.Tensor,
+        pe_grad: Optional[torch.Tensor] = None,
+    ) -> Tuple[torch.Tensor, torch.Tensor, torch.Tensor, torch.Tensor]:
         """Performs a single leapfrog integration (alson known as the velocity Verlet
         method) as described in equation 2.28-2.30 in [1]. If the values of potential
         grads of the current world is provided, then we only needs to compute the
@@ -195,30 +278,25 @@ class HMCProposer(BaseProposer):
         if pe_grad is None:
             _, pe_grad = self._potential_grads(positions)
 
-        new_momentums = {}
-        for node, r in momentums.items():
-            new_momentums[node] = r - step_size * pe_grad[node].flatten() / 2
+        new_momentums = momentums - step_size * pe_grad / 2
         ke_grad = self._kinetic_grads(new_momentums, mass_inv)
 
-        new_positions = {}
-        for node, z in positions.items():
-            new_positions[node] = z + step_size * ke_grad[node].reshape(z.shape)
+        new_positions = positions + step_size * ke_grad
 
         pe, pe_grad = self._potential_grads(new_positions)
-        for node, r in new_momentums.items():
-            new_momentums[node] = r - step_size * pe_grad[node].flatten() / 2
+        new_momentums = new_momentums - step_size * pe_grad / 2
 
         return new_positions, new_momentums, pe, pe_grad
 
     def _leapfrog_updates(
         self,
-        positions: RVDict,
-        momentums: RVDict,
+        positions: torch.Tensor,
+        momentums: torch.Tensor,
         trajectory_length: float,
         step_size: torch.Tensor,
-        mass_inv: RVDict,
-        pe_grad: Optional[RVDict] = None,
-    ) -> Tuple[RVDict, RVDict, torch.Tensor, RVDict]:
+        mass_inv: torch.Tensor,
+        pe_grad: Optional[torch.Tensor] = None,
+    ) -> Tuple[torch.Tensor, torch.Tensor, torch.Tensor, torch.Tensor]:
         """Run multiple iterations of leapfrog integration until the length of the
         trajectory is greater than the specified trajectory_length."""
         # we should run at least 1 step
@@ -228,14 +306,14 @@ class HMCProposer(BaseProposer):
                 positions, momentums, step_size, mass_inv, pe_grad
             )
         # pyre-ignore[61]: `pe` may not be initialized here.
-        return positions, momentums, pe, cast(RVDict, pe_grad)
+        return positions, momentums, pe, pe_grad
 
     def _find_reasonable_step_size(
         self,
         initial_step_size: torch.Tensor,
-        positions: RVDict,
+        positions: torch.Tensor,
         pe: torch.Tensor,
-        pe_grad: RVDict,
+        pe_grad: torch.Tensor,
     ) -> torch.Tensor:
         """A heuristic of finding a reasonable initial step size (epsilon) as introduced
         in Algorithm 4 of [2]."""
@@ -254,7 +332,9 @@ class HMCProposer(BaseProposer):
             new_positions, new_momentums, self._mass_inv, new_pe
         )
         # NaN will evaluate to False and set direction to -1
-        new_direction = direction = 1 if energy - new_energy > target else -1
+        new_direction = direction = (
+            1 if self._log_mean_accept_prob(energy - new_energy) > target else -1
+        )
         step_size_scale = 2**direction
         while new_direction == direction:
             step_size *= step_size_scale
@@ -277,15 +357,25 @@ class HMCProposer(BaseProposer):
             new_energy = self._hamiltonian(
                 new_positions, new_momentums, self._mass_inv, new_pe
             )
-            new_direction = 1 if energy - new_energy > target else -1
+            new_direction = (
+                1 if self._log_mean_accept_prob(energy - new_energy) > target else -1
+            )
         return step_size
 
+    def _log_mean_accept_prob(self, log_accept_prob: torch.Tensor) -> torch.Tensor:
+        """Returns the log of the acceptance probability averaged over the chains."""
+        if log_accept_prob.dim() == 0:
+            return log_accept_prob
+        return torch.logsumexp(log_accept_prob, dim=0) - math.log(
+            log_accept_prob.numel()
+        )
+
     def propose(self, world: World) -> Tuple[World, torch.Tensor]:
         if world is not self.world:
             # re-compute cached values since world was modified by other sources
             self.world = world
-            self._positions = self._to_unconstrained(
-                {node: world[node] for node in self._target_rvs}
+            self._positions = self._dict2vec.to_vec(
+                self._to_unconstrained({node: world[node] for node in self._target_rvs})
             )
             self._pe, self._pe_grad = self._potential_grads(self._positions)
         momentums = self._initialize_momentums(self._positions)
@@ -307,18 +397,24 @@ class HMCProposer(BaseProposer):
         delta_energy = new_energy - current_energy
         self._alpha = torch.clamp(torch.exp(-delta_energy), max=1.0)
         # accept/reject new world
-        if torch.bernoulli(self._alpha):
-            self.world = self.world.replace(self._to_unconstrained.inv(positions))
+        accepted = torch.bernoulli(self._alpha).bool()
+        if accepted.any():
+            positions = self._select(accepted, positions, self._positions)
+            self.world = self._world_from_positions(positions)
             # update cache
-            self._positions, self._pe, self._pe_grad = positions, pe, pe_grad
-        return self.world, torch.zeros_like(self._alpha)
+            self._positions = positions
+            self._pe = torch.where(accepted, pe, self._pe)
+            self._pe_grad = self._select(accepted, pe_grad, self._pe_grad)
+        return self.world, self._alpha.new_zeros(())
 
     def do_adaptation(self, *args, **kwargs) -> None:
         if self._alpha is None:
             return
 
         if self.adapt_step_size:
-            self.step_size = self._step_size_adapter.step(self._alpha)
+            # the step size is shared across chains, so it is adapted to the average
+            # acceptance probability
+            self.step_size = self._step_size_adapter.step(self._alpha.mean())
 
         if self.adapt_mass_matrix:
             window_scheme = self._window_scheme
@@ -5,10 +5,11 @@
 
 import math
 import warnings
-from typing import cast, Dict, Set, Union
+from typing import cast, Dict, List, Optional, Set, Union
 
 import torch
 import torch.distributions as dist
+from beanmachine.ppl.inference.utils import sum_to_batch_shape
 from beanmachine.ppl.model.rv_identifier import RVIdentifier
 from beanmachine.ppl.world import RVDict, World
 from beanmachine.ppl.world.utils import get_default_transforms
@@ -110,55 +111,89 @@ class MassMatrixAdapter:
     Reference:
         [1] "HMC algorithm parameters" from Stan Reference Manual
         https://mc-stan.org/docs/2_26/reference-manual/hmc-algorithm-parameters.html#euclidean-metric
-    """
-
-    def __init__(self):
-        self.mass_inv: RVDict = {}  # inverse mass matrices, aka the inverse "metric"
-        self.momentum_dists = {}  # distribution objects for generating momentums
 
-        self._adapters = {}
+    Args:
+        batch_shape: Shape of the leading batch (chain) dimensions of the positions.
+            The mass matrix is shared by (and adapted from) all of the chains in the
+            batch. Defaults to ``()``.
+        full_mass_matrix: Whether to adapt a dense inverse mass matrix, which can
+            capture the correlation between the positions, instead of a diagonal one.
+            Defaults to False.
+        block_ids: Optional 1-D integer Tensor that assigns each element of the
+            flattened positions to a block. If provided, the dense inverse mass matrix
+            only captures the correlation between elements in the same block, i.e. it
+            is block-diagonal. Only used when full_mass_matrix is True.
+    """
 
-    def initialize_momentums(self, positions: RVDict) -> RVDict:
+    def __init__(
+        self,
+        batch_shape: torch.Size = torch.Size(),  # noqa: B008
+        full_mass_matrix: bool = False,
+        block_ids: Optional[torch.Tensor] = None,
+    ):
+        # inverse mass matrix, aka the inverse "metric", of the flattened positions.
+        # This is a 1D Tensor for a diagonal mass matrix and a 2D Tensor otherwise.
+        self.mass_inv: Optional[torch.Tensor] = None
+        # distribution object for generating momentums
+        self.momentum_dist: Optional[dist.Distribution] = None
+
+        self._full_mass_matrix = full_mass_matrix
+        self._block_ids = block_ids
+        self._adapter = WelfordCovariance(diagonal=not full_mass_matrix)
+        self._batch_shape = batch_shape
+
+    def initialize_momentums(self, positions: torch.Tensor) -> torch.Tensor:
         """
         Randomly draw momentum from MultivariateNormal(0, M). This momentum variable
-        is denoted as p in [1] and r in [2]. Additionally, for nodes that are seen
-        for the first time, this also initializes their (inverse) mass matrices to
-        the identity matrix.
+        is denoted as p in [1] and r in [2]. Additionally, when it is called for the
+        first time, this also initializes the (inverse) mass matrix to the identity
+        matrix.
 
         Args:
-            positions: RVDict corresponding to the positions of the energy function.
+            positions: Flattened positions of the energy function.
         """
-        momentums = {}
-        for node in positions:
-            # initialize M^{-1} for nodes that are seen for the first time
-            node_val = positions[node].flatten()
-            if node not in self.mass_inv:
-                self.mass_inv[node] = torch.ones_like(node_val)
-                self.momentum_dists[node] = dist.Normal(
-                    torch.zeros_like(node_val), torch.ones_like(node_val)
+        if self.mass_inv is None:
+            # initialize M^{-1} with the size of the positions of a single chain
+            matrix_size = positions.shape[-1]
+            if self._full_mass_matrix:
+                self.mass_inv = torch.eye(
+                    matrix_size, dtype=positions.dtype, device=positions.device
                 )
-            momentums[node] = self.momentum_dists[node].sample()
-        return momentums
+            else:
+                self.mass_inv = positions.new_ones(matrix_size)
+            self.momentum_dist = dist.Normal(
+                positions.new_zeros(matrix_size), positions.new_ones(matrix_size)
+            )
+        assert self.momentum_dist is not None
+        return self.momentum_dist.sample(self._batch_shape)
 
-    def step(self, positions: RVDict):
-        for node, z in positions.items():
-            if node not in self._adapters:
-                self._adapters[node] = WelfordCovariance(diagonal=True)
-            self._adapters[node].step(z.flatten())
+    def step(self, positions: torch.Tensor):
+        # every chain in the batch contributes a sample to the estimator
+        for sample in positions.reshape(-1, positions.shape[-1]):
+            self._adapter.step(sample)
 
     def finalize(self) -> None:
-        for node, adapter in self._adapters.items():
-            try:
-                mass_inv = adapter.finalize()
-                self.momentum_dists[node] = dist.Normal(
+        try:
+            mass_inv = self._adapter.finalize()
+            if self._full_mass_matrix:
+                block_ids = self._block_ids
+                if block_ids is not None:
+                    # drop the covariance between elements of different blocks
+                    mass_inv = mass_inv * (block_ids.unsqueeze(-1) == block_ids)
+                # momentums are drawn from N(0, M), where M is the inverse of mass_inv.
+                # The distribution computes the Cholesky factor of M from mass_inv.
+                self.momentum_dist = dist.MultivariateNormal(
+                    torch.zeros_like(mass_inv[0]), precision_matrix=mass_inv
+                )
+            else:
+                self.momentum_dist = dist.Normal(
                     torch.zeros_like(mass_inv), torch.sqrt(mass_inv).reciprocal()
                 )
-                self.mass_inv[node] = mass_inv
-            except RuntimeError as e:
-                warnings.warn(str(e))
-                continue
-        # reset adapters to get ready for the next window
-        self._adapters = {}
+            self.mass_inv = mass_inv
+        except (RuntimeError, ValueError) as e:
+            warnings.warn(str(e))
+        # reset adapter to get ready for the next window
+        self._adapter = WelfordCovariance(diagonal=not self._full_mass_matrix)
 
 
 class WelfordCovariance:
@@ -187,6 +222,14 @@ class WelfordCovariance:
         else:
             self._M2 += torch.outer(delta, delta2)
 
+    @property
+    def count(self) -> int:
+        return self._count
+
+    @property
+    def mean(self) -> Union[float, torch.Tensor]:
+        return self._mean
+
     def finalize(self, regularize: bool = True) -> torch.Tensor:
         if self._count < 2:
             raise RuntimeError(
@@ -208,6 +251,57 @@ class WelfordCovariance:
         return covariance
 
 
+class DictToVecConverter:
+    """
+    A utility class to pack a dictionary of Tensors into a single flattened Tensor, or
+    to unpack a flattened Tensor into a dictionary of Tensors. The order of the keys
+    and the slice of the flattened Tensor that each key occupies are determined once
+    from ``example_dict``.
+
+    Args:
+        example_dict: A dictionary of Tensors that determines the layout.
+        batch_shape: Shape of the leading batch dimensions, which are kept as-is when
+            flattening. Defaults to ``()``.
+    """
+
+    def __init__(
+        self,
+        example_dict: RVDict,
+        batch_shape: torch.Size = torch.Size(),  # noqa: B008
+    ):
+        self._batch_shape = batch_shape
+        self._keys: List[RVIdentifier] = list(example_dict)
+        self._val_shapes = [
+            example_dict[key].shape[len(batch_shape) :] for key in self._keys
+        ]
+        self._val_sizes = [shape.numel() for shape in self._val_shapes]
+
+    @property
+    def slices(self) -> Dict[RVIdentifier, slice]:
+        """The slice of the flattened Tensor that each key occupies"""
+        slices = {}
+        start = 0
+        for key, size in zip(self._keys, self._val_sizes):
+            slices[key] = slice(start, start + size)
+            start += size
+        return slices
+
+    def to_vec(self, dict_in: RVDict) -> torch.Tensor:
+        """Concatenate the flattened values of dict_in into a single Tensor"""
+        return torch.cat(
+            [dict_in[key].reshape(self._batch_shape + (-1,)) for key in self._keys],
+            dim=-1,
+        )
+
+    def to_dict(self, vec: torch.Tensor) -> RVDict:
+        """Split vec into a dictionary of Tensors with their original shapes"""
+        vals = torch.split(vec, self._val_sizes, dim=-1)
+        return {
+            key: val.reshape(self._batch_shape + shape)
+            for key, val, shape in zip(self._keys, vals, self._val_shapes)
+        }
+
+
 class DictTransform:
     """
     A general class for applying a dictionary of Transforms to a dictionary of
@@ -229,15 +323,21 @@ class DictTransform:
         return {node: self.transforms[node].inv(val) for node, val in node_vals.items()}
 
     def log_abs_det_jacobian(
-        self, untransformed_vals: RVDict, transformed_vals: RVDict
+        self,
+        untransformed_vals: RVDict,
+        transformed_vals: RVDict,
+        batch_shape: torch.Size = torch.Size(),  # noqa: B008
     ) -> torch.Tensor:
-        """Computes the sum of log det jacobian `log |dy/dx|` on the pairs of Tensors"""
+        """Computes the sum of log det jacobian `log |dy/dx|` on the pairs of Tensors.
+        If batch_shape is given, the sum is computed separately for each batch element
+        and the returned Tensor is of shape batch_shape."""
         jacobian = torch.tensor(0.0)
         for node in untransformed_vals:
-            jacobian = jacobian + (
-                self.transforms[node]
-                .log_abs_det_jacobian(untransformed_vals[node], transformed_vals[node])
-                .sum()
+            jacobian = jacobian + sum_to_batch_shape(
+                self.transforms[node].log_abs_det_jacobian(
+                    untransformed_vals[node], transformed_vals[node]
+                ),
+                batch_shape,
             )
         return jacobian
 
@@ -3,29 +3,29 @@
 # This source code is licensed under the MIT license found in the
 # LICENSE file in the root directory of this source tree.
 
-from typing import NamedTuple, Set, Tuple
+from typing import Collection, List, NamedTuple, Optional, Set, Tuple
 
 import torch
 from beanmachine.ppl.experimental.nnc import nnc_jit
 from beanmachine.ppl.inference.proposer.hmc_proposer import HMCProposer
 from beanmachine.ppl.model.rv_identifier import RVIdentifier
-from beanmachine.ppl.world import RVDict, World
+from beanmachine.ppl.world import World
 
 
 class _TreeNode(NamedTuple):
-    positions: RVDict
-    momentums: RVDict
-    pe_grad: RVDict
+    positions: torch.Tensor
+    momentums: torch.Tensor
+    pe_grad: torch.Tensor
 
 
 class _Tree(NamedTuple):
     left: _TreeNode
     right: _TreeNode
-    proposal: RVDict
+    proposal: torch.Tensor
     pe: torch.Tensor
-    pe_grad: RVDict
+    pe_grad: torch.Tensor
     log_weight: torch.Tensor
-    sum_momentums: RVDict
+    sum_momentums: torch.Tensor
     sum_accept_prob: torch.Tensor
     num_proposals: torch.Tensor
     turned_or_diverged: torch.Tensor
@@ -36,7 +36,7 @@ class _TreeArgs(NamedTuple):
     direction: torch.Tensor
     step_size: torch.Tensor
     initial_energy: torch.Tensor
-    mass_inv: RVDict
+    mass_inv: torch.Tensor
 
 
 class NUTSProposer(HMCProposer):
@@ -68,6 +68,17 @@ class NUTSProposer(HMCProposer):
         target_accept_prob: Target accept probability. Increasing this would lead to smaller step size. Defaults to 0.8.
         nnc_compile: (Experimental) If True, NNC compiler will be used to accelerate the
             inference (defaults to False).
+        batch_shape: Shape of the leading batch dimensions of the values in
+            initial_world, i.e. ``(num_chains,)`` when multiple chains are stacked
+            along a leading dimension. Every chain builds its own trajectory, and a
+            chain that has turned or diverged is frozen until all of the chains in the
+            batch have stopped. Defaults to ``()``, i.e. a single chain.
+        full_mass_matrix: Whether to adapt a dense mass matrix that captures the
+            correlation between the target random variables, defaults to False (i.e.
+            a diagonal mass matrix).
+        mass_matrix_blocks: Optional list of groups of target random variables. If
+            provided, the dense mass matrix only captures the correlation within each
+            group (i.e. it is block-diagonal). Only used when full_mass_matrix is True.
     """
 
     def __init__(
@@ -83,6 +94,9 @@ class NUTSProposer(HMCProposer):
         multinomial_sampling: bool = True,
         target_accept_prob: float = 0.8,
         nnc_compile: bool = False,
+        batch_shape: torch.Size = torch.Size(),  # noqa: B008
+        full_mass_matrix: bool = False,
+        mass_matrix_blocks: Optional[List[Collection[RVIdentifier]]] = None,
     ):
         # note that trajectory_length is not used in NUTS
         super().__init__(
@@ -95,6 +109,9 @@ class NUTSProposer(HMCProposer):
             adapt_mass_matrix=adapt_mass_matrix,
             target_accept_prob=target_accept_prob,
             nnc_compile=False,  # we will use NNC at NUTS level, not at HMC level
+            batch_shape=batch_shape,
+            full_mass_matrix=full_mass_matrix,
+            mass_matrix_blocks=mass_matrix_blocks,
         )
         self._max_tree_depth = max_tree_depth
         self._max_delta_energy = max_delta_energy
@@ -105,16 +122,16 @@ class NUTSProposer(HMCProposer):
 
     def _is_u_turning(
         self,
-        mass_inv: RVDict,
-        left_momentums: RVDict,
-        right_momentums: RVDict,
-        sum_momentums: RVDict,
+        mass_inv: torch.Tensor,
+        left_momentums: torch.Tensor,
+        right_momentums: torch.Tensor,
+        sum_momentums: torch.Tensor,
     ) -> torch.Tensor:
         """The generalized U-turn condition, as described in [2] Appendix 4.2"""
-        left_r = torch.cat([left_momentums[node] for node in mass_inv])
-        right_r = torch.cat([right_momentums[node] for node in mass_inv])
-        rho = torch.cat([mass_inv[node] * sum_momentums[node] for node in mass_inv])
-        return (torch.dot(left_r, rho) <= 0) or (torch.dot(right_r, rho) <= 0)
+        rho = self._kinetic_grads(sum_momentums, mass_inv)
+        return ((left_momentums * rho).sum(-1) <= 0) | (
+            (right_momentums * rho).sum(-1) <= 0
+        )
 
     def _build_tree_base_case(self, root: _TreeNode, args: _TreeArgs) -> _Tree:
         """Base case of the recursive tree building algorithm: take a single leapfrog
@@ -160,7 +177,7 @@ class NUTSProposer(HMCProposer):
 
         # build the first half of the tree
         sub_tree = self._build_tree(root, tree_depth - 1, args)
-        if sub_tree.turned_or_diverged:
+        if sub_tree.turned_or_diverged.all():
             return sub_tree
 
         # build the other half of the tree
@@ -179,7 +196,7 @@ class NUTSProposer(HMCProposer):
         old_tree: _Tree,
         new_tree: _Tree,
         direction: torch.Tensor,
-        mass_inv: RVDict,
+        mass_inv: torch.Tensor,
         biased: bool,
     ) -> _Tree:
         """Combine the old tree and the new tree into a single (large) tree. The new
@@ -187,15 +204,17 @@ class NUTSProposer(HMCProposer):
         will be add to the right. If biased is True, then we will prefer choosing from
         new tree (which is away from the starting location) than old tree when sampling
         the next state from the trajectory. This function assumes old_tree is not
-        turned or diverged."""
+        turned or diverged, except for batched chains, where the chains in which
+        old_tree has turned or diverged are left unchanged."""
+        frozen = old_tree.turned_or_diverged
         # if old tree hsa turned or diverged, then we shouldn't build the new tree in
         # the first place
-        assert not old_tree.turned_or_diverged
+        assert frozen.dim() > 0 or not frozen
         # log of the sum of the weights from both trees
         log_weight = torch.logaddexp(old_tree.log_weight, new_tree.log_weight)
 
-        if new_tree.turned_or_diverged:
-            selected_subtree = old_tree
+        if new_tree.turned_or_diverged.all():
+            select_new = torch.zeros_like(new_tree.turned_or_diverged)
         else:
             # progressively sample from the trajectory
             if biased:
@@ -205,21 +224,17 @@ class NUTSProposer(HMCProposer):
                 # uniform progressive sampling (Appendix 3.1 of [2])
                 log_tree_prob = new_tree.log_weight - log_weight
 
-            if torch.rand_like(log_tree_prob).log() < log_tree_prob:
-                selected_subtree = new_tree
-            else:
-                selected_subtree = old_tree
+            select_new = (
+                torch.rand_like(log_tree_prob).log() < log_tree_prob
+            ) & ~new_tree.turned_or_diverged
 
         if direction == -1:
             left_tree, right_tree = new_tree, old_tree
         else:
             left_tree, right_tree = old_tree, new_tree
 
-        sum_momentums = {
-            node: left_tree.sum_momentums[node] + right_tree.sum_momentums[node]
-            for node in left_tree.sum_momentums
-        }
-        turned_or_diverged = new_tree.turned_or_diverged or self._is_u_turning(
+        sum_momentums = left_tree.sum_momentums + right_tree.sum_momentums
+        turned_or_diverged = new_tree.turned_or_diverged | self._is_u_turning(
             mass_inv,
             left_tree.left.momentums,
             right_tree.right.momentums,
@@ -227,48 +242,66 @@ class NUTSProposer(HMCProposer):
         )
         # More robust U-turn condition
         # https://discourse.mc-stan.org/t/nuts-misses-u-turns-runs-in-circles-until-max-treedepth/9727
-        if not turned_or_diverged and right_tree.num_proposals > 1:
-            extended_sum_momentums = {
-                node: left_tree.sum_momentums[node] + right_tree.left.momentums[node]
-                for node in sum_momentums
-            }
-            turned_or_diverged = self._is_u_turning(
-                mass_inv,
-                left_tree.left.momentums,
-                right_tree.left.momentums,
-                extended_sum_momentums,
+        if not turned_or_diverged.all() and (right_tree.num_proposals > 1).any():
+            extended_sum_momentums = left_tree.sum_momentums + right_tree.left.momentums
+            turned_or_diverged = turned_or_diverged | (
+                self._is_u_turning(
+                    mass_inv,
+                    left_tree.left.momentums,
+                    right_tree.left.momentums,
+                    extended_sum_momentums,
+                )
+                & (right_tree.num_proposals > 1)
+            )
+        if not turned_or_diverged.all() and (left_tree.num_proposals > 1).any():
+            extended_sum_momentums = (
+                right_tree.sum_momentums + left_tree.right.momentums
             )
-        if not turned_or_diverged and left_tree.num_proposals > 1:
-            extended_sum_momentums = {
-                node: right_tree.sum_momentums[node] + left_tree.right.momentums[node]
-                for node in sum_momentums
-            }
-            turned_or_diverged = self._is_u_turning(
-                mass_inv,
-                left_tree.right.momentums,
-                right_tree.right.momentums,
-                extended_sum_momentums,
+            turned_or_diverged = turned_or_diverged | (
+                self._is_u_turning(
+                    mass_inv,
+                    left_tree.right.momentums,
+                    right_tree.right.momentums,
+                    extended_sum_momentums,
+                )
+                & (left_tree.num_proposals > 1)
             )
 
-        return _Tree(
+        tree = _Tree(
             left=left_tree.left,
             right=right_tree.right,
-            proposal=selected_subtree.proposal,
-            pe=selected_subtree.pe,
-            pe_grad=selected_subtree.pe_grad,
+            proposal=self._select(select_new, new_tree.proposal, old_tree.proposal),
+            pe=self._select(select_new, new_tree.pe, old_tree.pe),
+            pe_grad=self._select(select_new, new_tree.pe_grad, old_tree.pe_grad),
             log_weight=log_weight,
             sum_momentums=sum_momentums,
             sum_accept_prob=old_tree.sum_accept_prob + new_tree.sum_accept_prob,
             num_proposals=old_tree.num_proposals + new_tree.num_proposals,
             turned_or_diverged=turned_or_diverged,
         )
+        if frozen.any():
+            tree = self._select_tree(frozen, old_tree, tree)
+        return tree
+
+    def _select_tree(self, mask: torch.Tensor, new: _Tree, old: _Tree) -> _Tree:
+        """Returns a tree that takes the values of new for the chains where mask is
+        True and the values of old for the rest."""
+        fields = {}
+        for name, new_val, old_val in zip(_Tree._fields, new, old):
+            if isinstance(new_val, _TreeNode):
+                fields[name] = _TreeNode(
+                    *(self._select(mask, n, o) for n, o in zip(new_val, old_val))
+                )
+            else:
+                fields[name] = self._select(mask, new_val, old_val)
+        return _Tree(**fields)
 
     def propose(self, world: World) -> Tuple[World, torch.Tensor]:
         if world is not self.world:
             # re-compute cached values since world was modified by other sources
             self.world = world
-            self._positions = self._to_unconstrained(
-                {node: world[node] for node in self._target_rvs}
+            self._positions = self._dict2vec.to_vec(
+                self._to_unconstrained({node: world[node] for node in self._target_rvs})
             )
             self._pe, self._pe_grad = self._potential_grads(self._positions)
 
@@ -281,7 +314,7 @@ class NUTSProposer(HMCProposer):
             log_slice = -current_energy
         else:
             # this is a more stable way to sample from log(Uniform(0, exp(-current_energy)))
-            log_slice = torch.log1p(-torch.rand(())) - current_energy
+            log_slice = torch.log1p(-torch.rand(self._batch_shape)) - current_energy
         tree_node = _TreeNode(self._positions, momentums, self._pe_grad)
         tree = _Tree(
             left=tree_node,
@@ -313,11 +346,11 @@ class NUTSProposer(HMCProposer):
             tree = self._combine_tree(
                 tree, new_tree, direction, self._mass_inv, biased=True
             )
-            if tree.turned_or_diverged:
+            if tree.turned_or_diverged.all():
                 break
 
         if tree.proposal is not self._positions:
-            self.world = self.world.replace(self._to_unconstrained.inv(tree.proposal))
+            self.world = self._world_from_positions(tree.proposal)
             self._positions, self._pe, self._pe_grad = (
                 tree.proposal,
                 tree.pe,
@@ -325,4 +358,4 @@ class NUTSProposer(HMCProposer):
             )
 
         self._alpha = tree.sum_accept_prob / tree.num_proposals
-        return self.world, torch.zeros_like(self._alpha)
+        return self.world, self._alpha.new_zeros(())
@@ -0,0 +1,156 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+#
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+
+import math
+from collections import defaultdict
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+import torch
+from beanmachine.ppl.inference.proposer.base_proposer import BaseProposer
+from beanmachine.ppl.inference.proposer.hmc_utils import (
+    DictToVecConverter,
+    RealSpaceTransform,
+)
+from beanmachine.ppl.model.rv_identifier import RVIdentifier
+from beanmachine.ppl.world import World
+
+
+class SGHMCProposer(BaseProposer):
+    """
+    Stochastic Gradient Hamiltonian Monte Carlo (SGHMC) [1]. Rather than computing the
+    gradient of the joint log prob over all of the observations, the gradient is
+    estimated from a random minibatch of the observations whose log prob is rescaled
+    by the inverse of the fraction of the observations that is in the minibatch, so
+    that the cost of each step only grows with the size of the minibatch. The noise
+    in the gradient is compensated by the friction of the dynamics instead of by a
+    Metropolis-Hastings correction, so every proposal is accepted. With a friction of
+    1 the momentum is resampled at every step and the update reduces to Stochastic
+    Gradient Langevin Dynamics (SGLD) [2] with a step size of ``2 * learning_rate``.
+
+    The minibatches are drawn with replacement, independently for every family of
+    observed random variables in ``minibatch_sizes``; the observations of the other
+    families are always used in full. Only the minibatch and the latent variables
+    that depend on the target random variables are re-evaluated when estimating the
+    gradient. The World is only updated once per proposal, after ``num_steps``
+    updates of the positions, and its observations are only re-evaluated when they
+    are used (e.g. to record their log likelihoods).
+
+    Reference:
+        [1] Tianqi Chen, Emily Fox and Carlos Guestrin. "Stochastic Gradient
+            Hamiltonian Monte Carlo" (2014). https://arxiv.org/abs/1402.4102
+
+        [2] Max Welling and Yee Whye Teh. "Bayesian Learning via Stochastic Gradient
+            Langevin Dynamics" (2011).
+
+    Args:
+        initial_world: Initial world to propose from.
+        target_rvs: Set of RVIdentifiers to indicate which variables to propose.
+        learning_rate: Learning rate (i.e. squared step size) of the dynamics.
+        friction: Friction of the dynamics, between 0 and 1.
+        minibatch_sizes: The number of observations to subsample at every step for
+            each family of observed random variables.
+        num_steps: The number of updates of the positions per proposal.
+    """
+
+    def __init__(
+        self,
+        initial_world: World,
+        target_rvs: Set[RVIdentifier],
+        learning_rate: float,
+        friction: float = 0.1,
+        minibatch_sizes: Optional[Dict[Callable, int]] = None,
+        num_steps: int = 1,
+    ):
+        if not 0.0 < friction <= 1.0:
+            raise ValueError("The friction should be in (0, 1].")
+        self.world = initial_world
+        self._target_rvs = target_rvs
+        self.learning_rate = learning_rate
+        self.friction = friction
+        self.num_steps = num_steps
+        self._to_unconstrained = RealSpaceTransform(initial_world, target_rvs)
+        unconstrained_vals = self._to_unconstrained(
+            {node: initial_world[node] for node in self._target_rvs}
+        )
+        self._dict2vec = DictToVecConverter(unconstrained_vals)
+        self._positions = self._dict2vec.to_vec(unconstrained_vals)
+        self._momentums = torch.zeros_like(self._positions)
+
+        # normalize bound methods to the function that identifies the family
+        minibatch_sizes = {
+            getattr(family, "__func__", family): size
+            for family, size in (minibatch_sizes or {}).items()
+        }
+        observations_by_family = defaultdict(list)
+        for node in initial_world.observations:
+            observations_by_family[node.wrapper].append(node)
+        self._full_observations: List[RVIdentifier] = []
+        self._subsampled_families: List[Tuple[List[RVIdentifier], int]] = []
+        for family, nodes in observations_by_family.items():
+            size = minibatch_sizes.get(family)
+            if size is None or size >= len(nodes):
+                self._full_observations.extend(nodes)
+            else:
+                self._subsampled_families.append((nodes, size))
+
+    def _minibatch(self) -> Dict[RVIdentifier, float]:
+        """Returns the observations in a random minibatch, mapped to the scale of
+        their log prob."""
+        minibatch = {node: 1.0 for node in self._full_observations}
+        for nodes, size in self._subsampled_families:
+            scale = len(nodes) / size
+            # an observation that is drawn several times is counted as many times
+            for idx in torch.randint(len(nodes), (size,)).tolist():
+                minibatch[nodes[idx]] = minibatch.get(nodes[idx], 0.0) + scale
+        return minibatch
+
+    def _log_prob_estimate(self, positions: torch.Tensor) -> torch.Tensor:
+        """Returns an unbiased estimate of the joint log prob (in the unconstrained
+        space) of the world where the target random variables take the values in
+        positions, computed from a random minibatch of the observations."""
+        unconstrained_vals = self._dict2vec.to_dict(positions)
+        constrained_vals = self._to_unconstrained.inv(unconstrained_vals)
+        minibatch_world = self.world.replace_latents(constrained_vals)
+        minibatch = self._minibatch()
+        for node in minibatch:
+            minibatch_world.call(node)
+        log_prob = minibatch_world.log_prob(minibatch_world.latent_nodes)
+        for node, scale in minibatch.items():
+            node_log_prob = minibatch_world.get_variable(node).log_prob_sum
+            log_prob = log_prob + scale * node_log_prob
+        return log_prob - self._to_unconstrained.log_abs_det_jacobian(
+            constrained_vals, unconstrained_vals
+        )
+
+    def _log_prob_grads(self, positions: torch.Tensor) -> torch.Tensor:
+        positions = positions.detach().requires_grad_()
+        (grads,) = torch.autograd.grad(self._log_prob_estimate(positions), positions)
+        return grads
+
+    def propose(self, world: World) -> Tuple[World, torch.Tensor]:
+        if world is not self.world:
+            # re-compute cached values since world was modified by other sources
+            self.world = world
+            self._positions = self._dict2vec.to_vec(
+                self._to_unconstrained({node: world[node] for node in self._target_rvs})
+            )
+        positions = self._positions
+        momentums = self._momentums
+        noise_scale = math.sqrt(2 * self.friction * self.learning_rate)
+        for _ in range(self.num_steps):
+            grads = self._log_prob_grads(positions)
+            momentums = (
+                (1 - self.friction) * momentums
+                + self.learning_rate * grads
+                + noise_scale * torch.randn_like(positions)
+            )
+            positions = positions + momentums
+        self._positions = positions
+        self._momentums = momentums
+        self.world = world.replace_latents(
+            self._to_unconstrained.inv(self._dict2vec.to_dict(positions))
+        )
+        # the dynamics are not reversible, so there is no MH correction
+        return self.world, torch.zeros(())
@@ -0,0 +1,100 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+#
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+
+import beanmachine.ppl as bm
+import torch
+import torch.distributions as dist
+from beanmachine.ppl.inference.proposer.conjugate_gibbs_proposer import (
+    ConjugateGibbsProposer,
+    is_conjugate,
+)
+from beanmachine.ppl.world import World
+
+
+@bm.random_variable
+def theta():
+    return dist.Beta(2.0, 3.0)
+
+
+@bm.random_variable
+def flip(i):
+    return dist.Bernoulli(theta())
+
+
+@bm.random_variable
+def mu():
+    return dist.Normal(0.0, 2.0)
+
+
+@bm.random_variable
+def x(i):
+    return dist.Normal(mu(), 1.0)
+
+
+@bm.random_variable
+def y():
+    return dist.Normal(2.0 * mu(), 1.0)
+
+
+@bm.random_variable
+def z():
+    # the scale depends on mu as well, so mu is not conjugate
+    return dist.Normal(mu(), mu().abs() + 1.0)
+
+
+def test_beta_bernoulli_posterior():
+    observations = {flip(0): torch.tensor(1.0), flip(1): torch.tensor(1.0)}
+    observations[flip(2)] = torch.tensor(0.0)
+    world = World.initialize_world([theta()], observations)
+    assert is_conjugate(world, theta())
+    posterior = ConjugateGibbsProposer(theta()).get_proposal_distribution(world)
+    assert isinstance(posterior, dist.Beta)
+    assert posterior.concentration1.item() == 4.0
+    assert posterior.concentration0.item() == 4.0
+
+
+def test_normal_normal_gibbs_step_is_accepted():
+    observations = {x(0): torch.tensor(0.5), x(1): torch.tensor(1.5)}
+    world = World.initialize_world([mu()], observations)
+    proposer = ConjugateGibbsProposer(mu())
+    posterior = proposer.get_proposal_distribution(world)
+    assert torch.isclose(posterior.mean, torch.tensor(8 / 9))
+    assert torch.isclose(posterior.stddev, torch.tensor(4 / 9).sqrt())
+    new_world, accept_log_prob = proposer.propose(world)
+    assert accept_log_prob.item() == 0.0
+    assert new_world[mu()] is not world[mu()]
+
+
+def test_non_conjugate_falls_back_to_mh():
+    world = World.initialize_world([mu()], {y(): torch.tensor(1.0)})
+    assert not is_conjugate(world, mu())
+    proposer = ConjugateGibbsProposer(mu())
+    # the prior is used as the proposal distribution
+    assert (
+        proposer.get_proposal_distribution(world)
+        is world.get_variable(mu()).distribution
+    )
+    _, accept_log_prob = proposer.propose(world)
+    assert accept_log_prob.item() != 0.0
+
+
+def test_non_conjugate_detected_after_proposal():
+    world = World.initialize_world([mu()], {z(): torch.tensor(1.0)})
+    # z looks conjugate in a single world, but its scale changes with mu
+    assert is_conjugate(world, mu())
+    _, accept_log_prob = ConjugateGibbsProposer(mu()).propose(world)
+    assert accept_log_prob.item() != 0.0
+
+
+def test_compositional_inference_uses_gibbs():
+    observations = {x(0): torch.tensor(0.5), x(1): torch.tensor(1.5)}
+    compositional = bm.CompositionalInference()
+    world = World.initialize_world([mu()], observations)
+    proposers = compositional.get_proposers(world, world.latent_nodes, 0)
+    assert len(proposers) == 1
+    assert isinstance(proposers[0], ConjugateGibbsProposer)
+
+    samples = compositional.infer([mu()], observations, num_samples=500, num_chains=1)
+    assert abs(samples[mu()].mean().item() - 8 / 9) < 0.2
@@ -0,0 +1,126 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+#
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+
+import beanmachine.ppl as bm
+import torch
+import torch.distributions as dist
+from beanmachine.ppl.inference.proposer.enumerative_gibbs_proposer import (
+    EnumerativeGibbsProposer,
+)
+from beanmachine.ppl.world import World
+
+
+mus = torch.tensor([-2.0, 0.0, 2.0])
+
+
+@bm.random_variable
+def z():
+    return dist.Categorical(torch.tensor([0.2, 0.3, 0.5]))
+
+
+@bm.random_variable
+def x():
+    return dist.Normal(mus[z()], 1.0)
+
+
+@bm.random_variable
+def x_item():
+    # does not broadcast over a batch of values of z
+    return dist.Normal(mus[z().item()], 1.0)
+
+
+@bm.random_variable
+def x_sum():
+    # reduces over a batch of values of z, which has as many candidates as mus has
+    # elements
+    return dist.Normal((mus + z()).sum(), 1.0)
+
+
+@bm.random_variable
+def a():
+    return dist.Bernoulli(0.5)
+
+
+@bm.random_variable
+def b():
+    return dist.Bernoulli(torch.tensor([0.1, 0.9])[a().long()])
+
+
+@bm.random_variable
+def c():
+    return dist.Normal(a() + b(), 0.5)
+
+
+def _exact_conditional(observation):
+    log_prior = torch.tensor([0.2, 0.3, 0.5]).log()
+    log_likelihood = dist.Normal(mus, 1.0).log_prob(observation)
+    return (log_prior + log_likelihood).softmax(-1)
+
+
+def test_enumerative_gibbs_scores():
+    world = World.initialize_world([z()], {x(): torch.tensor(1.0)})
+    proposer = EnumerativeGibbsProposer([z()])
+    candidates = proposer._candidates(world)
+    # all candidates are scored in a single evaluation of the world
+    scores = proposer._batched_scores(world, candidates)
+    assert scores is not None
+    assert torch.allclose(scores.softmax(-1), _exact_conditional(1.0))
+    new_world, accept_log_prob = proposer.propose(world)
+    assert accept_log_prob.item() == 0.0
+    assert new_world[z()] in candidates[0]
+
+
+def test_enumerative_gibbs_scores_without_broadcasting():
+    world = World.initialize_world([z()], {x_item(): torch.tensor(1.0)})
+    proposer = EnumerativeGibbsProposer([z()])
+    candidates = proposer._candidates(world)
+    assert proposer._batched_scores(world, candidates) is None
+    scores, is_static = proposer._scores(world, candidates)
+    assert is_static
+    assert torch.allclose(scores.softmax(-1), _exact_conditional(1.0))
+
+
+def test_enumerative_gibbs_scores_with_reduction():
+    world = World.initialize_world([z()], {x_sum(): torch.tensor(1.0)})
+    proposer = EnumerativeGibbsProposer([z()])
+    candidates = proposer._candidates(world)
+    assert proposer._batched_scores(world, candidates) is None
+    scores, is_static = proposer._scores(world, candidates)
+    assert is_static
+    log_prior = torch.tensor([0.2, 0.3, 0.5]).log()
+    log_likelihood = dist.Normal(mus.sum() + 3 * candidates[0], 1.0).log_prob(
+        torch.tensor(1.0)
+    )
+    assert torch.allclose(scores.softmax(-1), (log_prior + log_likelihood).softmax(-1))
+
+
+def test_block_enumerative_gibbs():
+    world = World.initialize_world([a(), b()], {c(): torch.tensor(2.0)})
+    proposer = EnumerativeGibbsProposer([a(), b()])
+    candidates = proposer._candidates(world)
+    assert len(candidates[0]) == 4
+    scores, is_static = proposer._scores(world, candidates)
+    assert is_static
+    expected = torch.stack(
+        [
+            dist.Bernoulli(0.5).log_prob(va)
+            + dist.Bernoulli(torch.tensor([0.1, 0.9])[va.long()]).log_prob(vb)
+            + dist.Normal(va + vb, 0.5).log_prob(torch.tensor(2.0))
+            for va, vb in zip(*candidates)
+        ]
+    )
+    assert torch.allclose(scores.softmax(-1), expected.softmax(-1))
+    _, accept_log_prob = proposer.propose(world)
+    assert accept_log_prob.item() == 0.0
+
+
+def test_block_enumerative_gibbs_inference():
+    compositional = bm.CompositionalInference({(a, b): bm.GlobalEnumerativeGibbs()})
+    samples = compositional.infer(
+        [a(), b()], {c(): torch.tensor(2.0)}, num_samples=200, num_chains=1
+    )
+    # a and b are almost surely both 1 given c
+    assert samples[a()].mean() > 0.8
+    assert samples[b()].mean() > 0.8
@@ -38,10 +38,8 @@ def test_potential_grads(hmc):
     pe, pe_grad = hmc._potential_grads(hmc._positions)
     assert isinstance(pe, torch.Tensor)
     assert pe.numel() == 1
-    for node, z in hmc._positions.items():
-        assert node in pe_grad
-        assert isinstance(pe_grad[node], torch.Tensor)
-        assert pe_grad[node].shape == z.shape
+    assert isinstance(pe_grad, torch.Tensor)
+    assert pe_grad.shape == hmc._positions.shape
 
 
 def test_kinetic_grads(hmc):
@@ -50,10 +48,8 @@ def test_kinetic_grads(hmc):
     assert isinstance(ke, torch.Tensor)
     assert ke.numel() == 1
     ke_grad = hmc._kinetic_grads(momentums, hmc._mass_inv)
-    for node, z in hmc._positions.items():
-        assert node in ke_grad
-        assert isinstance(ke_grad[node], torch.Tensor)
-        assert len(ke_grad[node]) == z.numel()
+    assert isinstance(ke_grad, torch.Tensor)
+    assert ke_grad.shape == hmc._positions.shape
 
 
 def test_leapfrog_step(hmc):
@@ -62,8 +58,8 @@ def test_leapfrog_step(hmc):
     new_positions, new_momentums, pe, pe_grad = hmc._leapfrog_step(
         hmc._positions, momentums, step_size, hmc._mass_inv
     )
-    assert momentums == new_momentums
-    assert new_positions == hmc._positions
+    assert torch.allclose(momentums, new_momentums)
+    assert torch.allclose(new_positions, hmc._positions)
 
 
 @pytest.mark.parametrize(
@@ -85,3 +81,84 @@ def test_step_size_exception(algorithm):
             num_samples=20,
             num_chains=1,
         )
+
+
+@pytest.mark.parametrize(
+    "algorithm",
+    [
+        bm.GlobalNoUTurnSampler(),
+        bm.GlobalHamiltonianMonteCarlo(trajectory_length=1.0),
+    ],
+)
+def test_vectorized_chains(algorithm):
+    queries = [foo()]
+    observations = {bar(): torch.tensor(0.5)}
+    num_chains, num_samples = 3, 20
+    samples = algorithm.infer(
+        queries,
+        observations,
+        num_samples=num_samples,
+        num_adaptive_samples=num_samples,
+        num_chains=num_chains,
+        vectorize_chains=True,
+        record_log_likelihoods=True,
+    )
+    foo_samples = samples[foo()]
+    assert foo_samples.shape == (num_chains, num_samples)
+    assert ((foo_samples > 0.0) & (foo_samples < 1.0)).all()
+    # chains are independent of each other
+    assert not torch.allclose(foo_samples[0], foo_samples[1])
+    assert samples.log_likelihoods[bar()].shape == (num_chains, num_samples)
+
+
+@bm.random_variable
+def baz():
+    return dist.Normal(torch.zeros(3), 1.0)
+
+
+def test_vectorized_chains_unbatched_observation():
+    # the observation does not depend on the latent variables, and its size happens
+    # to match the number of chains
+    observations = {bar(): torch.tensor(0.5), baz(): torch.ones(3)}
+    samples = bm.GlobalNoUTurnSampler().infer(
+        [foo()],
+        observations,
+        num_samples=5,
+        num_adaptive_samples=5,
+        num_chains=3,
+        vectorize_chains=True,
+        record_log_likelihoods=True,
+    )
+    expected = dist.Normal(torch.zeros(3), 1.0).log_prob(torch.ones(3)).sum()
+    assert torch.allclose(samples.log_likelihoods[baz()], expected)
+
+
+def test_vectorized_chains_not_supported():
+    with pytest.raises(NotImplementedError):
+        bm.SingleSiteAncestralMetropolisHastings().infer(
+            [foo()],
+            {bar(): torch.tensor(0.5)},
+            num_samples=10,
+            num_chains=2,
+            vectorize_chains=True,
+        )
+
+
+def test_full_mass_matrix(world):
+    hmc = HMCProposer(
+        world,
+        world.latent_nodes,
+        10,
+        trajectory_length=1.0,
+        full_mass_matrix=True,
+    )
+    matrix_size = hmc._positions.numel()
+    momentums = hmc._initialize_momentums(hmc._positions)
+    assert hmc._mass_inv.shape == (matrix_size, matrix_size)
+    ke = hmc._kinetic_energy(momentums, hmc._mass_inv)
+    assert torch.allclose(ke, (momentums * momentums).sum() / 2)
+
+    mass_inv = torch.tensor([[2.0, 0.5], [0.5, 1.0]])
+    momentums = torch.tensor([1.0, -1.0])
+    ke_grad = hmc._kinetic_grads(momentums, mass_inv)
+    assert torch.allclose(ke_grad, mass_inv @ momentums)
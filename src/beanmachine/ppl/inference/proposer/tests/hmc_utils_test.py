@@ -11,6 +11,7 @@ import pytest
 import torch
 import torch.distributions as dist
 from beanmachine.ppl.inference.proposer.hmc_utils import (
+    DictToVecConverter,
     DualAverageAdapter,
     MassMatrixAdapter,
     RealSpaceTransform,
@@ -93,18 +94,19 @@ def test_mass_matrix_adapter():
     model = SampleModel()
     world = World()
     world.call(model.bar())
-    positions = RealSpaceTransform(world, world.latent_nodes)(dict(world))
+    positions_dict = RealSpaceTransform(world, world.latent_nodes)(
+        {node: world[node] for node in world.latent_nodes}
+    )
+    positions = DictToVecConverter(positions_dict).to_vec(positions_dict)
     mass_matrix_adapter = MassMatrixAdapter()
     momentums = mass_matrix_adapter.initialize_momentums(positions)
-    for node, z in positions.items():
-        assert node in momentums
-        assert isinstance(momentums[node], torch.Tensor)
-        assert len(momentums[node]) == z.numel()
-        # after seeing the nodes for the first time, the adapter should've initialized
-        # the mass matrix and the distribution to generate momentum
-        assert node in mass_matrix_adapter.mass_inv
-        assert node in mass_matrix_adapter.momentum_dists
-    mass_inv_old = mass_matrix_adapter.mass_inv.copy()
+    assert isinstance(momentums, torch.Tensor)
+    assert momentums.shape == positions.shape
+    # after seeing the positions for the first time, the adapter should've initialized
+    # the mass matrix and the distribution to generate momentum
+    assert mass_matrix_adapter.mass_inv is not None
+    assert mass_matrix_adapter.momentum_dist is not None
+    mass_inv_old = mass_matrix_adapter.mass_inv.clone()
     mass_matrix_adapter.step(positions)
 
     with warnings.catch_warnings():
@@ -112,8 +114,25 @@ def test_mass_matrix_adapter():
         mass_matrix_adapter.finalize()
 
     # mass matrix adapter has seen less than 2 samples, so mass_inv is not updated
-    for node in mass_inv_old:
-        assert torch.allclose(mass_inv_old[node], mass_matrix_adapter.mass_inv[node])
+    assert torch.allclose(mass_inv_old, mass_matrix_adapter.mass_inv)
+
+
+def test_dict_to_vec_conversion():
+    d = {"a": torch.rand(2, 3), "b": torch.rand(()), "c": torch.rand(4)}
+    converter = DictToVecConverter(d)
+    v = converter.to_vec(d)
+    assert v.shape == (11,)
+    d2 = converter.to_dict(v)
+    assert d2.keys() == d.keys()
+    for key in d:
+        assert torch.equal(d[key], d2[key])
+
+    # leading batch dimensions are preserved
+    batched = {key: torch.stack([val, val + 1.0]) for key, val in d.items()}
+    batched_converter = DictToVecConverter(batched, torch.Size([2]))
+    batched_v = batched_converter.to_vec(batched)
+    assert batched_v.shape == (2, 11)
+    assert torch.allclose(batched_v[1], v + 1.0)
 
 
 def test_diagonal_welford_covariance():
@@ -149,3 +168,27 @@ def test_welford_exception():
     welford.step(torch.rand(5))
     with pytest.raises(RuntimeError):  # number of samples is too small
         welford.finalize()
+
+
+def test_dense_mass_matrix_adapter():
+    samples = dist.MultivariateNormal(
+        loc=torch.zeros(4), scale_tril=torch.randn(4, 4).tril().abs() + torch.eye(4)
+    ).sample((100,))
+    # elements 0 and 1 form a block, 2 and 3 are in their own blocks
+    mass_matrix_adapter = MassMatrixAdapter(
+        full_mass_matrix=True, block_ids=torch.tensor([4, 4, 2, 3])
+    )
+    momentums = mass_matrix_adapter.initialize_momentums(samples[0])
+    assert momentums.shape == (4,)
+    assert torch.allclose(mass_matrix_adapter.mass_inv, torch.eye(4))
+    mass_matrix_adapter.step(samples)
+    mass_matrix_adapter.finalize()
+
+    mass_inv = mass_matrix_adapter.mass_inv
+    assert mass_inv.shape == (4, 4)
+    assert mass_inv[0, 1] != 0.0
+    assert torch.allclose(mass_inv[0, 1], mass_inv[1, 0])
+    # correlation across blocks is dropped
+    assert mass_inv[0, 2] == 0.0
+    assert mass_inv[2, 3] == 0.0
+    assert mass_matrix_adapter.initialize_momentums(samples[0]).shape == (4,)
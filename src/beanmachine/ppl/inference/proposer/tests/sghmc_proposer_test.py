@@ -0,0 +1,80 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+#
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+
+import beanmachine.ppl as bm
+import pytest
+import torch
+import torch.distributions as dist
+from beanmachine.ppl.inference.proposer.sghmc_proposer import SGHMCProposer
+from beanmachine.ppl.world import World
+
+
+num_observations = 500
+
+
+@bm.random_variable
+def mu():
+    return dist.Normal(0.0, 10.0)
+
+
+@bm.random_variable
+def y(i):
+    return dist.Normal(mu(), 1.0)
+
+
+@pytest.fixture
+def observations():
+    data = dist.Normal(3.0, 1.0).sample((num_observations,))
+    return {y(i): data[i] for i in range(num_observations)}
+
+
+def test_minibatch_scale(observations):
+    world = World.initialize_world([mu()], observations)
+    proposer = SGHMCProposer(world, {mu()}, 1e-4, minibatch_sizes={y: 50})
+    minibatch = proposer._minibatch()
+    # the minibatch is drawn with replacement
+    assert len(minibatch) <= 50
+    assert sum(minibatch.values()) == pytest.approx(num_observations)
+
+
+def test_full_batch_log_prob(observations):
+    world = World.initialize_world([mu()], observations)
+    # families that are not subsampled are always used in full
+    proposer = SGHMCProposer(world, {mu()}, 1e-4)
+    assert len(proposer._minibatch()) == num_observations
+    positions = proposer._positions
+    expected = world.log_prob()
+    assert torch.isclose(proposer._log_prob_estimate(positions), expected)
+
+
+def test_sghmc_propose(observations):
+    world = World.initialize_world([mu()], observations)
+    proposer = SGHMCProposer(world, {mu()}, 1e-4, minibatch_sizes={y: 50})
+    new_world, accept_log_prob = proposer.propose(world)
+    assert accept_log_prob.item() == 0.0
+    assert new_world[mu()] != world[mu()]
+    # the observations are only re-run when they are used
+    assert y(0) not in new_world
+    new_world.call(y(0))
+    assert new_world.get_variable(y(0)).distribution.loc == new_world[mu()]
+    with pytest.raises(ValueError):
+        SGHMCProposer(world, {mu()}, 1e-4, friction=0.0)
+
+
+@pytest.mark.parametrize(
+    "algorithm",
+    [
+        bm.StochasticGradientLangevinDynamics(5e-4, minibatch_sizes={y: 50}),
+        bm.StochasticGradientHamiltonianMonteCarlo(
+            1e-5, friction=0.1, minibatch_sizes={y: 50}
+        ),
+    ],
+)
+def test_sgmcmc_posterior_mean(algorithm, observations):
+    samples = algorithm.infer(
+        [mu()], observations, num_samples=500, num_adaptive_samples=0, num_chains=1
+    )
+    data_mean = torch.stack(list(observations.values())).mean()
+    assert samples[mu()][0, 200:].mean() == pytest.approx(data_mean, abs=0.2)
@@ -0,0 +1,164 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+#
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+
+from abc import ABCMeta, abstractmethod
+from typing import List, Optional, Sequence
+
+import torch
+from beanmachine.ppl.inference.proposer.hmc_utils import WelfordCovariance
+
+
+def _as_float(value: torch.Tensor) -> torch.Tensor:
+    value = value.detach()
+    if not torch.is_floating_point(value):
+        value = value.to(torch.get_default_dtype())
+    return value
+
+
+class OnlineReducer(metaclass=ABCMeta):
+    """
+    Abstract class for the summary statistics that are computed on the fly during
+    inference, one draw at a time, so that they can be obtained without keeping the
+    draws in memory. The reducers that are passed to ``infer`` are templates that are
+    copied for every query in every chain, and are only updated with the draws that
+    are collected after adaptation.
+    """
+
+    @abstractmethod
+    def update(self, value: torch.Tensor) -> None:
+        """Updates the statistic with the value of the query in a new draw."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def finalize(self) -> torch.Tensor:
+        """Returns the statistic of all of the values that have been seen so far."""
+        raise NotImplementedError
+
+
+class RunningMean(OnlineReducer):
+    """The elementwise mean of the draws."""
+
+    def __init__(self):
+        self._welford = WelfordCovariance(diagonal=True)
+
+    def update(self, value: torch.Tensor) -> None:
+        self._welford.step(_as_float(value))
+
+    def finalize(self) -> torch.Tensor:
+        return torch.as_tensor(self._welford.mean)
+
+
+class RunningVariance(OnlineReducer):
+    """The elementwise (unbiased) variance of the draws."""
+
+    def __init__(self):
+        self._welford = WelfordCovariance(diagonal=True)
+
+    def update(self, value: torch.Tensor) -> None:
+        self._welford.step(_as_float(value))
+
+    def finalize(self) -> torch.Tensor:
+        return self._welford.finalize(regularize=False)
+
+
+class RunningQuantiles(OnlineReducer):
+    """
+    Approximate elementwise quantiles of the draws, estimated from a fixed size
+    uniform subsample of the draws that is maintained with reservoir sampling. The
+    result has a leading dimension with one entry per quantile.
+
+    Args:
+        quantiles: The quantiles to estimate, each between 0 and 1.
+        capacity: The maximum number of draws to keep in the reservoir.
+    """
+
+    def __init__(
+        self,
+        quantiles: Sequence[float] = (0.025, 0.25, 0.5, 0.75, 0.975),
+        capacity: int = 1000,
+    ):
+        self.quantiles = list(quantiles)
+        self.capacity = capacity
+        self._reservoir: Optional[torch.Tensor] = None
+        self._count = 0
+
+    def update(self, value: torch.Tensor) -> None:
+        value = _as_float(value)
+        if self._reservoir is None:
+            self._reservoir = value.new_empty((self.capacity,) + value.shape)
+        if self._count < self.capacity:
+            self._reservoir[self._count] = value
+        else:
+            # replace a random draw in the reservoir with probability capacity / count
+            idx = int(torch.randint(self._count + 1, ()))
+            if idx < self.capacity:
+                self._reservoir[idx] = value
+        self._count += 1
+
+    def finalize(self) -> torch.Tensor:
+        if self._reservoir is None:
+            raise RuntimeError("Quantiles can not be estimated without any samples")
+        samples = self._reservoir[: min(self._count, self.capacity)]
+        quantiles = torch.tensor(self.quantiles, dtype=samples.dtype)
+        return torch.quantile(samples, quantiles, dim=0)
+
+
+class RunningEffectiveSampleSize(OnlineReducer):
+    """
+    An elementwise estimate of the effective sample size of the draws, computed with
+    the method of batch means. The draws are grouped into consecutive batches, and
+    whenever the number of batches reaches ``max_batches`` the adjacent batches are
+    merged, so that the memory usage is constant and the batch size grows with the
+    length of the chain.
+
+    Reference:
+        [1] James M. Flegal and Galin L. Jones. "Batch Means and Spectral Variance
+        Estimators in Markov Chain Monte Carlo" (2010).
+
+    Args:
+        max_batches: The maximum number of batches to keep. Must be even.
+    """
+
+    def __init__(self, max_batches: int = 64):
+        if max_batches < 2 or max_batches % 2 != 0:
+            raise ValueError("max_batches should be a positive even number")
+        self.max_batches = max_batches
+        self._welford = WelfordCovariance(diagonal=True)
+        self._batch_size = 1
+        self._batch_means: List[torch.Tensor] = []
+        self._current_sum: Optional[torch.Tensor] = None
+        self._current_count = 0
+
+    def update(self, value: torch.Tensor) -> None:
+        value = _as_float(value)
+        self._welford.step(value)
+        if self._current_sum is None:
+            self._current_sum = value.clone()
+        else:
+            self._current_sum += value
+        self._current_count += 1
+        if self._current_count == self._batch_size:
+            self._batch_means.append(self._current_sum / self._batch_size)
+            self._current_sum = None
+            self._current_count = 0
+            if len(self._batch_means) == self.max_batches:
+                self._batch_means = [
+                    (first + second) / 2
+                    for first, second in zip(
+                        self._batch_means[::2], self._batch_means[1::2]
+                    )
+                ]
+                self._batch_size *= 2
+
+    def finalize(self) -> torch.Tensor:
+        variance = self._welford.finalize(regularize=False)
+        num_samples = self._welford.count
+        if len(self._batch_means) < 2:
+            raise RuntimeError(
+                "Number of samples is too small to estimate the effective sample size"
+            )
+        batch_means_variance = torch.stack(self._batch_means).var(dim=0)
+        asymptotic_variance = self._batch_size * batch_means_variance
+        return num_samples * variance / asymptotic_variance
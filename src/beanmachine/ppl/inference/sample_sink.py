@@ -0,0 +1,211 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+#
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+
+from __future__ import annotations
+
+import os
+from abc import ABCMeta, abstractmethod
+from typing import List, Optional
+
+import numpy as np
+import torch
+
+
+_NO_DRAWS_MESSAGE = (
+    "No draws were appended to the sinks of the chains, so the shapes of the "
+    "queries are unknown. Run inference with at least one sample."
+)
+
+
+class SampleSink(metaclass=ABCMeta):
+    """
+    Abstract class for the destinations that samples are written to during inference.
+    The sink that is passed to ``infer`` serves as a template: each chain gets its own
+    sink from ``for_chain``, appends the values of the queries to it at every
+    iteration and closes it at the end of the chain. The chain sinks are then merged
+    by the template into a single Tensor per query. Sinks should be picklable, so that
+    they can be used with chains that run in parallel.
+    """
+
+    @abstractmethod
+    def for_chain(self, chain_id: int, num_draws: int) -> SampleSink:
+        """
+        Returns a new sink that stores the samples of a single chain.
+
+        Args:
+            chain_id: The index of the chain.
+            num_draws: The total number of draws (including adaptive samples) that
+                will be appended to the sink.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def append(self, values: List[torch.Tensor]) -> None:
+        """Stores a single draw, given as a list with one value per query."""
+        raise NotImplementedError
+
+    def close(self) -> None:  # noqa: B027
+        """Called at the end of the chain, after the last draw has been appended."""
+        # Sinks that write their draws as they are appended have nothing to finish
+        # up, so this is not abstract.
+        pass
+
+    @abstractmethod
+    def merge(self, chain_sinks: List[SampleSink]) -> List[torch.Tensor]:
+        """
+        Merges the (closed) sinks of all chains and returns one Tensor of shape
+        (num_chains, num_draws, *value_shape) for each query.
+        """
+        raise NotImplementedError
+
+
+class InMemorySampleSink(SampleSink):
+    """
+    The default sink, which keeps all of the samples in memory and stacks them at the
+    end of the chain.
+    """
+
+    def __init__(self):
+        self._samples: List[List[torch.Tensor]] = []
+        self._stacked_samples: Optional[List[torch.Tensor]] = None
+
+    def for_chain(self, chain_id: int, num_draws: int) -> InMemorySampleSink:
+        return InMemorySampleSink()
+
+    def append(self, values: List[torch.Tensor]) -> None:
+        if not self._samples:
+            self._samples = [[] for _ in values]
+        for samples, value in zip(self._samples, values):
+            samples.append(value)
+
+    def close(self) -> None:
+        self._stacked_samples = [torch.stack(val) for val in self._samples]
+        self._samples = []
+
+    def merge(self, chain_sinks: List[SampleSink]) -> List[torch.Tensor]:
+        chain_samples = [sink._stacked_samples for sink in chain_sinks]
+        if not any(chain_samples):
+            raise ValueError(_NO_DRAWS_MESSAGE)
+        return [torch.stack(query_samples) for query_samples in zip(*chain_samples)]
+
+
+class DiscardSampleSink(SampleSink):
+    """
+    A sink that discards all of the samples, which is useful when only the online
+    summaries of the queries are needed. The returned ``MonteCarloSamples`` contains
+    zero draws for every query.
+    """
+
+    def __init__(self):
+        self._example_values: Optional[List[torch.Tensor]] = None
+
+    def for_chain(self, chain_id: int, num_draws: int) -> DiscardSampleSink:
+        return DiscardSampleSink()
+
+    def append(self, values: List[torch.Tensor]) -> None:
+        if self._example_values is None:
+            # keep an empty tensor per query to record its shape and dtype
+            self._example_values = [value.detach()[None][:0] for value in values]
+
+    def merge(self, chain_sinks: List[SampleSink]) -> List[torch.Tensor]:
+        example_values = next(
+            (
+                sink._example_values
+                for sink in chain_sinks
+                if sink._example_values is not None
+            ),
+            None,
+        )
+        if example_values is None:
+            raise ValueError(_NO_DRAWS_MESSAGE)
+        return [
+            value.expand((len(chain_sinks),) + value.shape) for value in example_values
+        ]
+
+
+class NpySampleSink(SampleSink):
+    """
+    A sink that streams the samples into memory-mapped ``.npy`` files on disk, so that
+    the memory usage of inference does not grow with the number of samples. Each chain
+    writes to its own directory, and the chains are merged into a single
+    ``query_<index>.npy`` file per query, which is opened lazily (with ``mmap``) by the
+    returned ``MonteCarloSamples``.
+
+    Args:
+        directory: Directory to store the samples in. It will be created if it does
+            not exist already.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self._num_draws = 0
+        self._num_appended = 0
+        self._num_queries = 0
+        self._arrays: Optional[List[np.memmap]] = None
+
+    def _query_path(self, directory: str, query_idx: int) -> str:
+        return os.path.join(directory, f"query_{query_idx}.npy")
+
+    def for_chain(self, chain_id: int, num_draws: int) -> NpySampleSink:
+        sink = NpySampleSink(os.path.join(self.directory, f"chain_{chain_id}"))
+        sink._num_draws = num_draws
+        return sink
+
+    def append(self, values: List[torch.Tensor]) -> None:
+        if self._arrays is None:
+            # allocate the files once the shapes and dtypes of the queries are known
+            os.makedirs(self.directory, exist_ok=True)
+            self._num_queries = len(values)
+            self._arrays = []
+            for idx, value in enumerate(values):
+                value = value.detach().cpu().numpy()
+                self._arrays.append(
+                    np.lib.format.open_memmap(
+                        self._query_path(self.directory, idx),
+                        mode="w+",
+                        dtype=value.dtype,
+                        shape=(self._num_draws,) + value.shape,
+                    )
+                )
+        for array, value in zip(self._arrays, values):
+            array[self._num_appended] = value.detach().cpu().numpy()
+        self._num_appended += 1
+
+    def close(self) -> None:
+        if self._arrays is not None:
+            for array in self._arrays:
+                array.flush()
+        # drop the references to the memory maps so that only the paths are pickled
+        self._arrays = None
+
+    def merge(self, chain_sinks: List[SampleSink]) -> List[torch.Tensor]:
+        if chain_sinks[0]._num_queries == 0:
+            raise ValueError(_NO_DRAWS_MESSAGE)
+        os.makedirs(self.directory, exist_ok=True)
+        results = []
+        for idx in range(chain_sinks[0]._num_queries):
+            chain_paths = [
+                self._query_path(sink.directory, idx) for sink in chain_sinks
+            ]
+            first_chain = np.load(chain_paths[0], mmap_mode="r")
+            path = self._query_path(self.directory, idx)
+            merged = np.lib.format.open_memmap(
+                path,
+                mode="w+",
+                dtype=first_chain.dtype,
+                shape=(len(chain_paths),) + first_chain.shape,
+            )
+            # copy one chain at a time to bound the memory usage
+            for chain, chain_path in enumerate(chain_paths):
+                merged[chain] = np.load(chain_path, mmap_mode="r")
+                os.remove(chain_path)
+            merged.flush()
+            del merged
+            # copy-on-write mode gives a writable array without modifying the file
+            results.append(torch.from_numpy(np.load(path, mmap_mode="c")))
+        for sink in chain_sinks:
+            if os.path.isdir(sink.directory) and not os.listdir(sink.directory):
+                os.rmdir(sink.directory)
+        return results
@@ -0,0 +1,104 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+#
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+
+from typing import Callable, Dict, List, Optional, Set
+
+from beanmachine.ppl.inference.base_inference import BaseInference
+from beanmachine.ppl.inference.proposer.base_proposer import BaseProposer
+from beanmachine.ppl.inference.proposer.sghmc_proposer import SGHMCProposer
+from beanmachine.ppl.model.rv_identifier import RVIdentifier
+from beanmachine.ppl.world import World
+
+
+class StochasticGradientHamiltonianMonteCarlo(BaseInference):
+    """
+    Stochastic Gradient Hamiltonian Monte Carlo [1] sampler. This global sampler
+    blocks all of the target random_variables in the World together and estimates the
+    gradient of their log prob from a random minibatch of the observations at every
+    step, so that it scales to models with a large number of observations. Since
+    there is no Metropolis-Hastings correction, the samples are only asymptotically
+    exact as the learning rate goes to zero.
+
+    Example::
+
+        StochasticGradientHamiltonianMonteCarlo(
+            learning_rate=1e-4, minibatch_sizes={model.y: 100}
+        )
+
+    [1] Chen, Fox and Guestrin. `Stochastic Gradient Hamiltonian Monte Carlo`.
+
+    Args:
+        learning_rate (float): Learning rate (i.e. squared step size) of the dynamics.
+        friction (float): Friction of the dynamics, between 0 and 1. Defaults to 0.1.
+        minibatch_sizes (dict, Optional): The number of observations to subsample at
+            every step for each random variable family. The observations of the
+            families that are not listed are always used in full.
+        num_steps (int): The number of updates per sample. Defaults to 1.
+    """
+
+    def __init__(
+        self,
+        learning_rate: float,
+        friction: float = 0.1,
+        minibatch_sizes: Optional[Dict[Callable, int]] = None,
+        num_steps: int = 1,
+    ):
+        self.learning_rate = learning_rate
+        self.friction = friction
+        self.minibatch_sizes = minibatch_sizes
+        self.num_steps = num_steps
+        self._proposer = None
+
+    def get_proposers(
+        self,
+        world: World,
+        target_rvs: Set[RVIdentifier],
+        num_adaptive_sample: int,
+    ) -> List[BaseProposer]:
+        if self._proposer is None:
+            self._proposer = SGHMCProposer(
+                world,
+                target_rvs,
+                self.learning_rate,
+                self.friction,
+                self.minibatch_sizes,
+                self.num_steps,
+            )
+        return [self._proposer]
+
+
+class StochasticGradientLangevinDynamics(StochasticGradientHamiltonianMonteCarlo):
+    """
+    Stochastic Gradient Langevin Dynamics [1] sampler. This global sampler blocks all
+    of the target random_variables in the World together and moves them along the
+    gradient of their log prob, estimated from a random minibatch of the
+    observations, plus Gaussian noise. Since there is no Metropolis-Hastings
+    correction, the samples are only asymptotically exact as the step size goes to
+    zero.
+
+    Example::
+
+        StochasticGradientLangevinDynamics(
+            step_size=1e-4, minibatch_sizes={model.y: 100}
+        )
+
+    [1] Welling and Teh. `Bayesian Learning via Stochastic Gradient Langevin Dynamics`.
+
+    Args:
+        step_size (float): Step size of the Langevin dynamics.
+        minibatch_sizes (dict, Optional): The number of observations to subsample at
+            every step for each random variable family. The observations of the
+            families that are not listed are always used in full.
+        num_steps (int): The number of updates per sample. Defaults to 1.
+    """
+
+    def __init__(
+        self,
+        step_size: float,
+        minibatch_sizes: Optional[Dict[Callable, int]] = None,
+        num_steps: int = 1,
+    ):
+        # SGHMC with a unit friction does not carry any momentum over between steps
+        super().__init__(step_size / 2, 1.0, minibatch_sizes, num_steps)
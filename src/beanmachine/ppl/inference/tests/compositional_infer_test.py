@@ -7,17 +7,19 @@ from collections import Counter
 from unittest.mock import patch
 
 import beanmachine.ppl as bm
-import pytest
 import torch
 import torch.distributions as dist
+from beanmachine.ppl.inference.proposer.conjugate_gibbs_proposer import (
+    ConjugateGibbsProposer,
+)
+from beanmachine.ppl.inference.proposer.enumerative_gibbs_proposer import (
+    EnumerativeGibbsProposer,
+)
 from beanmachine.ppl.inference.proposer.nuts_proposer import NUTSProposer
 from beanmachine.ppl.inference.proposer.sequential_proposer import SequentialProposer
 from beanmachine.ppl.inference.proposer.single_site_ancestral_proposer import (
     SingleSiteAncestralProposer,
 )
-from beanmachine.ppl.inference.proposer.single_site_uniform_proposer import (
-    SingleSiteUniformProposer,
-)
 from beanmachine.ppl.world import World
 
 
@@ -92,10 +94,14 @@ def test_inference_config():
     # return value
     assert isinstance(proposers[0], NUTSProposer)
     assert proposers[0]._target_rvs == {model.foo(0), model.foo(1)}
-    # the rest of nodes are updated by default proposers (uniform proposer for bernoulli)
-    assert isinstance(proposers[1], SingleSiteUniformProposer)
-    assert isinstance(proposers[2], SingleSiteUniformProposer)
-    assert {proposers[1].node, proposers[2].node} == {model.bar(0), model.bar(1)}
+    # the rest of nodes are updated by default proposers (enumerative Gibbs proposer
+    # for bernoulli)
+    assert isinstance(proposers[1], EnumerativeGibbsProposer)
+    assert isinstance(proposers[2], EnumerativeGibbsProposer)
+    assert {*proposers[1]._target_rvs, *proposers[2]._target_rvs} == {
+        model.bar(0),
+        model.bar(1),
+    }
 
     # test overriding default kwarg
     compositional = bm.CompositionalInference(
@@ -225,16 +231,17 @@ def test_block_inference_changing_support():
         {(model.K, model.component): bm.SingleSiteAncestralMetropolisHastings()}
     )
     sampler = compositional.sampler(queries, {})
-    with pytest.raises(KeyError):
-        world = next(sampler)
-        # since the support of poisson is all natural numbers, it's possible that we
-        # sample a new alue of K that's 1 greater than current one....
-        K_val = world.call(model.K())
-        new_world = world.replace({model.K(): K_val + 1})
-        # Since NUTS only supports static model, this is going to raise an error
-        # TODO: this error is thrown in hmc_utils when fetching
-        # transforms but should be checked earlier in the model
-        sampler.send(new_world)
+    world = next(sampler)
+    # since the support of poisson is all natural numbers, it's possible that we
+    # sample a new alue of K that's 1 greater than current one....
+    K_val = world.call(model.K())
+    new_world = world.replace({model.K(): K_val + 1})
+    # alpha(k) is a conjugate prior of the components, so by default it's updated by
+    # Gibbs sampling instead of NUTS (which only supports static models), and the
+    # change of support is handled without error
+    new_world = sampler.send(new_world)
+    proposers = compositional.get_proposers(new_world, new_world.latent_nodes, 0)
+    assert any(isinstance(proposer, ConjugateGibbsProposer) for proposer in proposers)
 
 
 def test_block_inference_changing_shape():
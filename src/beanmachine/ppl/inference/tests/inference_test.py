@@ -10,6 +10,7 @@ import beanmachine.ppl as bm
 import pytest
 import torch
 import torch.distributions as dist
+from beanmachine.ppl.inference import NpySampleSink
 from beanmachine.ppl.inference.proposer.base_proposer import BaseProposer
 from beanmachine.ppl.world import init_from_prior, World
 
@@ -72,6 +73,49 @@ def test_inference(multiprocess):
     )
 
 
+@pytest.mark.parametrize("multiprocess", [False, True])
+def test_inference_with_npy_sample_sink(tmp_path, multiprocess):
+    if multiprocess and sys.platform.startswith("win"):
+        pytest.skip(
+            "Windows does not support fork-based multiprocessing (which is necessary "
+            "for running parallel inference within pytest."
+        )
+
+    model = SampleModel()
+    queries = [model.foo(), model.baz()]
+    observations = {model.bar(): torch.tensor(0.5)}
+    num_samples = 20
+    num_chains = 2
+    bm.seed(0)
+    samples = bm.SingleSiteAncestralMetropolisHastings().infer(
+        queries,
+        observations,
+        num_samples,
+        num_adaptive_samples=5,
+        num_chains=num_chains,
+        run_in_parallel=multiprocess,
+        mp_context="fork",
+        sample_sink=NpySampleSink(str(tmp_path)),
+    )
+    assert samples[model.foo()].shape == (num_chains, num_samples)
+    assert samples.get_num_samples(include_adapt_steps=True) == num_samples + 5
+    # the chains are merged into one file per query
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["query_0.npy", "query_1.npy"]
+
+    if not multiprocess:
+        # streaming to disk should give the same results as keeping samples in memory
+        bm.seed(0)
+        in_memory_samples = bm.SingleSiteAncestralMetropolisHastings().infer(
+            queries,
+            observations,
+            num_samples,
+            num_adaptive_samples=5,
+            num_chains=num_chains,
+        )
+        for query in queries:
+            assert torch.equal(samples[query], in_memory_samples[query])
+
+
 def test_get_proposers():
     world = World()
     model = SampleModel()
@@ -153,3 +197,55 @@ def test_inference_with_double_dtype(algorithm):
         num_chains=1,
     )
     assert samples[model.foo()].dtype == bar_val.dtype
+
+
+@pytest.mark.parametrize("vectorize_chains", [False, True])
+def test_log_likelihoods(vectorize_chains):
+    @bm.random_variable
+    def mu():
+        return dist.Normal(0.0, 1.0)
+
+    @bm.random_variable
+    def x(i):
+        return dist.Normal(mu(), 1.0)
+
+    @bm.random_variable
+    def y():
+        return dist.Normal(mu(), 2.0)
+
+    # observations of different families are interleaved
+    observations = {x(0): torch.tensor(1.0), y(): torch.tensor(-1.0)}
+    observations.update({x(i): torch.tensor(float(i)) for i in range(1, 4)})
+    hmc = bm.GlobalHamiltonianMonteCarlo(trajectory_length=1.0)
+    samples = hmc.infer(
+        [mu()],
+        observations,
+        num_samples=10,
+        num_adaptive_samples=5,
+        num_chains=2,
+        vectorize_chains=vectorize_chains,
+        record_log_likelihoods=True,
+    )
+    # the log likelihoods are only recorded for the non-adaptive samples
+    assert samples.adaptive_log_likelihoods is None
+    with pytest.raises(ValueError):
+        samples.get_log_likelihoods(y(), include_adapt_steps=True)
+    for node, value in observations.items():
+        expected = samples.get_log_likelihoods(node)
+        assert expected.shape == (2, 10)
+        scale = 2.0 if node == y() else 1.0
+        assert torch.allclose(
+            expected, dist.Normal(samples[mu()], scale).log_prob(value), atol=1e-5
+        )
+        assert torch.equal(samples.get_chain(1).get_log_likelihoods(node), expected[1])
+
+    # the log likelihoods are not recorded by default
+    samples = hmc.infer(
+        [mu()],
+        observations,
+        num_samples=10,
+        num_chains=2,
+        vectorize_chains=vectorize_chains,
+    )
+    assert samples.log_likelihoods is None
+    assert samples[mu()].shape == (2, 10)
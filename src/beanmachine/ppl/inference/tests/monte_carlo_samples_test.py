@@ -187,11 +187,11 @@ class MonteCarloSamplesTest(unittest.TestCase):
             {bar_key: torch.tensor(4.0)},
             num_samples=5,
             num_chains=2,
+            record_log_likelihoods=True,
         )
         self.assertTrue(hasattr(mcs, "log_likelihoods"))
         self.assertIn(bar_key, mcs.log_likelihoods)
         self.assertTrue(hasattr(mcs, "adaptive_log_likelihoods"))
-        self.assertIn(bar_key, mcs.adaptive_log_likelihoods)
         self.assertEqual(
             mcs.get_log_likelihoods(bar_key).shape, torch.zeros(2, 5).shape
         )
@@ -204,16 +204,29 @@ class MonteCarloSamplesTest(unittest.TestCase):
             num_samples=5,
             num_chains=2,
             num_adaptive_samples=3,
+            record_log_likelihoods=True,
         )
 
         self.assertEqual(
             mcs.get_log_likelihoods(bar_key).shape, torch.zeros(2, 5).shape
         )
+        # the log likelihoods of the adaptive samples are not recorded
+        self.assertIsNone(mcs.adaptive_log_likelihoods)
         self.assertEqual(
-            mcs.adaptive_log_likelihoods[bar_key].shape, torch.zeros(2, 3).shape
+            mcs.get_chain(0).get_log_likelihoods(bar_key).shape, torch.zeros(5).shape
+        )
+        with self.assertRaises(ValueError):
+            mcs.get_log_likelihoods(bar_key, True)
+        self.assertIsNone(mcs.get_chain(0).adaptive_log_likelihoods)
+
+        # the adaptive log likelihoods are kept when they are provided
+        mcs = MonteCarloSamples(
+            {foo_key: torch.zeros(2, 8)},
+            num_adaptive_samples=3,
+            logll_results={bar_key: torch.zeros(2, 8)},
         )
         self.assertEqual(
-            mcs.get_chain(0).get_log_likelihoods(bar_key).shape, torch.zeros(5).shape
+            mcs.adaptive_log_likelihoods[bar_key].shape, torch.zeros(2, 3).shape
         )
         self.assertEqual(
             mcs.get_log_likelihoods(bar_key, True).shape, torch.zeros(2, 8).shape
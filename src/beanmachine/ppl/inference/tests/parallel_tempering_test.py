@@ -0,0 +1,99 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+#
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+
+import beanmachine.ppl as bm
+import pytest
+import torch
+import torch.distributions as dist
+
+
+class BimodalModel:
+    @bm.random_variable
+    def mu(self):
+        return dist.Normal(0.0, 10.0)
+
+    @bm.random_variable
+    def y(self, i: int):
+        # the likelihood is symmetric in mu, so the posterior has modes at +3 and -3
+        return dist.Normal(self.mu().abs(), 0.5)
+
+
+@pytest.fixture
+def model():
+    return BimodalModel()
+
+
+@pytest.fixture
+def observations(model):
+    return {model.y(i): torch.tensor(3.0) for i in range(10)}
+
+
+def test_invalid_temperatures():
+    with pytest.raises(ValueError):
+        bm.ParallelTempering(bm.SingleSiteRandomWalk(), inverse_temperatures=[0.5])
+    with pytest.raises(ValueError):
+        bm.ParallelTempering(
+            bm.SingleSiteRandomWalk(), inverse_temperatures=[1.0, 0.1, 0.5]
+        )
+    with pytest.raises(ValueError):
+        bm.ParallelTempering(bm.SingleSiteRandomWalk(), swap_interval=0)
+
+
+def test_replica_exchange_sampler(model, observations):
+    pt = bm.ParallelTempering(bm.SingleSiteRandomWalk(), num_replicas=3)
+    assert pt.inverse_temperatures == [1.0, 0.5, 0.25]
+    sampler = pt.sampler([model.mu()], observations, num_samples=20)
+    worlds = list(sampler)
+    assert len(worlds) == 20
+    # only the cold chain is generated, and its likelihood is not tempered
+    for world in worlds:
+        assert torch.isclose(
+            world.log_prob(),
+            world.log_prob([model.mu()])
+            + sum(
+                dist.Normal(world[model.mu()].abs(), 0.5).log_prob(value)
+                for value in observations.values()
+            ),
+        )
+    # the tempered replicas are stepped alongside the cold chain
+    for replica, beta in zip(sampler._replicas, pt.inverse_temperatures[1:]):
+        replica_world = replica.world
+        assert torch.isclose(
+            replica_world.log_prob(observations.keys()),
+            beta
+            * sum(
+                dist.Normal(replica_world[model.mu()].abs(), 0.5).log_prob(value)
+                for value in observations.values()
+            ),
+        )
+
+
+def test_parallel_tempering_mixes_between_modes(model, observations):
+    pt = bm.ParallelTempering(
+        bm.SingleSiteRandomWalk(step_size=0.5),
+        inverse_temperatures=[1.0, 0.3, 0.1, 0.03, 0.01],
+    )
+    samples = pt.infer(
+        [model.mu()],
+        observations,
+        num_samples=2000,
+        num_adaptive_samples=0,
+        num_chains=1,
+    )
+    mu = samples[model.mu()]
+    # a random walk at the cold temperature alone stays in the mode it starts from
+    assert (mu > 0).float().mean() > 0.1
+    assert (mu < 0).float().mean() > 0.1
+
+
+def test_parallel_tempering_in_subprocesses(model, observations):
+    pt = bm.ParallelTempering(
+        bm.SingleSiteRandomWalk(step_size=0.5),
+        inverse_temperatures=[1.0, 0.1, 0.01],
+        swap_interval=5,
+        run_replicas_in_parallel=True,
+    )
+    samples = pt.infer([model.mu()], observations, num_samples=52, num_chains=1)
+    assert samples[model.mu()].shape == (1, 52)
@@ -3,11 +3,13 @@
 # This source code is licensed under the MIT license found in the
 # LICENSE file in the root directory of this source tree.
 
+import tempfile
 import unittest
 
 import beanmachine.ppl as bm
 import torch
 import torch.distributions as dist
+from beanmachine.ppl.inference import NpySampleSink
 
 
 class PredictiveTest(unittest.TestCase):
@@ -50,6 +52,14 @@ class PredictiveTest(unittest.TestCase):
     def likelihood_2_vec(self, i):
         return dist.Bernoulli(self.prior_2())
 
+    @bm.random_variable
+    def prior_3(self):
+        return dist.Normal(torch.zeros(3), torch.ones(3))
+
+    @bm.random_variable
+    def likelihood_3(self):
+        return dist.Normal(self.prior_3()[0], 1e-3)
+
     @bm.random_variable
     def likelihood_reg(self, x):
         return dist.Normal(self.prior() * x, torch.tensor(1.0))
@@ -100,6 +110,50 @@ class PredictiveTest(unittest.TestCase):
         assert predictives[self.likelihood_dynamic(0)].shape == (2, 10)
         assert predictives[self.likelihood_dynamic(1)].shape == (2, 10)
 
+    def test_posterior_predictive_batched(self):
+        obs = {
+            self.likelihood_i(0): torch.tensor(1.0),
+            self.likelihood_i(1): torch.tensor(0.0),
+        }
+        post_samples = bm.SingleSiteAncestralMetropolisHastings().infer(
+            [self.prior()], obs, num_samples=10, num_chains=2
+        )
+        # the last batch of each chain only has a single draw
+        predictives = bm.simulate(list(obs.keys()), post_samples, batch_size=3)
+        assert predictives[self.likelihood_i(0)].shape == (2, 10)
+        assert predictives[self.likelihood_i(1)].shape == (2, 10)
+        with tempfile.TemporaryDirectory() as directory:
+            predictives = bm.simulate(
+                list(obs.keys()), post_samples, sample_sink=NpySampleSink(directory)
+            )
+            assert predictives[self.likelihood_i(0)].shape == (2, 10)
+
+    def test_posterior_predictive_batched_fallback(self):
+        obs = {
+            self.likelihood_dynamic(0): torch.tensor([0.9]),
+        }
+        post_samples = bm.SingleSiteAncestralMetropolisHastings().infer(
+            [self.prior()], obs, num_samples=20, num_chains=1
+        )
+        # likelihood_i(0) is simulated in a batch, but likelihood_dynamic(0) does not
+        # broadcast, so it is simulated one draw at a time given likelihood_i(0)
+        queries = [self.likelihood_i(0), self.likelihood_dynamic(0)]
+        predictives = bm.simulate(queries, post_samples)
+        flips = predictives[self.likelihood_i(0)]
+        values = predictives[self.likelihood_dynamic(0)]
+        assert flips.shape == (1, 20)
+        assert values.shape == (1, 20)
+        assert ((flips == 1.0) == (values < 2.5)).float().mean() > 0.8
+
+    def test_posterior_predictive_batch_size_of_value(self):
+        # a batch of 3 draws of prior_3 has the shape (3, 3), so indexing it could
+        # also mean indexing the batch dimension
+        draws = torch.randn(3, 3)
+        predictives = bm.simulate([self.likelihood_3()], {self.prior_3(): draws})
+        values = predictives[self.likelihood_3()]
+        assert values.shape == (1, 3)
+        assert torch.allclose(values[0], draws[:, 0], atol=0.01)
+
     def test_predictive_data(self):
         x = torch.randn(4)
         y = torch.randn(4) + 2.0
@@ -165,7 +219,11 @@ class PredictiveTest(unittest.TestCase):
             self.likelihood_2(1): torch.tensor([[0.0, 1.0]]),
         }
         post_samples = bm.SingleSiteAncestralMetropolisHastings().infer(
-            [self.prior_2()], obs, num_samples=10, num_chains=2
+            [self.prior_2()],
+            obs,
+            num_samples=10,
+            num_chains=2,
+            record_log_likelihoods=True,
         )
 
         assert post_samples[self.prior_2()].shape == (2, 10, 1, 2)
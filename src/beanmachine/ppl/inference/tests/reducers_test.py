@@ -0,0 +1,125 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+#
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+
+import beanmachine.ppl as bm
+import pytest
+import torch
+import torch.distributions as dist
+from beanmachine.ppl.inference import (
+    DiscardSampleSink,
+    RunningEffectiveSampleSize,
+    RunningMean,
+    RunningQuantiles,
+    RunningVariance,
+)
+
+
+@bm.random_variable
+def foo():
+    return dist.Normal(torch.zeros(2), 1.0)
+
+
+@bm.random_variable
+def bar():
+    return dist.Normal(foo(), 1.0)
+
+
+def test_running_mean_and_variance():
+    samples = torch.randn(100, 3)
+    mean, variance = RunningMean(), RunningVariance()
+    for sample in samples:
+        mean.update(sample)
+        variance.update(sample)
+    assert torch.allclose(mean.finalize(), samples.mean(dim=0))
+    assert torch.allclose(variance.finalize(), samples.var(dim=0))
+
+
+def test_running_quantiles():
+    samples = torch.randn(50, 3)
+    # the reservoir holds every sample, so the quantiles are exact
+    quantiles = RunningQuantiles([0.1, 0.5, 0.9], capacity=100)
+    for sample in samples:
+        quantiles.update(sample)
+    expected = torch.quantile(samples, torch.tensor([0.1, 0.5, 0.9]), dim=0)
+    assert torch.allclose(quantiles.finalize(), expected)
+
+    quantiles = RunningQuantiles([0.5], capacity=10)
+    for sample in torch.randn(100, 3):
+        quantiles.update(sample)
+    assert quantiles.finalize().shape == (1, 3)
+
+
+def test_running_effective_sample_size():
+    ess = RunningEffectiveSampleSize(max_batches=16)
+    # perfectly anti-correlated draws have a larger ESS than correlated draws
+    correlated_ess = RunningEffectiveSampleSize(max_batches=16)
+    for i in range(1000):
+        ess.update(torch.tensor((-1.0) ** i))
+        correlated_ess.update(torch.tensor(float(i // 100)))
+    assert ess.finalize() > correlated_ess.finalize()
+
+    with pytest.raises(ValueError):
+        RunningEffectiveSampleSize(max_batches=3)
+
+
+def test_thinning_and_online_summaries():
+    num_samples, num_adaptive_samples, num_chains = 20, 5, 2
+    samples = bm.GlobalNoUTurnSampler().infer(
+        [foo()],
+        {bar(): torch.ones(2)},
+        num_samples,
+        num_chains=num_chains,
+        num_adaptive_samples=num_adaptive_samples,
+        thinning=3,
+        reducers={"mean": RunningMean(), "var": RunningVariance()},
+    )
+    assert samples[foo()].shape == (num_chains, 7, 2)
+    assert samples.get_num_samples(include_adapt_steps=True) == 9
+    assert samples.get_online_summary("mean", foo()).shape == (num_chains, 2)
+    assert samples.get_chain(0).get_online_summary("var", foo()).shape == (2,)
+
+    # without thinning, the online summaries match the summaries of the samples
+    samples = bm.SingleSiteAncestralMetropolisHastings().infer(
+        [foo()],
+        {bar(): torch.ones(2)},
+        num_samples,
+        num_chains=num_chains,
+        num_adaptive_samples=num_adaptive_samples,
+        reducers={"mean": RunningMean(), "var": RunningVariance()},
+    )
+    assert torch.allclose(
+        samples.get_online_summary("mean", foo()), samples[foo()].mean(dim=1)
+    )
+    assert torch.allclose(
+        samples.get_online_summary("var", foo()), samples[foo()].var(dim=1)
+    )
+
+    with pytest.raises(KeyError):
+        samples.get_online_summary("ess", foo())
+
+
+def test_discard_sample_sink():
+    samples = bm.SingleSiteAncestralMetropolisHastings().infer(
+        [foo()],
+        {bar(): torch.ones(2)},
+        num_samples=10,
+        num_chains=2,
+        sample_sink=DiscardSampleSink(),
+        reducers={"mean": RunningMean()},
+    )
+    assert samples[foo()].shape == (2, 0, 2)
+    assert samples.get_online_summary("mean", foo()).shape == (2, 2)
+
+
+@pytest.mark.parametrize("sample_sink", [None, DiscardSampleSink()])
+def test_sample_sink_without_draws(sample_sink):
+    with pytest.raises(ValueError, match="No draws"):
+        bm.SingleSiteAncestralMetropolisHastings().infer(
+            [foo()],
+            {bar(): torch.ones(2)},
+            num_samples=0,
+            num_chains=2,
+            sample_sink=sample_sink,
+        )
@@ -6,6 +6,10 @@
 import beanmachine.ppl as bm
 import torch
 import torch.distributions as dist
+from beanmachine.ppl.inference.proposer.single_site_ancestral_proposer import (
+    SingleSiteAncestralProposer,
+)
+from beanmachine.ppl.world import World
 
 
 class SampleModel:
@@ -67,3 +71,28 @@ def test_single_site_ancestral_mh_reproducible_results():
     samples = mh.infer(queries, observations, num_samples=5, num_chains=1)
     run_3 = samples.get_variable(model.mu()).clone()
     assert not run_1.allclose(run_3)
+
+
+def test_single_site_ancestral_mh_local_accept_log_prob():
+    class ModelWithUnrelatedNode(SampleModel):
+        @bm.random_variable
+        def baz(self):
+            return dist.Normal(torch.tensor(0.0), torch.tensor(1.0))
+
+    model = ModelWithUnrelatedNode()
+    world = World.initialize_world(
+        [model.foo(), model.baz()], {model.bar(): torch.tensor(0.5)}
+    )
+    proposer = SingleSiteAncestralProposer(model.foo())
+    new_world, accept_log_prob = proposer.propose(world)
+
+    # the acceptance ratio computed from the Markov blanket of foo should match
+    # the one computed from the full joint
+    prior = world.get_variable(model.foo()).distribution
+    expected = (
+        new_world.log_prob()
+        - world.log_prob()
+        + prior.log_prob(world[model.foo()])
+        - prior.log_prob(new_world[model.foo()])
+    )
+    assert torch.isclose(accept_log_prob, expected)
@@ -4,8 +4,11 @@
 # LICENSE file in the root directory of this source tree.
 
 import beanmachine.ppl as bm
+import pytest
 import torch
 import torch.distributions as dist
+from beanmachine.ppl.inference.utils import batched_nodes, sum_to_batch_shape
+from beanmachine.ppl.world import World
 
 
 @bm.random_variable
@@ -38,3 +41,36 @@ def test_detach_samples():
     idata = samples.to_inference_data()
     assert hasattr(rv_data, "detach")
     assert not hasattr(idata["posterior"][foo()], "detach")
+
+
+@bm.random_variable
+def bar():
+    return dist.Normal(foo(), 1.0)
+
+
+@bm.random_variable
+def baz():
+    return dist.Normal(torch.zeros(3), 1.0)
+
+
+def test_sum_to_batch_shape():
+    batch_shape = torch.Size([3])
+    value = torch.arange(6.0).reshape(3, 2)
+    assert torch.equal(
+        sum_to_batch_shape(value, batch_shape), torch.tensor([1.0, 5.0, 9.0])
+    )
+    # a value without the batch dimension is shared by all chains, even if its
+    # leading dimension has the same size as the batch
+    assert torch.equal(
+        sum_to_batch_shape(value, batch_shape, is_batched=False),
+        torch.full((3,), 15.0),
+    )
+    with pytest.raises(ValueError):
+        sum_to_batch_shape(torch.ones(2), batch_shape)
+
+
+def test_batched_nodes():
+    world = World.initialize_world(
+        [foo()], {bar(): torch.tensor(1.0), baz(): torch.ones(3)}
+    )
+    assert batched_nodes(world) == {foo(), bar()}
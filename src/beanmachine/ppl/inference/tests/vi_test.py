@@ -12,8 +12,15 @@ import pytest
 import scipy.stats
 import torch
 import torch.distributions as dist
+from beanmachine.ppl.distributions import Delta
 from beanmachine.ppl.inference.vi import ADVI, MAP, VariationalInfer
-from beanmachine.ppl.inference.vi.gradient_estimator import monte_carlo_approximate_sf
+from beanmachine.ppl.inference.vi.discrepancy import kl_reverse
+from beanmachine.ppl.inference.vi.gradient_estimator import (
+    monte_carlo_approximate_reparam,
+    monte_carlo_approximate_sf,
+    vectorized_monte_carlo_approximate_reparam,
+    vectorized_monte_carlo_approximate_sf,
+)
 from beanmachine.ppl.inference.vi.variational_world import VariationalWorld
 from beanmachine.ppl.world import init_from_prior, RVDict
 from torch import optim
@@ -336,6 +343,88 @@ class TestStochasticVariationalInfer:
         sample_var = mu_approx.sample((100, 1)).var()
         assert sample_var > 0.1
 
+    @pytest.mark.parametrize(
+        "mc_approx",
+        [
+            vectorized_monte_carlo_approximate_reparam,
+            vectorized_monte_carlo_approximate_sf,
+        ],
+    )
+    def test_vectorized_normal_normal_guide(self, mc_approx):
+        normal_normal_model = NormalNormal()
+        log_scale_normal_model = LogScaleNormal()
+        observations = {
+            normal_normal_model.x(1): torch.tensor(9.0),
+            normal_normal_model.x(2): torch.tensor(10.0),
+        }
+
+        world = VariationalInfer(
+            queries_to_guides={normal_normal_model.mu(): log_scale_normal_model.q_mu()},
+            observations=observations,
+            optimizer=lambda params: torch.optim.Adam(params, lr=1e-1),
+        ).infer(num_steps=300, num_samples=64, mc_approx=mc_approx)
+        mu_approx = world.get_guide_distribution(normal_normal_model.mu())
+        # mu ~ N(0, 10) and x | mu ~ N(mu, 1), so the posterior of mu has a mean of
+        # 9.45 and a variance of 0.5
+        assert mu_approx.mean.item() == pytest.approx(9.45, abs=0.5)
+        assert mu_approx.stddev.item() == pytest.approx(0.5**0.5, abs=0.3)
+
+    def test_vectorized_estimator_requires_broadcasting(self):
+        @bm.random_variable
+        def mu():
+            return dist.Normal(0.0, 1.0)
+
+        @bm.random_variable
+        def x():
+            # the particles of mu are collapsed, so x does not broadcast over them
+            return dist.Normal(mu().mean(), 1.0)
+
+        with pytest.raises(ValueError):
+            vectorized_monte_carlo_approximate_reparam(
+                observations={x(): torch.tensor(1.0)},
+                num_samples=8,
+                discrepancy_fn=kl_reverse,
+                params={},
+                queries_to_guides={mu(): LogScaleNormal().q_mu()},
+            )
+
+    @pytest.mark.parametrize(
+        "mc_approx, vectorized_mc_approx",
+        [
+            (
+                monte_carlo_approximate_reparam,
+                vectorized_monte_carlo_approximate_reparam,
+            ),
+            (monte_carlo_approximate_sf, vectorized_monte_carlo_approximate_sf),
+        ],
+    )
+    @pytest.mark.parametrize("num_samples", [4, 8])
+    def test_vectorized_estimator_vector_observation(
+        self, mc_approx, vectorized_mc_approx, num_samples
+    ):
+        @bm.random_variable
+        def mu():
+            return dist.Normal(0.0, 1.0)
+
+        @bm.random_variable
+        def x():
+            return dist.Normal(mu(), 1.0)
+
+        @bm.random_variable
+        def q_mu():
+            # all the particles are the same, so that the estimates are deterministic
+            return Delta(torch.tensor(2.0))
+
+        kwargs = {
+            "observations": {x(): torch.arange(8.0)},
+            "num_samples": num_samples,
+            "discrepancy_fn": kl_reverse,
+            "params": {},
+            "queries_to_guides": {mu(): q_mu()},
+        }
+        # the particles of mu must not be paired up with the elements of x
+        assert torch.allclose(vectorized_mc_approx(**kwargs), mc_approx(**kwargs))
+
     def test_conditional_guide(self):
         @bm.random_variable
         def mu():
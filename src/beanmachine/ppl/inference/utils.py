@@ -6,12 +6,13 @@
 import random
 from concurrent.futures import ThreadPoolExecutor
 from enum import Enum
-from typing import Any, Callable, Dict, List
+from typing import Any, Callable, Dict, List, Set
 
 import numpy as np
 import numpy.random
 import torch
 from beanmachine.ppl.model.rv_identifier import RVIdentifier
+from beanmachine.ppl.world import World
 
 
 RVDict = Dict[RVIdentifier, torch.Tensor]
@@ -98,6 +99,44 @@ def safe_log_prob_sum(distrib, value: torch.Tensor) -> torch.Tensor:
             raise e
 
 
+def sum_to_batch_shape(
+    value: torch.Tensor, batch_shape: torch.Size, is_batched: bool = True
+) -> torch.Tensor:
+    """
+    Sums all but the leading ``batch_shape`` dimensions of ``value``. This is used to
+    reduce log probs to one value per chain when multiple chains are stacked along
+    leading batch dimensions. Values that do not carry the batch dimensions (e.g. log
+    probs of nodes that do not depend on any latent variable, see ``batched_nodes``)
+    should be passed with ``is_batched=False``, in which case they are summed and
+    broadcasted to ``batch_shape``. This is not inferred from the shape of ``value``,
+    which is ambiguous when one of its dimensions has the same size as the batch.
+    """
+    if not is_batched:
+        return value.sum().expand(batch_shape)
+    if value.shape[: len(batch_shape)] != batch_shape:
+        raise ValueError(
+            f"Expected a value with leading batch dimensions {tuple(batch_shape)}, "
+            f"but got a value of shape {tuple(value.shape)}."
+        )
+    return value.reshape(batch_shape + (-1,)).sum(-1)
+
+
+def batched_nodes(world: World) -> Set[RVIdentifier]:
+    """
+    Returns the nodes of ``world`` whose values or log probs carry the leading batch
+    dimensions when multiple chains are stacked along them, i.e. the latent nodes and
+    all of their descendants.
+    """
+    nodes = set()
+    stack = list(world.latent_nodes)
+    while stack:
+        node = stack.pop()
+        if node not in nodes:
+            nodes.add(node)
+            stack.extend(world.get_variable(node).children)
+    return nodes
+
+
 def merge_dicts(
     dicts: List[RVDict], dim: int = 0, stack_not_cat: bool = True
 ) -> RVDict:
@@ -5,12 +5,12 @@
 
 "Gradient estimators of f-divergences."
 
-from typing import Callable, Mapping
+from typing import Callable, Collection, Iterable, Mapping, Set, Tuple
 
 import torch
 from beanmachine.ppl.inference.vi.variational_world import VariationalWorld
 from beanmachine.ppl.model.rv_identifier import RVIdentifier
-from beanmachine.ppl.world import RVDict, World
+from beanmachine.ppl.world import InitializeFn, RVDict, World
 
 
 _CPU_DEVICE = torch.device("cpu")
@@ -112,3 +112,156 @@ def monte_carlo_approximate_sf(
         # score function estimator surrogate loss
         loss += discrepancy_fn(logu).detach().clone() * logq + discrepancy_fn(logu)
     return loss / num_samples
+
+
+def _particle_nodes(world: World, roots: Iterable[RVIdentifier]) -> Set[RVIdentifier]:
+    """Returns the nodes whose log probs vary across particles, i.e. the nodes with
+    a value drawn for each particle and all of their descendants."""
+    nodes = set()
+    stack = list(roots)
+    while stack:
+        node = stack.pop()
+        if node not in nodes:
+            nodes.add(node)
+            stack.extend(world.get_variable(node).children)
+    return nodes
+
+
+def _particle_log_prob(
+    world: World,
+    nodes: Collection[RVIdentifier],
+    particle_nodes: Set[RVIdentifier],
+    num_particles: int,
+    device: torch.device,
+) -> torch.Tensor:
+    """Sums the log probs of nodes separately for each particle. The log probs of
+    the nodes that do not depend on the particles are shared by all of them."""
+    log_prob = torch.zeros(num_particles, device=device)
+    for node in set(nodes):
+        node_log_prob = world.get_variable(node).log_prob
+        if node not in particle_nodes:
+            log_prob = log_prob + node_log_prob.sum()
+        elif node_log_prob.dim() == 0 or node_log_prob.shape[0] != num_particles:
+            raise ValueError(
+                f"Expected the log prob of {node} to have a leading dimension of size "
+                f"{num_particles}, but got shape {tuple(node_log_prob.shape)}. The "
+                "model must broadcast over a leading particle dimension in the values "
+                "of its random variables to use a vectorized estimator."
+            )
+        else:
+            log_prob = log_prob + node_log_prob.reshape(num_particles, -1).sum(dim=1)
+    return log_prob
+
+
+def _vectorized_log_density_ratio(
+    observations: RVDict,
+    num_samples: int,
+    params: Mapping[RVIdentifier, torch.Tensor],
+    queries_to_guides: Mapping[RVIdentifier, RVIdentifier],
+    subsample_factor: float,
+    device: torch.device,
+    initialize_fn: InitializeFn,
+) -> Tuple[torch.Tensor, torch.Tensor]:
+    """Draws num_samples particles from the guides along a leading dimension and
+    returns the log density ratios logu = logp - logq and logq of every particle."""
+    # The particle dimension is moved to the left of the batch dimensions of the
+    # observations, so that the particles broadcast against batched observations
+    # instead of being paired up with their elements.
+    num_dims = max((value.dim() for value in observations.values()), default=0)
+
+    def initialize_particles(distribution: torch.distributions.Distribution):
+        value = initialize_fn(distribution)
+        num_padding_dims = max(num_dims - len(distribution.batch_shape), 0)
+        return value.reshape((num_samples,) + (1,) * num_padding_dims + value.shape[1:])
+
+    variational_world = VariationalWorld.initialize_world(
+        queries=queries_to_guides.values(),
+        observations=observations,
+        initialize_fn=initialize_particles,
+        params=params,
+        queries_to_guides=queries_to_guides,
+    )
+    world = World.initialize_world(
+        queries=[],
+        observations={
+            **{
+                query: variational_world[guide]
+                for query, guide in queries_to_guides.items()
+            },
+            **observations,
+        },
+    )
+
+    logq = _particle_log_prob(
+        variational_world,
+        queries_to_guides.values(),
+        _particle_nodes(variational_world, variational_world.latent_nodes),
+        num_samples,
+        device,
+    )
+    particle_nodes = _particle_nodes(world, queries_to_guides.keys())
+    logu = (
+        _particle_log_prob(
+            world, queries_to_guides.keys(), particle_nodes, num_samples, device
+        )
+        + (1.0 / subsample_factor)
+        * _particle_log_prob(
+            world, observations.keys(), particle_nodes, num_samples, device
+        )
+        - logq
+    )
+    return logu, logq
+
+
+def vectorized_monte_carlo_approximate_reparam(
+    observations: RVDict,
+    num_samples: int,
+    discrepancy_fn: DiscrepancyFn,
+    params: Mapping[RVIdentifier, torch.Tensor],
+    queries_to_guides: Mapping[RVIdentifier, RVIdentifier],
+    subsample_factor: float = 1.0,
+    device: torch.device = _CPU_DEVICE,
+) -> torch.Tensor:
+    """A vectorized version of ``monte_carlo_approximate_reparam``, which draws all
+    of the samples from the guides at once along a leading dimension and evaluates
+    the model a single time on the batch. The model must broadcast over the leading
+    dimension in the values of its random variables."""
+
+    logu, _ = _vectorized_log_density_ratio(
+        observations,
+        num_samples,
+        params,
+        queries_to_guides,
+        subsample_factor,
+        device,
+        initialize_fn=lambda d: d.rsample((num_samples,)),
+    )
+    return discrepancy_fn(logu).mean(dim=0, keepdim=True)
+
+
+def vectorized_monte_carlo_approximate_sf(
+    observations: RVDict,
+    num_samples: int,
+    discrepancy_fn: DiscrepancyFn,
+    params: Mapping[RVIdentifier, torch.Tensor],
+    queries_to_guides: Mapping[RVIdentifier, RVIdentifier],
+    subsample_factor: float = 1,
+    device: torch.device = _CPU_DEVICE,
+) -> torch.Tensor:
+    """A vectorized version of ``monte_carlo_approximate_sf``, which draws all of
+    the samples from the guides at once along a leading dimension and evaluates the
+    model a single time on the batch. The model must broadcast over the leading
+    dimension in the values of its random variables."""
+
+    logu, logq = _vectorized_log_density_ratio(
+        observations,
+        num_samples,
+        params,
+        queries_to_guides,
+        subsample_factor,
+        device,
+        initialize_fn=lambda d: d.sample((num_samples,)),
+    )
+    # score function estimator surrogate loss
+    loss = discrepancy_fn(logu).detach().clone() * logq + discrepancy_fn(logu)
+    return loss.mean(dim=0, keepdim=True)
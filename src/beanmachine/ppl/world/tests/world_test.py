@@ -154,3 +154,88 @@ def test_distribution_and_log_prob_update():
     baz_var2 = world2.get_variable(model.baz())  # Bernoulli(1.0)
     # recall that baz() is observed to be 1.0
     assert baz_var.log_prob < baz_var2.log_prob
+
+
+def test_incremental_log_prob():
+    model = DynamicModel()
+
+    @bm.random_variable
+    def noise(i: int):
+        return dist.Normal(0.0, 1.0)
+
+    world = World(initialize_fn=lambda d: torch.zeros_like(d.sample()))
+    with world:
+        model.baz()
+        for i in range(5):
+            noise(i)
+    log_prob1 = world.log_prob()
+
+    # changing foo() causes baz() to depend on bar(1), which is a new node
+    world2 = world.replace({model.foo(): torch.tensor(1.0)})
+    # the update is deferred until the joint log prob is needed
+    assert world2._joint_log_prob is None
+    assert world2._log_prob_update is not None
+    assert torch.isclose(world2.log_prob(), world2.log_prob(world2.keys()))
+    assert world2._num_log_prob_updates == 1
+
+    world3 = world2.replace({noise(0): torch.tensor(2.0)})
+    assert torch.isclose(world3.log_prob(), world3.log_prob(world3.keys()))
+    # the original world is not affected
+    assert torch.isclose(world.log_prob(), log_prob1)
+
+
+def test_incremental_log_prob_resync():
+    @bm.random_variable
+    def noise(i: int):
+        return dist.Normal(0.0, 1.0)
+
+    world = World.initialize_world([noise(i) for i in range(5)])
+    world.log_prob()
+    for i in range(3 * World._max_log_prob_updates):
+        value = torch.rand(()).requires_grad_()
+        world = world.replace({noise(0): value})
+        log_prob = world.log_prob()
+        assert torch.isclose(log_prob, world.log_prob(world.keys()))
+        # the joint log prob is periodically recomputed in full
+        assert world._num_log_prob_updates == (i + 1) % (
+            World._max_log_prob_updates + 1
+        )
+        # the gradient does not flow back through the previous worlds
+        (grad,) = torch.autograd.grad(log_prob, value)
+        assert torch.isclose(grad, -value)
+
+
+def test_temper():
+    model = SampleModel()
+    world = World.initialize_world([model.foo()], {model.bar(): torch.tensor(0.5)})
+    tempered = world.temper(0.25)
+    assert tempered[model.foo()] == world[model.foo()]
+    assert tempered.latent_nodes == world.latent_nodes
+    # only the likelihood is tempered
+    assert torch.isclose(
+        tempered.log_prob([model.bar()]), 0.25 * world.log_prob([model.bar()])
+    )
+    assert torch.isclose(
+        tempered.log_prob([model.foo()]), world.log_prob([model.foo()])
+    )
+    # the temperature is preserved when the world is updated
+    new_world = world.replace({model.foo(): torch.tensor(0.1)})
+    new_tempered = tempered.replace({model.foo(): torch.tensor(0.1)})
+    assert torch.isclose(
+        new_tempered.log_prob(),
+        new_world.log_prob([model.foo()]) + 0.25 * new_world.log_prob([model.bar()]),
+    )
+
+
+def test_replace_latents():
+    model = SampleModel()
+    world = World.initialize_world([model.foo()], {model.bar(): torch.tensor(0.5)})
+    new_world = world.replace_latents({model.foo(): torch.tensor(0.1)})
+    assert new_world[model.foo()] == torch.tensor(0.1)
+    # the observed child is not re-run until it is called
+    assert model.bar() not in new_world
+    assert model.bar() not in new_world.get_variable(model.foo()).children
+    assert model.bar() in world
+    new_world.call(model.bar())
+    expected = world.replace({model.foo(): torch.tensor(0.1)})
+    assert torch.isclose(new_world.log_prob(), expected.log_prob())
@@ -57,6 +57,34 @@ class Variable:
             )
             return torch.tensor(float("-inf"), device=self.value.device, dtype=dtype)
 
+    @lazy_property
+    def log_prob_sum(self) -> torch.Tensor:
+        """
+        Returns
+             The logprob of the `value` summed over all of its elements.
+        """
+        return torch.sum(self.log_prob)
+
     def replace(self, **changes) -> Variable:
         """Return a new Variable object with fields replaced by the changes"""
         return dataclasses.replace(self, **changes)
+
+
+@dataclasses.dataclass
+class TemperedVariable(Variable):
+    """
+    Variable whose log prob is scaled by an inverse temperature, i.e. whose
+    likelihood is raised to the power of ``inverse_temperature``. This is used to
+    flatten the posterior in the tempered replicas of parallel tempering.
+    """
+
+    inverse_temperature: float = 1.0
+    "Factor that the log prob of the random variable is scaled by"
+
+    @lazy_property
+    def log_prob(self) -> torch.Tensor:
+        """
+        Returns
+             The tempered logprob of the `value` given the distribution.
+        """
+        return self.inverse_temperature * super().log_prob
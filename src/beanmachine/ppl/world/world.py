@@ -25,7 +25,7 @@ from beanmachine.ppl.model.rv_identifier import RVIdentifier
 from beanmachine.ppl.world import init_to_uniform
 from beanmachine.ppl.world.base_world import BaseWorld
 from beanmachine.ppl.world.initialize_fn import init_from_prior, InitializeFn
-from beanmachine.ppl.world.variable import Variable
+from beanmachine.ppl.world.variable import TemperedVariable, Variable
 
 
 RVDict = Dict[RVIdentifier, torch.Tensor]
@@ -64,6 +64,10 @@ class World(BaseWorld, Mapping[RVIdentifier, torch.Tensor]):
       initialize_fn (callable, Optional): Callable which takes a ``torch.distribution`` object as argument and returns a ``torch.Tensor``
     """
 
+    # number of incremental updates of the joint log prob after which it is
+    # recomputed in full
+    _max_log_prob_updates: int = 100
+
     def __init__(
         self,
         observations: Optional[RVDict] = None,
@@ -72,6 +76,18 @@ class World(BaseWorld, Mapping[RVIdentifier, torch.Tensor]):
         self.observations: RVDict = observations or {}
         self._initialize_fn: InitializeFn = initialize_fn
         self._variables: Dict[RVIdentifier, Variable] = {}
+        # cached joint log prob of all variables, which is invalidated whenever a
+        # new variable is added
+        self._joint_log_prob: Optional[torch.Tensor] = None
+        # pending incremental update of the joint log prob set by `replace`, as the
+        # joint log prob of the previous world, the previous variables of the nodes
+        # that have changed, and the nodes to rescore in the current world
+        self._log_prob_update: Optional[
+            Tuple[torch.Tensor, List[Variable], Set[RVIdentifier]]
+        ] = None
+        # number of incremental updates since the joint log prob was last computed
+        # in full, which bounds the accumulation of floating point errors
+        self._num_log_prob_updates = 0
 
         self._call_stack: List[_TempVar] = []
 
@@ -147,6 +163,51 @@ class World(BaseWorld, Mapping[RVIdentifier, torch.Tensor]):
           A new world where values specified in the dictionary are replaced.
           This method will update the internal graph structure.
         """
+        new_world, nodes_to_update = self._replace_values(values)
+        new_world._rerun_nodes(nodes_to_update)
+        new_world._joint_log_prob = None
+        new_world._log_prob_update = None
+        new_world._num_log_prob_updates = 0
+        self._defer_joint_log_prob_update(new_world, values.keys() | nodes_to_update)
+        return new_world
+
+    def replace_latents(self, values: RVDict) -> World:
+        """
+        Args:
+          values (RVDict): Dict of RVIdentifiers and their values to replace.
+
+        Returns:
+          A new world where values specified in the dictionary are replaced, like
+          ``replace``, except that the observed children of the replaced nodes are
+          removed from the new world instead of being re-run, so that the cost does
+          not grow with the number of observations. They are invoked again when
+          they are called in the new world.
+        """
+        new_world, nodes_to_update = self._replace_values(values)
+        observed_nodes = {
+            node
+            for node in nodes_to_update & self.observations.keys()
+            if not self._variables[node].children
+        }
+        new_world._rerun_nodes(nodes_to_update - observed_nodes)
+        parents = set(values)
+        for node in observed_nodes:
+            parents |= new_world._variables.pop(node).parents
+        # the parents get sets of children of their own, so that invoking the
+        # observations again in the new world does not modify the current world
+        for parent in parents:
+            parent_var = new_world._variables[parent]
+            new_world._variables[parent] = parent_var.replace(
+                children=parent_var.children - observed_nodes
+            )
+        new_world._joint_log_prob = None
+        new_world._log_prob_update = None
+        new_world._num_log_prob_updates = 0
+        return new_world
+
+    def _replace_values(self, values: RVDict) -> Tuple[World, Set[RVIdentifier]]:
+        """Returns a copy of the current world where the values specified in the
+        dictionary are replaced, and the children of the replaced nodes."""
         assert not any(node in self.observations for node in values)
         new_world = self.copy()
         for node, value in values.items():
@@ -157,21 +218,52 @@ class World(BaseWorld, Mapping[RVIdentifier, torch.Tensor]):
         nodes_to_update = set().union(
             *(self._variables[node].children for node in values)
         )
+        return new_world, nodes_to_update
+
+    def _rerun_nodes(self, nodes_to_update: Set[RVIdentifier]) -> None:
         for node in nodes_to_update:
             # Invoke node conditioned on the provided values
-            new_distribution, new_parents = new_world._run_node(node)
+            new_distribution, new_parents = self._run_node(node)
             # Update children's dependencies
-            old_node_var = new_world._variables[node]
-            new_world._variables[node] = old_node_var.replace(
+            old_node_var = self._variables[node]
+            self._variables[node] = old_node_var.replace(
                 parents=new_parents, distribution=new_distribution
             )
             dropped_parents = old_node_var.parents - new_parents
             for parent in dropped_parents:
-                parent_var = new_world._variables[parent]
-                new_world._variables[parent] = parent_var.replace(
+                parent_var = self._variables[parent]
+                self._variables[parent] = parent_var.replace(
                     children=parent_var.children - {node}
                 )
-        return new_world
+
+    def _defer_joint_log_prob_update(
+        self, new_world: World, changed_nodes: Set[RVIdentifier]
+    ) -> None:
+        """
+        Let ``new_world`` compute its joint log prob lazily from the cached joint log
+        prob of the current world, where ``changed_nodes`` are the nodes whose value
+        or distribution differ between the two worlds. Nothing is deferred (i.e. the
+        joint will be recomputed in full) if there is no valid cache to start from,
+        if most of the world has changed anyway, or if the cache has already been
+        updated incrementally ``_max_log_prob_updates`` times.
+        """
+        if (
+            self._joint_log_prob is None
+            or self._num_log_prob_updates >= self._max_log_prob_updates
+            or 2 * len(changed_nodes) > len(self)
+            or not torch.isfinite(self._joint_log_prob)
+        ):
+            return
+        # nodes that are invoked for the first time while re-running the children
+        new_nodes = new_world.keys() - self.keys()
+        # the previous joint is detached so that the new world does not keep the
+        # autograd graph of the previous world alive
+        new_world._log_prob_update = (
+            self._joint_log_prob.detach(),
+            [self._variables[node] for node in changed_nodes],
+            changed_nodes | new_nodes,
+        )
+        new_world._num_log_prob_updates = self._num_log_prob_updates + 1
 
     def __iter__(self) -> Iterator[RVIdentifier]:
         return iter(self._variables)
@@ -193,6 +285,34 @@ class World(BaseWorld, Mapping[RVIdentifier, torch.Tensor]):
         """
         world_copy = World(self.observations.copy(), self._initialize_fn)
         world_copy._variables = self._variables.copy()
+        world_copy._joint_log_prob = self._joint_log_prob
+        world_copy._log_prob_update = self._log_prob_update
+        world_copy._num_log_prob_updates = self._num_log_prob_updates
+        return world_copy
+
+    def temper(self, inverse_temperature: float) -> World:
+        """
+        Args:
+          inverse_temperature (float): Factor to scale the log prob of the observed
+                 random variables by.
+
+        Returns:
+          A copy of the current world whose likelihood is raised to the power of
+          ``inverse_temperature``, and whose latent variables are unchanged.
+        """
+        world_copy = self.copy()
+        for node in self.observations.keys() & self._variables.keys():
+            node_var = self._variables[node]
+            world_copy._variables[node] = TemperedVariable(
+                **{
+                    field.name: getattr(node_var, field.name)
+                    for field in dataclasses.fields(Variable)
+                },
+                inverse_temperature=inverse_temperature,
+            )
+        world_copy._joint_log_prob = None
+        world_copy._log_prob_update = None
+        world_copy._num_log_prob_updates = 0
         return world_copy
 
     def initialize_value(self, node: RVIdentifier) -> None:
@@ -204,6 +324,9 @@ class World(BaseWorld, Mapping[RVIdentifier, torch.Tensor]):
         else:
             node_val = self._initialize_fn(distribution)
 
+        self._joint_log_prob = None
+        self._log_prob_update = None
+        self._num_log_prob_updates = 0
         self._variables[node] = Variable(
             value=node_val,
             distribution=distribution,
@@ -242,11 +365,28 @@ class World(BaseWorld, Mapping[RVIdentifier, torch.Tensor]):
           The joint log prob of all of the nodes in the current world
         """
         if nodes is None:
-            nodes = self._variables.keys()
+            if self._joint_log_prob is None:
+                self._joint_log_prob = self._compute_joint_log_prob()
+            return self._joint_log_prob
+        return self._sum_log_prob(nodes)
+
+    def _compute_joint_log_prob(self) -> torch.Tensor:
+        if self._log_prob_update is None:
+            self._num_log_prob_updates = 0
+            return self._sum_log_prob(self._variables.keys())
+        prev_joint_log_prob, prev_variables, nodes_to_rescore = self._log_prob_update
+        self._log_prob_update = None
+        prev_log_prob = torch.tensor(0.0)
+        for variable in prev_variables:
+            prev_log_prob = prev_log_prob + variable.log_prob_sum.detach()
+        return (
+            prev_joint_log_prob - prev_log_prob + self._sum_log_prob(nodes_to_rescore)
+        )
 
+    def _sum_log_prob(self, nodes: Collection[RVIdentifier]) -> torch.Tensor:
         log_prob = torch.tensor(0.0)
         for node in set(nodes):
-            log_prob = log_prob + torch.sum(self._variables[node].log_prob)
+            log_prob = log_prob + self._variables[node].log_prob_sum
         return log_prob
 
     def enumerate_node(self, node: RVIdentifier) -> torch.Tensor:
@@ -275,9 +415,13 @@ class World(BaseWorld, Mapping[RVIdentifier, torch.Tensor]):
           Its distribution and set of parent nodes
         """
         self._call_stack.append(_TempVar(node))
-        with self:
-            distribution = node.function(*node.arguments)
-        temp_var = self._call_stack.pop()
+        try:
+            with self:
+                distribution = node.function(*node.arguments)
+        finally:
+            # keep the call stack consistent if the model raises, so that the world
+            # can still be used afterwards
+            temp_var = self._call_stack.pop()
         if not isinstance(distribution, dist.Distribution):
             raise TypeError("A random_variable is required to return a distribution.")
         return distribution, temp_var.parents